@@ -0,0 +1,195 @@
+"""
+Catch up on channel messages missed while the bot was down.
+
+    python backfill.py                      # resume every configured channel from its last-seen ID
+    python backfill.py --limit 2000         # no checkpoint yet: take the latest 2000 messages
+    python backfill.py --channel -100123 --dump messages.jsonl  # replay a recorded dump instead of live Telegram
+
+Messages are parsed in batches with SignalParser.parse_many and each batch is written
+to the journal with a single append, then the checkpoint is advanced. Backfilled
+signals are stored with status BACKFILL and their original message time, so the
+traders (which only act on NEW signals) never fire stale orders from them.
+
+signal_loader.py runs the same catch-up at startup, before it subscribes to new
+messages (BACKFILL_ON_START). Run this script only while the loader is stopped:
+the live listener advances the same checkpoint, so a run after the loader is back
+up would start past its first live message and skip the gap.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import log_setup
+from config import Config
+from signal_journal import SignalJournal
+from signal_parser import SignalParser
+from signal_router import SignalRouter
+
+logger = logging.getLogger(__name__)
+
+
+class MessageCheckpoint:
+    """
+    Last processed Telegram message ID per channel, kept in a small JSON file.
+    Updated by the live listener and by backfill runs, so a backfill has to run
+    before the listener takes its first live message (see signal_loader.py).
+    """
+    def __init__(self, path=None):
+        self.path = path or Config.BACKFILL_CHECKPOINT_FILE
+        self.last_ids = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self.last_ids = {str(k): int(v) for k, v in json.load(f).items()}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+
+    def get(self, channel_id):
+        return self.last_ids.get(str(channel_id))
+
+    def update(self, channel_id, message_id):
+        key = str(channel_id)
+        if message_id > self.last_ids.get(key, 0):
+            self.last_ids[key] = message_id
+            self.save()
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.last_ids, f)
+        os.replace(tmp, self.path)
+
+
+class RecordedMessage:
+    __slots__ = ("id", "raw_text", "date")
+
+    def __init__(self, id, raw_text, date=None):
+        self.id = id
+        self.raw_text = raw_text
+        self.date = date
+
+
+async def iter_dump(path, min_id=0):
+    """
+    Yields messages from a JSON-lines dump ({"id": ..., "text": ..., "date": ...}), oldest first.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        messages = [json.loads(line) for line in f if line.strip()]
+    for m in sorted(messages, key=lambda m: m["id"]):
+        if m["id"] > min_id:
+            yield RecordedMessage(m["id"], m.get("text") or m.get("message") or "", m.get("date"))
+
+
+async def iter_telegram(client, channel_id, min_id=None, limit=None):
+    """
+    Streams channel history oldest first, starting after `min_id`.
+    Without a checkpoint only the latest `limit` messages are fetched.
+    """
+    entity = await client.get_entity(channel_id)
+    if min_id:
+        async for message in client.iter_messages(entity, min_id=min_id, reverse=True, wait_time=1):
+            yield message
+        return
+
+    recent = [m async for m in client.iter_messages(entity, limit=limit)]
+    for message in reversed(recent):
+        yield message
+
+
+async def backfill_channels(client, router, channels, checkpoint, limit=None, journal=None):
+    """
+    Backfills each channel from its checkpoint through a connected Telegram `client`.
+    Channels without a checkpoint take their latest `limit` messages, or are skipped
+    when `limit` is None. Returns the number of signals written.
+    """
+    signals = 0
+    for channel_id in channels:
+        last_id = checkpoint.get(channel_id)
+        if not last_id and limit is None:
+            continue
+        backfiller = Backfiller(parser=router.parser_for(channel_id), journal=journal, checkpoint=checkpoint)
+        logger.info(f"Backfilling channel {channel_id} after message {last_id or '(none)'}")
+        signals += await backfiller.run(channel_id, iter_telegram(client, channel_id, last_id, limit))
+    return signals
+
+
+class Backfiller:
+    def __init__(self, parser=None, journal=None, checkpoint=None, batch_size=None):
+        self.parser = parser or SignalParser()
+        self.journal = journal or SignalJournal()
+        self.checkpoint = checkpoint or MessageCheckpoint()
+        self.batch_size = batch_size or Config.BACKFILL_BATCH_SIZE
+        self.messages = 0
+        self.signals = 0
+
+    def _flush(self, channel_id, batch):
+        if not batch:
+            return
+        results = self.parser.parse_many([m.raw_text or "" for m in batch])
+        signals = []
+        for message, signal in zip(batch, results):
+            if signal:
+                signal["status"] = "BACKFILL"
+                if isinstance(message.date, str):
+                    signal["timestamp"] = message.date
+                elif message.date:
+                    # Telethon dates are UTC; the journal uses local time like the live loader
+                    signal["timestamp"] = message.date.astimezone().replace(tzinfo=None).isoformat()
+                signals.append(signal)
+
+        # One write + fsync for the whole batch, then move the checkpoint past it.
+        # A crash in between replays the batch on the next run (at-least-once).
+        self.journal.append_many(signals)
+        self.checkpoint.update(channel_id, batch[-1].id)
+        self.messages += len(batch)
+        self.signals += len(signals)
+        logger.info(f"Backfilled up to message {batch[-1].id}: {self.messages} messages, {self.signals} signals")
+
+    async def run(self, channel_id, messages):
+        """
+        Consumes an async iterator of messages (oldest first) for one channel.
+        """
+        batch = []
+        async for message in messages:
+            batch.append(message)
+            if len(batch) >= self.batch_size:
+                self._flush(channel_id, batch)
+                batch = []
+        self._flush(channel_id, batch)
+        return self.signals
+
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--channel", help="Channel ID (default: every configured channel)")
+    ap.add_argument("--dump", help="JSON-lines message dump to replay instead of Telegram (needs --channel)")
+    ap.add_argument("--limit", type=int, default=1000, help="Messages to fetch when there is no checkpoint")
+    args = ap.parse_args()
+
+    router = SignalRouter()
+    channels = [int(args.channel)] if args.channel else router.channel_ids
+    checkpoint = MessageCheckpoint()
+
+    if args.dump:
+        if len(channels) != 1:
+            ap.error("--dump needs --channel")
+        # Parse with the channel's own format profile, like the live listener
+        backfiller = Backfiller(parser=router.parser_for(channels[0]), checkpoint=checkpoint)
+        last_id = checkpoint.get(channels[0])
+        logger.info(f"Backfilling channel {channels[0]} after message {last_id or '(none)'}")
+        await backfiller.run(channels[0], iter_dump(args.dump, last_id or 0))
+        return
+
+    from telethon import TelegramClient
+
+    client = TelegramClient(Config.TELEGRAM_SESSION_NAME, Config.TELEGRAM_API_ID, Config.TELEGRAM_API_HASH)
+    await client.start()
+    try:
+        await backfill_channels(client, router, channels, checkpoint, args.limit)
+    finally:
+        await client.disconnect()
+
+if __name__ == "__main__":
+    log_setup.setup("backfill")
+    asyncio.run(main())
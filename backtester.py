@@ -0,0 +1,236 @@
+"""
+Replays journal signals against local bar or tick data.
+
+    python backtester.py --data market_data/ [--signals trade_signals.csv] [--limit-offset 1.0]
+
+Market data is one file per symbol, named after the signal symbol with spaces
+replaced by underscores (NIFTY 26100 PE -> NIFTY_26100_PE.parquet or .csv).
+Bar files have timestamp, open, high, low, close columns; tick files may have just
+timestamp, price. Parquet needs pyarrow.
+
+Every signal is simulated the way GrowwTrader.place_order trades it: an SL-LIMIT
+buy with trigger = price and limit = price + limit offset, then exits on stop loss
+or target, or at the last bar of the session. All signals of a symbol are evaluated
+at once as NumPy matrices (signals x bars of the session), so there is no Python
+loop over bars.
+"""
+import argparse
+import csv
+import logging
+import os
+import numpy as np
+import log_setup
+from signal_journal import SignalJournal
+
+logger = logging.getLogger(__name__)
+
+LIMIT_OFFSET = 1.0  # Same as GrowwTrader.place_order: limit = trigger + 1
+MAX_CELLS = 5_000_000  # Upper bound on signals x bars per matrix chunk
+
+
+def data_path(directory, symbol):
+    name = "_".join(str(symbol).upper().split())
+    for ext in (".parquet", ".csv"):
+        path = os.path.join(directory, name + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_bars(path):
+    """
+    Returns (timestamps[datetime64[s]], open, high, low, close) arrays sorted by time.
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path, memory_map=True)
+        columns = {name.lower(): table.column(name).to_numpy() for name in table.column_names}
+        ts = columns["timestamp"].astype("datetime64[s]")
+    else:
+        with open(path, "r", newline="") as f:
+            header = [h.strip().lower() for h in next(csv.reader(f))]
+        wanted = [name for name in ("open", "high", "low", "close", "price") if name in header]
+        values = np.loadtxt(path, delimiter=",", skiprows=1, dtype=float, ndmin=2,
+                            usecols=[header.index(name) for name in wanted])
+        columns = {name: values[:, i] for i, name in enumerate(wanted)}
+        # Read timestamps truncated to whole seconds (drops fractions and UTC offsets)
+        ts = np.loadtxt(path, delimiter=",", skiprows=1, dtype="U19", ndmin=1,
+                        usecols=header.index("timestamp")).astype("datetime64[s]")
+
+    if "price" in columns and "open" not in columns:
+        price = columns["price"].astype(float)
+        o = h = l = c = price
+    else:
+        o, h, l, c = (columns[k].astype(float) for k in ("open", "high", "low", "close"))
+
+    order = np.argsort(ts, kind="stable")
+    return ts[order], o[order], h[order], l[order], c[order]
+
+
+def _first(hit):
+    """
+    Column index of the first True per row, -1 where there is none.
+    """
+    pos = hit.argmax(axis=1)
+    return np.where(hit.any(axis=1), pos, -1)
+
+
+def simulate(bars, t_signal, trigger, sl, target, limit_offset=LIMIT_OFFSET):
+    """
+    Simulates long signals on one symbol. All inputs are arrays of equal length;
+    a NaN trigger means a market order at the first bar after the signal.
+    Returns a dict of per-signal arrays: triggered, filled, entry, exit, pnl, slippage, reason.
+    Reasons: 0 = not triggered, 1 = not filled, 2 = stop loss, 3 = target, 4 = session end.
+    """
+    ts, o, h, l, c = bars
+    n = len(t_signal)
+    out = {
+        "triggered": np.zeros(n, dtype=bool),
+        "filled": np.zeros(n, dtype=bool),
+        "entry": np.full(n, np.nan),
+        "exit": np.full(n, np.nan),
+        "pnl": np.full(n, np.nan),
+        "slippage": np.full(n, np.nan),
+        "reason": np.zeros(n, dtype=np.int8),
+    }
+    if n == 0 or len(ts) == 0:
+        return out
+
+    day = ts.astype("datetime64[D]")
+    start = np.searchsorted(ts, t_signal, side="right")
+    in_range = start < len(ts)
+    start_c = np.minimum(start, len(ts) - 1)
+    session_end = np.where(in_range, np.searchsorted(day, day[start_c], side="right"), start)
+    horizon = max(1, int((session_end - start).max()))
+    chunk = max(1, MAX_CELLS // horizon)
+    steps = np.arange(horizon)
+
+    for lo in range(0, n, chunk):
+        sel = slice(lo, min(n, lo + chunk))
+        idx = start[sel, None] + steps
+        valid = idx < session_end[sel, None]
+        idx = np.minimum(idx, len(ts) - 1)
+        H, L, O = h[idx], l[idx], o[idx]
+
+        trig = trigger[sel]
+        market = np.isnan(trig)
+        trig_pos = _first(valid & ((H >= trig[:, None]) | market[:, None]))
+        triggered = trig_pos >= 0
+
+        # SL-LIMIT: fills on the trigger bar at max(open, trigger) if that is within the limit,
+        # otherwise the limit rests until a later bar trades down to it
+        limit = np.where(market, np.inf, trig + limit_offset)
+        after_trigger = steps[None, :] >= trig_pos[:, None]
+        fill_pos = _first(valid & triggered[:, None] & after_trigger & (L <= limit[:, None]))
+        filled = fill_pos >= 0
+
+        rows = np.arange(idx.shape[0])
+        fp = np.maximum(fill_pos, 0)
+        fill_open = O[rows, fp]
+        on_trigger_bar = fp == trig_pos
+        entry = np.where(market, fill_open, np.minimum(np.where(on_trigger_bar, np.maximum(fill_open, trig), fill_open), limit))
+
+        # Exits are checked from the bar after the fill; a bar that hits both counts as stop loss
+        after_fill = valid & (steps[None, :] > fill_pos[:, None]) & filled[:, None]
+        s, t = sl[sel], target[sel]
+        sl_pos = _first(after_fill & (L <= s[:, None]))
+        tgt_pos = _first(after_fill & (H >= t[:, None]))
+        sl_first = (sl_pos >= 0) & ((tgt_pos < 0) | (sl_pos <= tgt_pos))
+        tgt_first = (tgt_pos >= 0) & ~sl_first
+
+        last = np.maximum(session_end[sel] - 1, 0)
+        exit_price = c[last]
+        exit_price = np.where(sl_first, np.minimum(O[rows, np.maximum(sl_pos, 0)], s), exit_price)
+        exit_price = np.where(tgt_first, np.maximum(O[rows, np.maximum(tgt_pos, 0)], t), exit_price)
+
+        reason = np.where(~triggered, 0, np.where(~filled, 1, np.where(sl_first, 2, np.where(tgt_first, 3, 4))))
+        out["triggered"][sel] = triggered
+        out["filled"][sel] = filled
+        out["entry"][sel] = np.where(filled, entry, np.nan)
+        out["exit"][sel] = np.where(filled, exit_price, np.nan)
+        out["pnl"][sel] = np.where(filled, exit_price - entry, np.nan)
+        out["slippage"][sel] = np.where(filled & ~market, entry - trig, np.nan)
+        out["reason"][sel] = reason
+
+    return out
+
+
+def load_signals(path=None):
+    """
+    Groups every journal signal (live and backfilled) by symbol.
+    """
+    journal = SignalJournal(path) if path else SignalJournal()
+    grouped = {}
+    for record in journal.cursor().read_new():
+        if not record.symbol or not record.timestamp:
+            continue
+        grouped.setdefault(record.symbol, []).append(record)
+    return grouped
+
+
+def backtest(data_dir, signals_path=None, limit_offset=LIMIT_OFFSET):
+    """
+    Runs every signal with available market data. Returns {symbol: report dict}.
+    """
+    reports = {}
+    for symbol, records in load_signals(signals_path).items():
+        path = data_path(data_dir, symbol)
+        if path is None:
+            logger.debug(f"No market data for {symbol}, skipping {len(records)} signals")
+            continue
+
+        # Journal timestamps are local ISO strings; keep whole seconds
+        t_signal = np.array([r.timestamp for r in records]).astype("U19").astype("datetime64[s]")
+        nan = lambda v: np.nan if v is None else v
+        prices = np.array([[nan(r.price), nan(r.sl), nan(r.target)] for r in records], dtype=float)
+        sell = np.array([(r.action or "BUY").upper() == "SELL" for r in records])
+
+        bars = load_bars(path)
+        result = {k: None for k in ("filled", "pnl", "slippage")}
+        for mask, sign in ((~sell, 1.0), (sell, -1.0)):
+            if not mask.any():
+                continue
+            # Short signals are simulated as longs on the mirrored price series
+            ts, o, h, l, c = bars
+            mirrored = (ts, sign * o, sign * h, sign * l, sign * c) if sign > 0 else (ts, -o, -l, -h, -c)
+            trigger = np.where(prices[mask, 0] > 0, sign * prices[mask, 0], np.nan)
+            part = simulate(mirrored, t_signal[mask], trigger, sign * prices[mask, 1], sign * prices[mask, 2], limit_offset)
+            for k in result:
+                if result[k] is None:
+                    result[k] = np.full(len(records), np.nan if k != "filled" else False, dtype=part[k].dtype)
+                result[k][mask] = part[k]
+
+        filled = result["filled"]
+        reports[symbol] = {
+            "signals": len(records),
+            "filled": int(filled.sum()),
+            "fill_rate": float(filled.mean()),
+            "wins": int((result["pnl"][filled] > 0).sum()),
+            "pnl_points": float(np.nansum(result["pnl"])),
+            "avg_slippage": float(np.nanmean(result["slippage"])) if np.isfinite(result["slippage"]).any() else 0.0,
+        }
+    return reports
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--data", required=True, help="Directory with per-symbol Parquet/CSV files")
+    ap.add_argument("--signals", help="Signal journal to replay (default: SIGNAL_CSV_FILE)")
+    ap.add_argument("--limit-offset", type=float, default=LIMIT_OFFSET)
+    args = ap.parse_args()
+
+    reports = backtest(args.data, args.signals, args.limit_offset)
+    print(f"{'Symbol':<24}{'Signals':>8}{'Filled':>8}{'Fill%':>8}{'Wins':>6}{'P&L pts':>10}{'Slip':>8}")
+    for symbol, r in sorted(reports.items()):
+        print(f"{symbol:<24}{r['signals']:>8}{r['filled']:>8}{r['fill_rate'] * 100:>7.1f}%"
+              f"{r['wins']:>6}{r['pnl_points']:>10.2f}{r['avg_slippage']:>8.2f}")
+    total_signals = sum(r["signals"] for r in reports.values())
+    total_filled = sum(r["filled"] for r in reports.values())
+    total_pnl = sum(r["pnl_points"] for r in reports.values())
+    print(f"{'TOTAL':<24}{total_signals:>8}{total_filled:>8}{'':>8}{'':>6}{total_pnl:>10.2f}")
+
+
+if __name__ == "__main__":
+    log_setup.setup()
+    main()
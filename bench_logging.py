@@ -0,0 +1,114 @@
+"""
+Per-order logging overhead on the calling thread, before and after log_setup.
+
+    python bench_logging.py [--orders 20000] [--json]
+
+Replays the log calls GrowwTrader makes for one order:
+
+- sync/eager: the old setup, a logging.basicConfig stream handler written on the
+  caller's thread, and the old calls (f-strings, order details logged twice,
+  resolved-ID line at INFO)
+- queue/eager: log_setup's queue handler with the old calls
+- queue/lazy: log_setup with the current calls (%-style arguments, one order line)
+
+Log output goes to a temporary file in every mode, so the terminal's speed is not
+part of the comparison. The time for the writer thread to drain the queue is
+reported separately: it is spent off the order path.
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def order(i):
+    details = {
+        "exchange": "NSE", "security_id": f"{35000 + i}", "transaction_type": "BUY", "quantity": 75,
+        "price": 121.5, "trigger_price": 120.5, "order_type": "SL_LIMIT", "product_type": "MIS", "validity": "DAY",
+    }
+    response = [{"groww_order_id": f"GMK{i:09d}", "order_status": "OPEN", "order_reference_id": f"{i:020x}"}]
+    return "NIFTY 26100 PE", details, response
+
+
+def eager_calls(logger, symbol, details, response):
+    logger.info(f"Resolved {symbol} to ID: {details['security_id']} (NIFTY 26100 PE)")
+    logger.info(f"Placing PENDING SL-LIMIT Order (Wait for Price > {details['trigger_price']}): {details}")
+    logger.info(f"Placing order: {details}")
+    logger.info(f"Order Response: {response}")
+
+
+def lazy_calls(logger, symbol, details, response):
+    logger.debug("Resolved %s to ID: %s (%s)", symbol, details['security_id'], "NIFTY 26100 PE")
+    logger.info("[%s] Placing %s order: %s", "default", details['order_type'], details)
+    logger.info("[%s] Order response: %s", "default", response)
+
+
+def measure(calls, logger, orders):
+    orders_data = [order(i) for i in range(orders)]
+    for data in orders_data[:200]:  # Warm up
+        calls(logger, *data)
+    samples = []
+    for data in orders_data:
+        started = time.perf_counter_ns()
+        calls(logger, *data)
+        samples.append(time.perf_counter_ns() - started)
+    samples.sort()
+    return {
+        "mean": statistics.fmean(samples) / 1000,
+        "p50": samples[len(samples) // 2] / 1000,
+        "p99": samples[int(len(samples) * 0.99)] / 1000,
+        "max": samples[-1] / 1000,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--orders", type=int, default=20000)
+    ap.add_argument("--json", action="store_true", help="JSON-lines output for the queue modes")
+    args = ap.parse_args()
+    if args.json:
+        os.environ["LOG_FORMAT"] = "json"
+    os.environ["LOG_LEVEL"] = "INFO"
+
+    import log_setup
+
+    out = tempfile.NamedTemporaryFile("w", suffix=".log", delete=False)
+    console = sys.stderr
+    sys.stderr = out  # Handlers created below write here
+    logger = logging.getLogger("groww_trader")
+    results = {}
+    try:
+        logging.basicConfig(level=logging.INFO, force=True)
+        results["sync/eager"] = measure(eager_calls, logger, args.orders)
+
+        log_setup.setup("bench_logging")
+        results["queue/eager"] = measure(eager_calls, logger, args.orders)
+        drain_started = time.perf_counter()
+        log_setup.stop()
+        eager_drain = time.perf_counter() - drain_started
+
+        log_setup.setup("bench_logging")
+        results["queue/lazy"] = measure(lazy_calls, logger, args.orders)
+        drain_started = time.perf_counter()
+        log_setup.stop()
+        lazy_drain = time.perf_counter() - drain_started
+    finally:
+        sys.stderr = console
+        out.close()
+
+    size = os.path.getsize(out.name)
+    os.unlink(out.name)
+    print(f"{args.orders} orders, {size / 1e6:.1f} MB of logs{' (JSON)' if args.json else ''}")
+    print(f"{'Mode':<14}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'max us':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<14}{r['mean']:>10.1f}{r['p50']:>10.1f}{r['p99']:>10.1f}{r['max']:>10.1f}")
+    base = results["sync/eager"]["mean"]
+    print(f"queue/lazy costs {results['queue/lazy']['mean'] / base * 100:.0f}% of sync/eager per order; "
+          f"writer drained the backlog in {eager_drain * 1000:.0f} ms (eager) / {lazy_drain * 1000:.0f} ms (lazy) after the run")
+
+
+if __name__ == "__main__":
+    main()
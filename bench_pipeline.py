@@ -0,0 +1,299 @@
+"""
+End-to-end load test of the signal pipeline against the broker simulator.
+
+    python bench_pipeline.py [--target main|manager|sharded] [--messages 5000] [--bursts 5]
+                             [--pause 1.0] [--rate 0] [--accounts 3] [--shards 4] [--signal-ratio 0.3]
+                             [--latency-ms 40] [--reject-rate 0.01] [--rate-limit 0]
+
+Synthetic Telegram messages (chatter plus option and equity signals) are fed
+through TelegramListener.on_message, the same path Telethon events take, in
+`--bursts` bursts separated by `--pause` seconds (`--rate` messages/sec within a
+burst, 0 = as fast as possible). Orders go to broker_sim.SimulatedGroww.
+
+- main: main.py's handler places every signal straight away.
+- manager: signal_loader.py's handler journals the signals and a
+  MultiAccountManager in the same process picks them up, waits for the trigger
+  (prices are generated just below the simulated LTP, so it fires on the first
+  watcher tick) and fans out to `--accounts` simulated accounts.
+- sharded: as manager, but the accounts are split across `--shards` worker
+  processes by shard_executor.py's coordinator (running in this process).
+
+Reports throughput and the latency of every traced stage; "end_to_end" is from
+the message reaching the listener to the last account's broker ack. Everything
+runs in a scratch directory (--workdir), so journals, queues and WALs of a real
+deployment are left alone. The scratch directory gets an instrument master for
+the generated symbols; --live-search leaves it out so every new symbol costs a
+simulated search_scrip round-trip.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CHANNEL_BASE = -1009000000000
+
+
+def configure(args):
+    # Must run before the bot modules are imported: Config reads the environment at import
+    os.environ.update({
+        "DRY_RUN": "false",
+        "BROKER_SIMULATOR": "true",
+        "LATENCY_TRACING": "true",
+        "LOG_LEVEL": args.log_level,
+        "STARTUP_EXIT_WHEN_READY": "false",
+        "SIM_LATENCY_MS": str(args.latency_ms),
+        "SIM_LATENCY_JITTER_MS": str(args.jitter_ms),
+        "SIM_REJECT_RATE": str(args.reject_rate),
+        "SIM_RATE_LIMIT": str(args.rate_limit),
+        "PRICE_WATCH_INTERVAL": str(args.watch_interval),
+        "ACCOUNT_ORDER_RATE": str(args.account_rate),
+        "BROKER_WORKERS": str(args.workers),
+        "SIGNAL_BATCH_WINDOW": str(args.batch_window),
+        "RISK_MAX_SYMBOL_POSITIONS": "0",  # The manager target re-signals the same symbols while positions are open
+        "INSTRUMENT_MASTER_FILE": "instruments.csv",
+        "CHANNELS_FILE": "channels.json",
+        "TELEGRAM_CHANNEL_ID": ",".join(str(CHANNEL_BASE - i) for i in range(args.channels)),
+    })
+    os.environ.setdefault("CONTRACT_SPECS_FILE", os.path.join(HERE, "contract_specs.csv"))
+    os.chdir(args.workdir)
+    sys.path.insert(0, HERE)
+
+
+class Event:
+    """
+    The parts of a Telethon NewMessage event that TelegramListener reads.
+    """
+    __slots__ = ("raw_text", "chat_id", "id")
+
+    def __init__(self, raw_text, chat_id, message_id):
+        self.raw_text = raw_text
+        self.chat_id = chat_id
+        self.id = message_id
+
+
+def build_messages(n, signal_ratio, channels, seed):
+    """
+    Returns [(text, channel_id, key)], key being (symbol, trigger) for signals and None
+    for chatter. Triggers sit just below the simulated opening price and are unique,
+    so no signal is dropped as a duplicate.
+    """
+    from bench_signal_parser import CHATTER, STOCKS, UNDERLYINGS
+    from broker_sim import SimulatedMarket, sim_trading_symbol
+
+    rng = random.Random(seed)
+    used = set()
+    messages = []
+    for i in range(n):
+        channel_id = CHANNEL_BASE - rng.randrange(channels)
+        if rng.random() >= signal_ratio:
+            messages.append((rng.choice(CHATTER), channel_id, None))
+            continue
+        while True:
+            if rng.random() < 0.8:
+                symbol = f"{rng.choice(UNDERLYINGS)} {rng.randrange(20000, 60000, 100)} {rng.choice(['CE', 'PE'])}"
+            else:
+                symbol = rng.choice(STOCKS)
+            price = int(SimulatedMarket.opening_price(sim_trading_symbol(symbol)) * 0.97)
+            if (symbol, price) not in used:
+                break
+        used.add((symbol, price))
+        if " " in symbol:
+            text = f"{symbol}\nAbove : {price}\nSL : {price - 10}\nTGT : {price + 10}/{price + 20}\nTrade at your own risk"
+        else:
+            text = f"BUY {symbol} AT {price} SL {price - 20} TGT {price + 40}"
+        messages.append((text, channel_id, (symbol, float(price))))
+    return messages
+
+
+def sim_accounts(n):
+    return [
+        {"name": f"sim{i}", "api_key": f"sim-key-{i}", "api_secret": "sim", "auth_token": f"sim-token-{i}"}
+        for i in range(n)
+    ]
+
+
+async def inject(listener, messages, bursts, pause, rate, sent):
+    """
+    Feeds the messages to the listener in bursts; returns the injection time in seconds.
+    """
+    per_burst = -(-len(messages) // bursts)
+    started = time.perf_counter()
+    for b in range(bursts):
+        burst_started = time.perf_counter()
+        for i, (text, channel_id, key) in enumerate(messages[b * per_burst:(b + 1) * per_burst]):
+            if key:
+                sent.setdefault(key, time.monotonic())
+            await listener.on_message(Event(text, channel_id, b * per_burst + i))
+            if rate:
+                delay = burst_started + (i + 1) / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif i % 50 == 49:
+                # Let order tasks start, as Telethon would between updates
+                await asyncio.sleep(0)
+        if b < bursts - 1:
+            await asyncio.sleep(pause)
+    return time.perf_counter() - started
+
+
+async def run(args):
+    import latency
+    from signal_router import ChannelProfile, SignalRouter
+    from telegram_bot import TelegramListener
+
+    channels = [ChannelProfile(CHANNEL_BASE - i) for i in range(args.channels)]
+    router = SignalRouter(channels)
+    messages = build_messages(args.messages, args.signal_ratio, args.channels, args.seed)
+    if not args.live_search:
+        from broker_sim import write_instrument_master
+        write_instrument_master("instruments.csv", [key[0] for _, _, key in messages if key])
+    expected = sum(1 for _, _, key in messages if key)
+    sent = {}
+    done = asyncio.Event()
+    completed = []
+    orders = []  # Successful order reports (sharded target)
+
+    def completed_one(symbol, price):
+        started = sent.get((symbol, float(price or 0)))
+        if started is not None:
+            latency.registry.record("end_to_end", int((time.monotonic() - started) * 1e6))
+        completed.append(time.perf_counter())
+        if len(completed) >= expected:
+            done.set()
+
+    if args.target == "main":
+        import main
+        from groww_trader import GrowwTrader
+
+        trader = GrowwTrader()
+        traders = [trader]
+        place_order_async = trader.place_order_async
+
+        async def place_and_record(signal, timeout=None):
+            try:
+                return await place_order_async(signal, timeout)
+            finally:
+                completed_one(signal["symbol"], signal.get("price"))
+
+        trader.place_order_async = place_and_record
+        in_flight = set()
+        handler = main.create_handler(router, trader, in_flight)
+    elif args.target == "sharded":
+        import json
+        import signal_loader
+        from shard_executor import ShardCoordinator
+
+        # The workers load their slice of accounts.json themselves
+        with open("accounts.json", "w") as f:
+            json.dump(sim_accounts(args.accounts), f)
+        coordinator = ShardCoordinator(args.shards)
+        traders = []
+        signal_done = coordinator.signal_done
+
+        def signal_done_and_record(signal_id, entry):
+            signal_done(signal_id, entry)
+            orders.extend(row for row in entry["reports"] if row["success"])
+            completed_one(entry["signal"]["symbol"], entry["signal"].get("price"))
+
+        coordinator.signal_done = signal_done_and_record
+        handler = signal_loader.create_handler(router)
+        consumer = asyncio.create_task(coordinator.start())
+        await asyncio.wait_for(coordinator.wait_connected(), args.timeout)
+    else:
+        import signal_loader
+        from multi_account_manager import MultiAccountManager
+
+        accounts = sim_accounts(args.accounts)
+        manager = MultiAccountManager(accounts)
+        traders = [a["trader"] for a in manager.traders]
+        monitor_and_execute = manager.monitor_and_execute
+
+        async def monitor_and_record(signal, signal_id, positions=None):
+            try:
+                return await monitor_and_execute(signal, signal_id, positions)
+            finally:
+                completed_one(signal["symbol"], signal.get("price"))
+
+        manager.monitor_and_execute = monitor_and_record
+        handler = signal_loader.create_handler(router)
+        consumer = asyncio.create_task(manager.start())
+
+    # Authenticate before the first burst so the numbers are steady-state
+    await asyncio.gather(*(asyncio.to_thread(lambda t=t: t.groww) for t in traders))
+    listener = TelegramListener(handler, channel_ids=router.channel_ids)
+
+    print(f"Injecting {len(messages)} messages ({expected} signals) into {args.target} "
+          f"in {args.bursts} burst(s), {args.channels} channel(s), {args.accounts if args.target == 'sharded' else len(traders)} account(s)...")
+    started = time.perf_counter()
+    injected = await inject(listener, messages, args.bursts, args.pause, args.rate, sent)
+    try:
+        await asyncio.wait_for(done.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        print(f"Timed out with {len(completed)}/{expected} signals completed")
+    elapsed = (completed[-1] if completed else time.perf_counter()) - started
+    if args.target != "main":
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+
+    clients = [t.pool.clients[(t.api_key, t.auth_token)] for t in traders]
+    # The shards' simulated clients live in the worker processes; count their reports instead
+    totals = {"orders": len(orders)} if args.target == "sharded" else {}
+    for client in clients:
+        for name, count in client.stats.items():
+            totals[name] = totals.get(name, 0) + count
+    print(f"Injected {len(messages) / injected:,.0f} msg/s; {len(completed)} signals done in {elapsed:.2f}s "
+          f"({len(completed) / elapsed if elapsed else 0:,.1f} signals/s, {totals.get('orders', 0) / elapsed if elapsed else 0:,.1f} orders/s)")
+    print("Broker: " + ", ".join(f"{name}={count}" for name, count in totals.items()))
+    if args.target == "manager" and manager.batcher:
+        stats = manager.batcher.stats
+        print(f"Batches: {stats['batches']} of {stats['signals'] / stats['batches'] if stats['batches'] else 0:.1f} signals on average, "
+              f"{stats['duplicates']} duplicates, {stats['lookups']} live lookups ({stats['lookups_saved']} saved, "
+              f"~{stats['saved_ms']:,.0f} ms of order latency)")
+    print(f"\n{'Stage':<18}{'Account':<10}{'Count':>8}{'p50 ms':>10}{'p99 ms':>10}{'p99.9 ms':>10}{'Max ms':>10}")
+    for row in latency.registry.to_json():
+        if row["account"] and not (args.per_account or row["account"].startswith("shard")):
+            continue
+        print(f"{row['stage']:<18}{row['account']:<10}{row['count']:>8}{row['p50_us'] / 1000:>10.2f}"
+              f"{row['p99_us'] / 1000:>10.2f}{row['p99.9_us'] / 1000:>10.2f}{row['max_us'] / 1000:>10.2f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--target", choices=["main", "manager", "sharded"], default="main")
+    ap.add_argument("--messages", type=int, default=5000)
+    ap.add_argument("--signal-ratio", type=float, default=0.3, help="Fraction of messages that are signals")
+    ap.add_argument("--bursts", type=int, default=5)
+    ap.add_argument("--pause", type=float, default=1.0, help="Seconds between bursts")
+    ap.add_argument("--rate", type=float, default=0, help="Messages/sec within a burst, 0 = unthrottled")
+    ap.add_argument("--channels", type=int, default=3)
+    ap.add_argument("--accounts", type=int, default=3, help="Simulated accounts (manager and sharded targets)")
+    ap.add_argument("--shards", type=int, default=4, help="Worker processes (sharded target)")
+    ap.add_argument("--latency-ms", type=float, default=40)
+    ap.add_argument("--jitter-ms", type=float, default=15)
+    ap.add_argument("--reject-rate", type=float, default=0.0)
+    ap.add_argument("--rate-limit", type=int, default=0, help="Simulated broker orders/sec per account")
+    ap.add_argument("--account-rate", type=float, default=0, help="ACCOUNT_ORDER_RATE for the dispatcher")
+    ap.add_argument("--workers", type=int, default=16, help="BROKER_WORKERS (threads for broker calls)")
+    ap.add_argument("--batch-window", type=float, default=0, help="SIGNAL_BATCH_WINDOW in seconds (manager and sharded targets)")
+    ap.add_argument("--watch-interval", type=float, default=0.1, help="PRICE_WATCH_INTERVAL (manager and sharded targets)")
+    ap.add_argument("--timeout", type=float, default=120, help="Seconds to wait for the last order")
+    ap.add_argument("--live-search", action="store_true", help="No instrument master: resolve via search_scrip")
+    ap.add_argument("--per-account", action="store_true", help="Also list per-account stages")
+    ap.add_argument("--log-level", default="WARNING")
+    ap.add_argument("--workdir", default=None, help="Scratch directory (default: a new temp dir)")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    args.workdir = args.workdir or tempfile.mkdtemp(prefix="bench_pipeline_")
+
+    configure(args)
+    import log_setup
+    log_setup.setup("bench_pipeline")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
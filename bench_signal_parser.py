@@ -0,0 +1,124 @@
+"""
+Throughput benchmark for SignalParser.
+
+    python bench_signal_parser.py [--messages 20000] [--seed 7]
+
+Builds a corpus that looks like a tip channel (mostly chatter, some option and
+equity signals, a few very long messages) and reports messages/sec and latency
+percentiles for the current parser and the original two-regex parser.
+"""
+import argparse
+import random
+import re
+import time
+from signal_parser import SignalParser
+
+CHATTER = [
+    "Good morning traders! Market looks bullish today.",
+    "Booked profit in yesterday's call, congrats to all members 🎉",
+    "Stay away from overtrading. Follow strict stop loss.",
+    "Nifty holding support near the 200 DMA, wait for confirmation",
+    "Join our premium group for more accurate calls. DM for details",
+    "Expiry day today, trade with small quantity only",
+    "What's the view on bank nifty above 52000?",
+    "SL hit in the morning trade, next call soon",
+]
+UNDERLYINGS = ["NIFTY", "BANKNIFTY", "FINNIFTY", "MIDCPNIFTY", "SENSEX"]
+STOCKS = ["RELIANCE", "TCS", "INFY", "HDFCBANK", "SBIN", "TATAMOTORS"]
+
+
+def option_message(rng):
+    strike = rng.randrange(20000, 60000, 100)
+    price = rng.randrange(50, 400)
+    return (
+        f"{rng.choice(UNDERLYINGS)} {strike} {rng.choice(['CE', 'PE'])}\n"
+        f"Above : {price}\n"
+        f"SL : {price - 10}\n"
+        f"TGT : {price + 10}/{price + 20}/{price + 40}\n"
+        "Trade at your own risk"
+    )
+
+
+def equity_message(rng):
+    price = rng.randrange(100, 3000)
+    return f"{rng.choice(['BUY', 'SELL'])} {rng.choice(STOCKS)} AT {price} SL {price - 20} TGT {price + 40}"
+
+
+def long_message(rng):
+    # Long chatty post that mentions the keywords without being a signal
+    words = " ".join(rng.choice(CHATTER) for _ in range(200))
+    return f"NIFTY 26100 PE\nAbove levels to watch:\n{words}\nSL discipline matters, TGT later"
+
+
+def build_corpus(n, seed):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        roll = rng.random()
+        if roll < 0.70:
+            corpus.append(rng.choice(CHATTER))
+        elif roll < 0.85:
+            corpus.append(option_message(rng))
+        elif roll < 0.97:
+            corpus.append(equity_message(rng))
+        else:
+            corpus.append(long_message(rng))
+    return corpus
+
+
+class LegacyParser:
+    """
+    The original sequential two-regex parser, kept here as the baseline.
+    """
+    def __init__(self):
+        self.simple_pattern = re.compile(r"(?i)\b(BUY|SELL)\b\s+([A-Z0-9]+)\s+(?:AT\s+)?([\d\.]+)\s+(?:SL\s+)?([\d\.]+)\s+(?:TGT|TARGET)\s+([\d\.]+)")
+        self.option_pattern = re.compile(
+            r"(?i)^([A-Z\s\d]+(?:CE|PE))\s*\n"
+            r".*?Above\s*:\s*([\d\.]+)\s*\n"
+            r".*?SL\s*:\s*([\d\.]+)\s*\n"
+            r".*?TGT\s*:\s*([\d\.]+)",
+            re.MULTILINE | re.DOTALL
+        )
+
+    def parse(self, text):
+        return self.option_pattern.search(text) or self.simple_pattern.search(text)
+
+
+def run(name, parse, corpus):
+    latencies = []
+    found = 0
+    started = time.perf_counter()
+    for text in corpus:
+        t0 = time.perf_counter()
+        if parse(text):
+            found += 1
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1e6
+    print(
+        f"{name:<8} {len(corpus) / elapsed:>12,.0f} msg/s  signals={found:<6} "
+        f"p50={pct(0.50):.1f}us  p99={pct(0.99):.1f}us  max={latencies[-1] * 1e6:.1f}us"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages", type=int, default=20000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    corpus = build_corpus(args.messages, args.seed)
+    print(f"Corpus: {len(corpus)} messages, {sum(map(len, corpus)) / 1024:.0f} KiB")
+    run("legacy", LegacyParser().parse, corpus)
+    run("current", SignalParser().parse, corpus)
+
+    parser = SignalParser()
+    started = time.perf_counter()
+    parser.parse_many(corpus)
+    print(f"parse_many {len(corpus) / (time.perf_counter() - started):>10,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
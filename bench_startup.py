@@ -0,0 +1,70 @@
+"""
+Cold-start benchmark: process launch to "ready to trade" for each entry point.
+
+    python bench_startup.py [--runs 5] [--telegram]
+
+Every run starts a fresh interpreter with STARTUP_EXIT_WHEN_READY=true, so the
+entry point exits as soon as it would start consuming signals and prints its
+startup breakdown. Each entry point is measured with background initialisation
+(STARTUP_BACKGROUND_INIT, the default) and with the old synchronous startup.
+signal_loader and main only become ready after connecting to Telegram, so
+they need a logged-in session and --telegram. Run it from the directory holding
+.env, accounts.json and the journal, as you would the bot.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TRADERS = ["csv_trader.py", "multi_account_manager.py"]
+LISTENERS = ["signal_loader.py", "main.py"]
+
+
+def run_once(script, background, timeout):
+    env = dict(os.environ, STARTUP_EXIT_WHEN_READY="true", STARTUP_BACKGROUND_INIT=str(background), LOG_LEVEL="WARNING")
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, os.path.join(HERE, script)], env=env, capture_output=True, text=True, timeout=timeout)
+    wall_ms = (time.perf_counter() - started) * 1000
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"{script} exited with {proc.returncode}: {proc.stderr.strip()[-300:]}")
+    return wall_ms, json.loads(lines[-1])
+
+
+def import_time(module, timeout):
+    started = time.perf_counter()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [HERE, os.environ.get("PYTHONPATH")])))
+    subprocess.run([sys.executable, "-c", f"import {module}"], env=env, check=True, capture_output=True, timeout=timeout)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--telegram", action="store_true", help="Also measure the Telegram entry points")
+    ap.add_argument("--timeout", type=float, default=60)
+    args = ap.parse_args()
+
+    scripts = TRADERS + (LISTENERS if args.telegram else [])
+    print(f"{'Entry point':<28}{'Mode':<12}{'Wall p50':>10}{'Wall min':>10}{'In-proc':>10}  Phases (ms, last run)")
+    for script in scripts:
+        imports = statistics.median(import_time(script[:-3], args.timeout) for _ in range(args.runs))
+        for background in (True, False):
+            walls, report = [], None
+            for _ in range(args.runs):
+                wall, report = run_once(script, background, args.timeout)
+                walls.append(wall)
+            phases = " ".join(f"{name}={ms:.0f}" for name, ms in report["phases"].items())
+            print(
+                f"{script:<28}{'background' if background else 'sync':<12}{statistics.median(walls):>9.0f}ms"
+                f"{min(walls):>8.0f}ms{report['total_ms']:>8.0f}ms  {phases}"
+            )
+        print(f"{'':<28}{'import only':<12}{imports:>9.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
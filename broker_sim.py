@@ -0,0 +1,215 @@
+"""
+In-process stand-in for growwapi.GrowwAPI, for load tests and local runs.
+
+Set BROKER_SIMULATOR=true (with DRY_RUN=false) and client_pool hands out a
+SimulatedGroww instead of connecting to Groww. It implements the calls the bot
+makes (set_access_token, search_scrip, place_order, get_ltp,
+get_order_status_by_reference, get_position_for_trading_symbol,
+get_available_margin_details) with:
+
+- SIM_LATENCY_MS / SIM_LATENCY_JITTER_MS: per-call delay (the calls block, like the SDK)
+- SIM_REJECT_RATE: fraction of orders rejected with an exception
+- SIM_RATE_LIMIT: orders per second per client before "rate limit exceeded"
+- SIM_VOLATILITY: per-second volatility of the synthetic price stream
+- SIM_FILL_DELAY_MS: how long a stop (SL_LIMIT/SL_MARKET) order stays OPEN before it fills
+
+Every client shares one SimulatedMarket, whose prices are random walks that
+advance with wall-clock time whenever they are read. write_instrument_master()
+produces a matching instruments.csv so symbols resolve offline, as in production.
+"""
+import csv
+import itertools
+import logging
+import math
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import date, timedelta
+from config import Config
+from scrip_resolver import parse_symbol
+
+logger = logging.getLogger(__name__)
+
+
+class SimulatedMarket:
+    """
+    Synthetic last-traded prices keyed by trading symbol. A symbol starts at a
+    price derived from its name (50-450, so option-style premiums) and then
+    follows a geometric random walk.
+    """
+    def __init__(self, volatility=None, seed=None):
+        self.volatility = Config.SIM_VOLATILITY if volatility is None else volatility
+        self.prices = {}  # trading symbol -> [price, updated (monotonic)]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def opening_price(symbol):
+        return 50.0 + zlib.crc32(symbol.encode()) % 40000 / 100
+
+    def price(self, symbol):
+        now = time.monotonic()
+        with self._lock:
+            entry = self.prices.get(symbol)
+            if entry is None:
+                entry = self.prices[symbol] = [self.opening_price(symbol), now]
+            elif self.volatility and now > entry[1]:
+                step = self.volatility * math.sqrt(now - entry[1]) * self._rng.gauss(0, 1)
+                entry[0] = round(max(0.05, entry[0] * math.exp(step)), 2)
+                entry[1] = now
+            return entry[0]
+
+    def set_price(self, symbol, price):
+        with self._lock:
+            self.prices[symbol] = [float(price), time.monotonic()]
+
+
+class SimulatedGroww:
+    """
+    Fake GrowwAPI client for one account. Orders are kept in memory and can be
+    looked up by order_reference_id; a reference that was already accepted is
+    rejected as a duplicate, like the broker does. Market orders fill at once;
+    stop orders are OPEN until SIM_FILL_DELAY_MS has passed, then fill at their limit.
+    """
+    SEGMENT_CASH = "CASH"
+    SEGMENT_FNO = "FNO"
+
+    _order_ids = itertools.count(1)
+
+    def __init__(self, api_key=None, api_secret=None, market=None, latency_ms=None, jitter_ms=None,
+                 reject_rate=None, rate_limit=None, fill_delay_ms=None, seed=None):
+        self.api_key = api_key
+        self.market = market or get_market()
+        self.latency_ms = Config.SIM_LATENCY_MS if latency_ms is None else latency_ms
+        self.jitter_ms = Config.SIM_LATENCY_JITTER_MS if jitter_ms is None else jitter_ms
+        self.reject_rate = Config.SIM_REJECT_RATE if reject_rate is None else reject_rate
+        self.rate_limit = Config.SIM_RATE_LIMIT if rate_limit is None else rate_limit
+        self.fill_delay_ms = Config.SIM_FILL_DELAY_MS if fill_delay_ms is None else fill_delay_ms
+        self.orders = {}  # groww_order_id -> order
+        self.by_reference = {}
+        self.sent = deque()  # monotonic times of orders in the last second
+        self.stats = {"orders": 0, "rejected": 0, "rate_limited": 0, "duplicates": 0, "quotes": 0, "searches": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self):
+        if self.latency_ms or self.jitter_ms:
+            time.sleep(max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms)) / 1000)
+
+    def set_access_token(self, token):
+        self._delay()
+
+    def search_scrip(self, query):
+        self._delay()
+        self.stats["searches"] += 1
+        trading_symbol = sim_trading_symbol(query)
+        return [{"searchId": f"SIM{zlib.crc32(trading_symbol.encode()):08X}", "displayName": query, "tradingSymbol": trading_symbol}]
+
+    def get_ltp(self, segment, exchange_trading_symbols):
+        self._delay()
+        self.stats["quotes"] += 1
+        if isinstance(exchange_trading_symbols, str):
+            exchange_trading_symbols = (exchange_trading_symbols,)
+        return {key: self.market.price(key.split("_", 1)[-1]) for key in exchange_trading_symbols}
+
+    def get_available_margin_details(self):
+        self._delay()
+        return {"clear_cash": 1e9, "fno_margin_details": {"option_buy_balance_available": 1e9}}
+
+    def place_order(self, **order):
+        self._delay()
+        now = time.monotonic()
+        reference = order.get("order_reference_id")
+        with self._lock:
+            while self.sent and now - self.sent[0] >= 1:
+                self.sent.popleft()
+            if self.rate_limit and len(self.sent) >= self.rate_limit:
+                self.stats["rate_limited"] += 1
+                raise Exception(f"Rate limit exceeded ({self.rate_limit} orders/s)")
+            self.sent.append(now)
+            if reference and reference in self.by_reference:
+                self.stats["duplicates"] += 1
+                raise Exception(f"Duplicate order_reference_id {reference}")
+            if self.reject_rate and self._rng.random() < self.reject_rate:
+                self.stats["rejected"] += 1
+                raise Exception("Order rejected by exchange (simulated)")
+
+            order_id = f"SIMORD{next(self._order_ids):09d}"
+            status = "OPEN" if order.get("order_type") in ("SL_LIMIT", "SL_MARKET") else "EXECUTED"
+            record = dict(order, groww_order_id=order_id, order_status=status, placed_at=time.time(),
+                          filled_quantity=order.get("quantity", 0) if status == "EXECUTED" else 0)
+            self.orders[order_id] = record
+            if reference:
+                self.by_reference[reference] = record
+            self.stats["orders"] += 1
+        return {"groww_order_id": order_id, "order_status": status, "order_reference_id": reference}
+
+    def _fill_due(self, order):
+        if order["order_status"] == "OPEN" and time.time() - order["placed_at"] >= self.fill_delay_ms / 1000:
+            order.update(order_status="EXECUTED", filled_quantity=order.get("quantity", 0),
+                         average_fill_price=order.get("price") or order.get("trigger_price"))
+
+    def get_position_for_trading_symbol(self, trading_symbol, segment=None):
+        # Net executed quantity; orders carry the security ID from the master or from search_scrip
+        self._delay()
+        token = zlib.crc32(trading_symbol.encode())
+        ids = {str(token), f"SIM{token:08X}"}
+        quantity = 0
+        with self._lock:
+            for order in self.orders.values():
+                if str(order.get("security_id")) in ids:
+                    self._fill_due(order)
+                    sign = -1 if order.get("transaction_type") == "SELL" else 1
+                    quantity += sign * order["filled_quantity"]
+        return {"positions": [{"trading_symbol": trading_symbol, "quantity": quantity}]}
+
+    def get_order_status_by_reference(self, order_reference_id, segment=None):
+        self._delay()
+        order = self.by_reference.get(order_reference_id)
+        if order is None:
+            raise Exception(f"No order with reference {order_reference_id}")
+        with self._lock:
+            self._fill_due(order)
+        return {"groww_order_id": order["groww_order_id"], "order_status": order["order_status"],
+                "filled_quantity": order["filled_quantity"], "average_fill_price": order.get("average_fill_price")}
+
+
+def sim_trading_symbol(symbol):
+    return "".join(str(symbol).upper().split())
+
+
+def write_instrument_master(path, symbols, expiry=None):
+    """
+    Writes an instrument master in the Groww instrument.csv layout covering `symbols`,
+    with trading symbols that SimulatedGroww quotes. Options expire in a week by default.
+    """
+    expiry = expiry or date.today() + timedelta(days=7)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["exchange", "exchange_token", "trading_symbol", "name", "underlying_symbol",
+                         "strike_price", "expiry_date", "instrument_type"])
+        for symbol in sorted(set(symbols)):
+            parsed = parse_symbol(symbol)
+            if parsed is None:
+                continue
+            trading_symbol = sim_trading_symbol(symbol)
+            token = zlib.crc32(trading_symbol.encode())
+            if parsed.option_type == "EQ":
+                writer.writerow(["NSE", token, trading_symbol, symbol, "", "", "", "EQ"])
+            else:
+                writer.writerow(["NSE", token, trading_symbol, symbol, parsed.underlying, parsed.strike,
+                                 expiry.isoformat(), parsed.option_type])
+
+
+_market = None
+_market_lock = threading.Lock()
+
+
+def get_market():
+    global _market
+    with _market_lock:
+        if _market is None:
+            _market = SimulatedMarket()
+        return _market
@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+PING_SYMBOL = "RELIANCE"  # Cheap authenticated call used as a health check
+AUTH_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="auth")
+
+
+class GrowwClientPool:
+    """
+    Holds one authenticated GrowwAPI client per account and hands the same client
+    to every place_order, search and quote call. The SDK's HTTP session lives on
+    the client, so reusing it keeps connections warm; a background thread pings
+    each client periodically, re-authenticates the ones that fail, and pre-warms
+    all of them at market open.
+    """
+    def __init__(self, ping_interval=None, prewarm_at=None):
+        self.ping_interval = ping_interval or Config.CLIENT_PING_INTERVAL
+        self.prewarm_at = prewarm_at or Config.MARKET_PREWARM_TIME
+        self.clients = {}
+        self.credentials = {}
+        self.pending = {}  # key -> Future of a background authentication
+        self.uses = 0
+        self.reuses = 0
+        self.reconnects = 0
+        self.failed_pings = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._prewarmed_on = None
+
+    def _connect(self, key):
+        api_key, api_secret, auth_token = self.credentials[key]
+        if Config.BROKER_SIMULATOR:
+            from broker_sim import SimulatedGroww
+            client = SimulatedGroww(api_key, api_secret)
+            client.set_access_token(auth_token)
+            return client
+
+        # Imported on first connect: the SDK is heavy and not needed to start consuming signals
+        from growwapi import GrowwAPI
+
+        client = GrowwAPI(api_key, api_secret)
+        client.set_access_token(auth_token)
+        return client
+
+    def get(self, api_key, api_secret, auth_token):
+        """
+        Returns the pooled client for these credentials, authenticating on first use.
+        """
+        key = (api_key, auth_token)
+        with self._lock:
+            self.uses += 1
+            client = self.clients.get(key)
+            if client is not None:
+                self.reuses += 1
+                return client
+            pending = self.pending.get(key)
+
+        if pending is not None:
+            # Background authentication in flight: wait for it rather than start another
+            try:
+                return pending.result()
+            except Exception as e:
+                logger.warning(f"Background authentication failed, retrying: {e}")
+
+        with self._lock:
+            client = self.clients.get(key)
+            if client is not None:
+                return client
+            self.credentials[key] = (api_key, api_secret, auth_token)
+        # Authenticate outside the lock so other accounts' calls aren't held up
+        client = self._connect(key)
+        with self._lock:
+            # A concurrent get() for the same account may have won; keep its client
+            client = self.clients.setdefault(key, client)
+        self.start()
+        return client
+
+    def connect_async(self, api_key, api_secret, auth_token):
+        """
+        Starts authenticating these credentials on a background thread and returns
+        the Future. get() for the same credentials waits on it instead of reconnecting.
+        """
+        key = (api_key, auth_token)
+        with self._lock:
+            if key in self.clients:
+                future = Future()
+                future.set_result(self.clients[key])
+                return future
+            future = self.pending.get(key)
+            if future is None:
+                self.credentials[key] = (api_key, api_secret, auth_token)
+                future = self.pending[key] = AUTH_EXECUTOR.submit(self._connect_pending, key)
+        return future
+
+    def _connect_pending(self, key):
+        try:
+            client = self._connect(key)
+            with self._lock:
+                self.clients[key] = client
+        finally:
+            with self._lock:
+                self.pending.pop(key, None)
+        self.start()
+        return client
+
+    def reconnect(self, key):
+        # The old client keeps serving until the new one is authenticated
+        client = self._connect(key)
+        with self._lock:
+            self.clients[key] = client
+            self.reconnects += 1
+        logger.warning("Re-authenticated Groww client after failed health check")
+
+    def ping(self, key):
+        client = self.clients.get(key)
+        try:
+            client.search_scrip(PING_SYMBOL)
+            return True
+        except Exception as e:
+            self.failed_pings += 1
+            logger.warning(f"Groww health check failed: {e}")
+            try:
+                self.reconnect(key)
+            except Exception as e:
+                logger.error(f"Failed to re-authenticate Groww client: {e}")
+            return False
+
+    def prewarm(self):
+        """
+        Pings every client concurrently so the next order finds warm connections.
+        """
+        keys = list(self.clients)
+        if not keys:
+            return 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(16, len(keys)), thread_name_prefix="prewarm") as pool:
+            healthy = sum(pool.map(self.ping, keys))
+        logger.info(f"Pre-warmed {healthy}/{len(keys)} Groww clients in {time.perf_counter() - started:.2f}s")
+        return healthy
+
+    def _due_for_market_open(self):
+        now = datetime.now()
+        if self._prewarmed_on == now.date() or now.strftime("%H:%M") < self.prewarm_at:
+            return False
+        self._prewarmed_on = now.date()
+        return True
+
+    def _run(self):
+        last_ping = time.monotonic()
+        while not self._stop.wait(1):
+            if self._due_for_market_open():
+                self.prewarm()
+                last_ping = time.monotonic()
+            elif time.monotonic() - last_ping >= self.ping_interval:
+                self.prewarm()
+                last_ping = time.monotonic()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="groww-health", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            "active_connections": len(self.clients),
+            "uses": self.uses,
+            "reuse_ratio": self.reuses / self.uses if self.uses else 0.0,
+            "reconnects": self.reconnects,
+            "failed_pings": self.failed_pings,
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = GrowwClientPool()
+        return _pool
@@ -12,17 +12,106 @@ class Config:
     GROWW_API_SECRET = os.getenv("GROWW_API_SECRET")
     GROWW_AUTH_TOKEN = os.getenv("GROWW_AUTH_TOKEN")
     
-    TELEGRAM_CHANNEL_ID = os.getenv("TELEGRAM_CHANNEL_ID")
+    TELEGRAM_CHANNEL_ID = os.getenv("TELEGRAM_CHANNEL_ID")  # One ID, or several comma-separated
+    CHANNELS_FILE = os.getenv("CHANNELS_FILE", "channels.json")  # Per-channel parser profiles
+    TELEGRAM_ENTITY_CACHE = os.getenv("TELEGRAM_ENTITY_CACHE", "telegram_entities.json")
+    SIGNAL_DEDUP_WINDOW = float(os.getenv("SIGNAL_DEDUP_WINDOW", "120"))  # Seconds, 0 = off
     
+    SIGNAL_CSV_FILE = os.getenv("SIGNAL_CSV_FILE", "trade_signals.csv")
+    SIGNAL_JOURNAL_ROTATE = os.getenv("SIGNAL_JOURNAL_ROTATE", "False").lower() == "true"
+    SIGNAL_NOTIFY_MODE = os.getenv("SIGNAL_NOTIFY_MODE", "inotify")  # poll, inotify or socket
+    SIGNAL_SOCKET = os.getenv("SIGNAL_SOCKET", "signal_loader.sock")
+    SIGNAL_QUEUE_DB = os.getenv("SIGNAL_QUEUE_DB", "signal_queue_{consumer}.db")
+    QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "3"))
+    QUEUE_COMMIT_BATCH = int(os.getenv("QUEUE_COMMIT_BATCH", "64"))  # Queue writes per commit
+    QUEUE_COMMIT_INTERVAL = float(os.getenv("QUEUE_COMMIT_INTERVAL", "0.05"))  # Max seconds an outcome stays uncommitted
+    QUEUE_FSYNC = os.getenv("QUEUE_FSYNC", "True").lower() == "true"
+    PROCESSED_IDS_LIMIT = int(os.getenv("PROCESSED_IDS_LIMIT", "50000"))  # Finished queue items (and shard signal IDs) kept
+    SIGNAL_WATCH_POLL_INTERVAL = float(os.getenv("SIGNAL_WATCH_POLL_INTERVAL", "0.2"))
+
+    INSTRUMENT_MASTER_FILE = os.getenv("INSTRUMENT_MASTER_FILE", "instruments.csv")
+    INSTRUMENT_ID_COLUMN = os.getenv("INSTRUMENT_ID_COLUMN", "exchange_token")
+    SCRIP_CACHE_FILE = os.getenv("SCRIP_CACHE_FILE", "scrip_cache.json")
+    SCRIP_CACHE_SIZE = int(os.getenv("SCRIP_CACHE_SIZE", "2048"))
+    SCRIP_CACHE_TTL = int(os.getenv("SCRIP_CACHE_TTL", "21600"))  # Seconds
+
+    BROKER_WORKERS = int(os.getenv("BROKER_WORKERS", "16"))  # Threads for blocking growwapi calls
+    BROKER_CALL_TIMEOUT = float(os.getenv("BROKER_CALL_TIMEOUT", "10"))  # Seconds per async broker call
+    ACCOUNT_ORDER_RATE = float(os.getenv("ACCOUNT_ORDER_RATE", "10"))  # Orders/sec per account, 0 = unlimited
+    GLOBAL_ORDER_RATE = float(os.getenv("GLOBAL_ORDER_RATE", "0"))  # Orders/sec across accounts, 0 = unlimited
+    SIGNAL_BATCH_WINDOW = float(os.getenv("SIGNAL_BATCH_WINDOW", "0"))  # Seconds to collect a burst into one batch, 0 = off
+    SIGNAL_BATCH_MAX = int(os.getenv("SIGNAL_BATCH_MAX", "50"))  # Signals per batch before it is sent early
+
+    # Sharded execution (shard_executor.py): accounts split across worker processes
+    SHARD_COUNT = int(os.getenv("SHARD_COUNT", "4"))
+    SHARD_SOCKET = os.getenv("SHARD_SOCKET", "shard_executor.sock")  # Coordinator <-> worker Unix socket
+    SHARD_HEARTBEAT = float(os.getenv("SHARD_HEARTBEAT", "2"))  # Seconds between worker pings
+    SHARD_HEARTBEAT_TIMEOUT = float(os.getenv("SHARD_HEARTBEAT_TIMEOUT", "15"))  # Silent this long = hung, restarted
+    SHARD_RESTART_BACKOFF = float(os.getenv("SHARD_RESTART_BACKOFF", "30"))  # Max seconds between restarts
+
+    PRICE_WATCH_INTERVAL = float(os.getenv("PRICE_WATCH_INTERVAL", "2"))  # Seconds between bulk LTP polls
+    FILL_POLL_INTERVAL = float(os.getenv("FILL_POLL_INTERVAL", "1"))  # Seconds between entry order status checks
+    FILL_POLL_MAX_INTERVAL = float(os.getenv("FILL_POLL_MAX_INTERVAL", "30"))  # Backoff cap for entries resting at the broker
+    FILL_CHECK_WORKERS = int(os.getenv("FILL_CHECK_WORKERS", "2"))  # Threads for order status checks
+
+    CLIENT_PING_INTERVAL = int(os.getenv("CLIENT_PING_INTERVAL", "60"))  # Seconds between health pings
+    MARKET_PREWARM_TIME = os.getenv("MARKET_PREWARM_TIME", "09:14")  # HH:MM local time
+
+    BACKFILL_CHECKPOINT_FILE = os.getenv("BACKFILL_CHECKPOINT_FILE", "backfill_checkpoint.json")
+    BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "500"))
+    BACKFILL_ON_START = os.getenv("BACKFILL_ON_START", "True").lower() == "true"  # signal_loader catches up before listening
+
+    POSITION_WAL_FILE = os.getenv("POSITION_WAL_FILE", "positions.wal")
+    POSITION_HISTORY_FILE = os.getenv("POSITION_HISTORY_FILE", "positions_closed.jsonl")  # Closed positions, for the archive
+
+    HISTORY_DIR = os.getenv("HISTORY_DIR", "history")  # Parquet archive written by history_archive.py
+    HISTORY_ROW_GROUP = int(os.getenv("HISTORY_ROW_GROUP", "65536"))  # Rows per Parquet row group
+
+    CONTRACT_SPECS_FILE = os.getenv("CONTRACT_SPECS_FILE", "contract_specs.csv")
+    CONTRACT_SPECS_RELOAD = float(os.getenv("CONTRACT_SPECS_RELOAD", "5"))  # Seconds between mtime checks
+    LOTS_PER_ORDER = int(os.getenv("LOTS_PER_ORDER", "1"))
+
+    # Pre-trade risk limits; 0 disables a check. Per account unless prefixed GLOBAL.
+    RISK_MAX_OPEN_POSITIONS = int(os.getenv("RISK_MAX_OPEN_POSITIONS", "0"))
+    RISK_MAX_NOTIONAL = float(os.getenv("RISK_MAX_NOTIONAL", "0"))  # Rupees at trigger price
+    RISK_MAX_SYMBOL_POSITIONS = int(os.getenv("RISK_MAX_SYMBOL_POSITIONS", "1"))
+    RISK_MAX_SYMBOL_NOTIONAL = float(os.getenv("RISK_MAX_SYMBOL_NOTIONAL", "0"))
+    RISK_MAX_DAILY_LOSS = float(os.getenv("RISK_MAX_DAILY_LOSS", "0"))  # Realised, in rupees
+    RISK_MAX_ORDER_RATE = float(os.getenv("RISK_MAX_ORDER_RATE", "0"))  # Orders/sec, rejects rather than waits
+    RISK_GLOBAL_MAX_NOTIONAL = float(os.getenv("RISK_GLOBAL_MAX_NOTIONAL", "0"))
+    RISK_GLOBAL_MAX_DAILY_LOSS = float(os.getenv("RISK_GLOBAL_MAX_DAILY_LOSS", "0"))
+    RISK_GLOBAL_MAX_ORDER_RATE = float(os.getenv("RISK_GLOBAL_MAX_ORDER_RATE", "0"))
+    RISK_MARGIN_REFRESH = float(os.getenv("RISK_MARGIN_REFRESH", "30"))  # Seconds, 0 = no margin check
+
+    LATENCY_TRACING = os.getenv("LATENCY_TRACING", "False").lower() == "true"
+    LATENCY_METRICS_PORT = int(os.getenv("LATENCY_METRICS_PORT", "0"))  # 0 = no HTTP endpoint
+    LATENCY_DUMP_DIR = os.getenv("LATENCY_DUMP_DIR", "")  # Write latency_<process>.json here on exit
+
+    STARTUP_BACKGROUND_INIT = os.getenv("STARTUP_BACKGROUND_INIT", "True").lower() == "true"  # Auth + instrument master off the startup path
+    STARTUP_EXIT_WHEN_READY = os.getenv("STARTUP_EXIT_WHEN_READY", "False").lower() == "true"  # Used by bench_startup.py
+
+    # Local broker simulator (broker_sim.py) in place of growwapi; needs DRY_RUN=false
+    BROKER_SIMULATOR = os.getenv("BROKER_SIMULATOR", "False").lower() == "true"
+    SIM_LATENCY_MS = float(os.getenv("SIM_LATENCY_MS", "40"))  # Mean delay per simulated call
+    SIM_LATENCY_JITTER_MS = float(os.getenv("SIM_LATENCY_JITTER_MS", "15"))
+    SIM_REJECT_RATE = float(os.getenv("SIM_REJECT_RATE", "0"))  # Fraction of orders rejected
+    SIM_RATE_LIMIT = int(os.getenv("SIM_RATE_LIMIT", "0"))  # Orders/sec per client, 0 = unlimited
+    SIM_VOLATILITY = float(os.getenv("SIM_VOLATILITY", "0.002"))  # Per-second volatility of simulated prices
+    SIM_FILL_DELAY_MS = float(os.getenv("SIM_FILL_DELAY_MS", "100"))  # Time a simulated stop order stays OPEN
+
     DRY_RUN = os.getenv("DRY_RUN", "True").lower() == "true"
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text or json (one JSON object per line)
+    LOG_FILE = os.getenv("LOG_FILE", "")  # Also write logs here
+    LOG_SAMPLE_INTERVAL = float(os.getenv("LOG_SAMPLE_INTERVAL", "30"))  # Seconds between repeats of sampled log lines
 
     @classmethod
     def validate(cls):
         missing = []
         if not cls.TELEGRAM_API_ID: missing.append("TELEGRAM_API_ID")
         if not cls.TELEGRAM_API_HASH: missing.append("TELEGRAM_API_HASH")
-        if not cls.TELEGRAM_CHANNEL_ID: missing.append("TELEGRAM_CHANNEL_ID")
+        if not cls.TELEGRAM_CHANNEL_ID and not os.path.exists(cls.CHANNELS_FILE):
+            missing.append("TELEGRAM_CHANNEL_ID (or CHANNELS_FILE)")
         
         if missing:
             raise ValueError(f"Missing required configuration: {', '.join(missing)}")
@@ -0,0 +1,154 @@
+import csv
+import logging
+import os
+import re
+import threading
+import time
+from config import Config
+from scrip_resolver import normalize_symbol, parse_symbol
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UNDERLYING = "*"  # Row used for equities and anything not listed
+COMPACT_OPTION_SUFFIX = re.compile(r"\d[0-9A-Z.]*(?:CE|PE)$")  # What follows the underlying in "NIFTY26100PE"
+
+
+class ContractSpec:
+    __slots__ = ("underlying", "exchange", "lot_size", "tick_size", "freeze_qty", "product_type")
+
+    def __init__(self, underlying, exchange="NSE", lot_size=1, tick_size=0.05, freeze_qty=None, product_type="I_FO"):
+        self.underlying = underlying
+        self.exchange = exchange
+        self.lot_size = lot_size
+        self.tick_size = tick_size
+        self.freeze_qty = freeze_qty
+        self.product_type = product_type
+
+    def __repr__(self):
+        return f"ContractSpec({self.underlying}, lot={self.lot_size}, freeze={self.freeze_qty}, {self.exchange})"
+
+
+class ContractRegistry:
+    """
+    Contract specs (lot size, tick size, freeze quantity, exchange, product type)
+    per underlying, loaded from CONTRACT_SPECS_FILE.
+
+    Lookups are O(1): each symbol is parsed once into its exact underlying
+    (so MIDCPNIFTY never matches NIFTY) and memoised. Compact option names the
+    parser can't split ("NIFTY26100PE") match the longest listed underlying prefix.
+    The file is re-checked at most every CONTRACT_SPECS_RELOAD seconds and reloaded
+    when its mtime changes.
+    """
+    def __init__(self, path=None, reload_interval=None):
+        self.path = path or Config.CONTRACT_SPECS_FILE
+        self.reload_interval = Config.CONTRACT_SPECS_RELOAD if reload_interval is None else reload_interval
+        self.specs = {}
+        self.prefixes = []
+        self.symbol_index = {}
+        self.default = ContractSpec(DEFAULT_UNDERLYING)
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, "r", newline="") as f:
+                rows = list(csv.DictReader(f))
+        except FileNotFoundError:
+            logger.warning(f"Contract specs {self.path} not found, using lot size 1 for everything")
+            return
+
+        specs = {}
+        for row in rows:
+            try:
+                spec = ContractSpec(
+                    underlying=row["underlying"].strip().upper(),
+                    exchange=(row.get("exchange") or "NSE").strip().upper(),
+                    lot_size=int(row["lot_size"]),
+                    tick_size=float(row.get("tick_size") or 0.05),
+                    freeze_qty=int(row["freeze_qty"]) if row.get("freeze_qty") else None,
+                    product_type=(row.get("product_type") or "I_FO").strip(),
+                )
+            except (KeyError, ValueError) as e:
+                logger.error(f"Skipping bad contract spec row {row}: {e}")
+                continue
+            specs[spec.underlying] = spec
+
+        # Swap in whole dicts so concurrent lookups never see a half-loaded table
+        with self._lock:
+            self.specs = specs
+            # Longest first, so MIDCPNIFTY26100PE is not taken for NIFTY
+            self.prefixes = sorted((u for u in specs if u != DEFAULT_UNDERLYING), key=len, reverse=True)
+            self.default = specs.get(DEFAULT_UNDERLYING, ContractSpec(DEFAULT_UNDERLYING))
+            self.symbol_index = {}
+            self._mtime = mtime
+        logger.info(f"Loaded {len(specs)} contract specs from {self.path}")
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked < self.reload_interval:
+            return
+        self._checked = now
+        try:
+            if os.path.getmtime(self.path) != self._mtime:
+                self.load()
+        except FileNotFoundError:
+            pass
+
+    def lookup(self, symbol):
+        self._maybe_reload()
+        spec = self.symbol_index.get(symbol)
+        if spec is not None:
+            return spec
+
+        parsed = parse_symbol(normalize_symbol(symbol))
+        if parsed and parsed.option_type != "EQ":
+            spec = self.specs.get(parsed.underlying, self.default)
+        else:
+            # Exact underlying match first; equities and unlisted names use the default row
+            spec = self.specs.get(parsed.underlying) if parsed else None
+            spec = spec or self._match_prefix(normalize_symbol(symbol).replace(" ", ""))
+        self.symbol_index[symbol] = spec
+        return spec
+
+    def _match_prefix(self, compact):
+        for underlying in self.prefixes:
+            if compact.startswith(underlying) and COMPACT_OPTION_SUFFIX.fullmatch(compact, len(underlying)):
+                return self.specs[underlying]
+        return self.default
+
+    @staticmethod
+    def round_to_tick(price, spec):
+        """
+        Rounds a price to the nearest valid tick for the contract.
+        """
+        ticks = round(price / spec.tick_size)
+        return round(ticks * spec.tick_size, 2)
+
+    @staticmethod
+    def split_quantity(quantity, spec):
+        """
+        Splits an order above the exchange freeze limit into child quantities,
+        each a whole number of lots and at most the freeze quantity.
+        """
+        if not spec.freeze_qty or quantity <= spec.freeze_qty:
+            return [quantity]
+        max_child = max(spec.lot_size, spec.freeze_qty - spec.freeze_qty % spec.lot_size)
+        children = [max_child] * (quantity // max_child)
+        if quantity % max_child:
+            children.append(quantity % max_child)
+        return children
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ContractRegistry()
+        return _registry
@@ -1,66 +1,82 @@
 import asyncio
 import logging
-import pandas as pd
-import time
-from config import Config
+import startup
+import latency
+import log_setup
 from groww_trader import GrowwTrader
+from risk_engine import RiskRejected
+from signal_journal import SignalJournal
+from signal_notify import create_waiter
+from signal_queue import SignalQueue
 
-logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL))
 logger = logging.getLogger(__name__)
 
-CSV_FILE = "trade_signals.csv"
-POLL_INTERVAL = 5  # Seconds
+POLL_INTERVAL = 5  # Seconds, upper bound between checks when no change notification arrives
 
 class CSVTrader:
     def __init__(self):
         self.trader = GrowwTrader()
-        self.processed_ids = set()
+        startup.mark("trader")
+        self.journal = SignalJournal()
+        self.queue = SignalQueue("csv_trader")
+        self.cursor = None
         self.load_processed_ids()
+        startup.mark("journal")
 
     def load_processed_ids(self):
-        try:
-            df = pd.read_csv(CSV_FILE)
-            # Mark all existing signals as processed on startup to avoid re-trading old info
-            if "signal_id" in df.columns:
-                self.processed_ids = set(df["signal_id"].tolist())
-            logger.info(f"Loaded {len(self.processed_ids)} processed signals.")
-        except FileNotFoundError:
+        # Resume from the saved checkpoint; on first run existing signals are
+        # skipped to avoid re-trading old info.
+        self.cursor = self.queue.open_cursor(self.journal)
+        if self.cursor.segment is None:
             logger.warning("No CSV file found yet. Waiting for creator...")
 
     def check_for_signals(self):
         try:
-            df = pd.read_csv(CSV_FILE)
-            new_signals = df[~df["signal_id"].isin(self.processed_ids)]
-            
-            for _, row in new_signals.iterrows():
-                signal_id = row["signal_id"]
-                signal = {
-                    "symbol": row["symbol"],
-                    "action": row["action"],
-                    "price": row["price"],
-                    "sl": row["stop_loss"],
-                    "target": row["target"]
-                }
+            # New journal rows are queued durably together with the checkpoint
+            records = self.cursor.read_new()
+            if records:
+                self.queue.ingest(records, self.cursor)
+
+            # Failed signals went back to READY and are retried here
+            for item in self.queue.claim():
+                signal = dict(item.signal, retry=item.is_retry)
+                trace = latency.trace_from_journal(item.timestamp)
+                log_setup.set_correlation_id(item.signal_id)
                 
-                logger.info(f"New signal found: {signal['symbol']} {signal['action']}")
+                logger.info("New signal found: %s %s", signal['symbol'], signal['action'])
                 
                 # Execute Trade
-                if self.trader.place_order(signal):
-                    self.processed_ids.add(signal_id)
-                    logger.info(f"Processed signal ID: {signal_id}")
+                try:
+                    placed = self.trader.place_order(signal)
+                except RiskRejected as e:
+                    # Blocked by a risk limit: drop it rather than fire it late
+                    self.queue.reject(item.signal_id, str(e))
+                    continue
+                finally:
+                    trace.finish()
+                if placed:
+                    self.queue.ack(item.signal_id)
+                    logger.info(f"Processed signal ID: {item.signal_id}")
                 else:
-                    logger.error(f"Failed to process signal ID: {signal_id}")
+                    self.queue.nack(item.signal_id, "place_order failed")
+                    logger.error(f"Failed to process signal ID: {item.signal_id}")
+
+            self.queue.flush()
 
-        except FileNotFoundError:
-            pass
         except Exception as e:
             logger.error(f"Error reading CSV: {e}")
 
     async def start(self):
         logger.info("Starting CSV Trader (CSV -> Groww)...")
+        latency.setup("csv_trader")
+        waiter = create_waiter(self.journal)
+        self.check_for_signals()
+        startup.ready("csv_trader")
         while True:
+            await waiter.wait(POLL_INTERVAL)
             self.check_for_signals()
-            await asyncio.sleep(POLL_INTERVAL)
 
 if __name__ == "__main__":
+    log_setup.setup("csv_trader")
+    startup.mark("imports")
     asyncio.run(CSVTrader().start())
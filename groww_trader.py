@@ -1,70 +1,296 @@
-from growwapi import GrowwAPI
+import asyncio
+import contextvars
+import functools
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
+import latency
+import startup
 from config import Config
+from client_pool import get_pool
+from contract_specs import get_registry
+from risk_engine import RiskRejected, get_risk_engine
+from scrip_resolver import get_resolver, parse_symbol
 
-logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL))
 logger = logging.getLogger(__name__)
 
+LTP_BATCH_SIZE = 50  # Max instruments per get_ltp request
+FILLED_STATUSES = ("EXECUTED", "COMPLETED")
+DEAD_STATUSES = ("REJECTED", "FAILED", "CANCELLED")
+
+# Dedicated pool for blocking growwapi calls made from async code
+BROKER_EXECUTOR = ThreadPoolExecutor(max_workers=Config.BROKER_WORKERS, thread_name_prefix="broker")
+# Child orders of a freeze-split order; separate so place_order running on BROKER_EXECUTOR can't deadlock it
+CHILD_ORDER_EXECUTOR = ThreadPoolExecutor(max_workers=Config.BROKER_WORKERS, thread_name_prefix="child-order")
+# Entry fill checks; separate so resting orders being polled never queue ahead of new orders
+FILL_CHECK_EXECUTOR = ThreadPoolExecutor(max_workers=Config.FILL_CHECK_WORKERS, thread_name_prefix="fill-check")
+
+
+class OrderPending(Exception):
+    """
+    place_order outlived its timeout, so whether the order reached the broker is unknown.
+    `future` resolves to place_order's own result once the broker call returns.
+    """
+    def __init__(self, future):
+        super().__init__("timed out, order state unknown")
+        self.future = future
+
+
+def order_reference_id(key, leg=0):
+    """
+    Broker idempotency key: 20 alphanumeric characters derived from `key`
+    (signal ID + account) and the child-order leg, so a retried order is sent
+    with the same order_reference_id as the original attempt.
+    """
+    return hashlib.blake2b(f"{key}#{leg}".encode(), digest_size=10).hexdigest()
+
+
 class GrowwTrader:
-    def __init__(self, api_key=None, api_secret=None, auth_token=None):
+    def __init__(self, api_key=None, api_secret=None, auth_token=None, lots=None, name="default"):
         self.dry_run = Config.DRY_RUN
+        self.lots = lots or Config.LOTS_PER_ORDER
+        self.name = name
         
         # Use provided credentials or fallback to Config (for backward compatibility/single account)
         self.api_key = api_key or Config.GROWW_API_KEY
         self.api_secret = api_secret or Config.GROWW_API_SECRET
         self.auth_token = auth_token or Config.GROWW_AUTH_TOKEN
+        self.resolver = get_resolver()
+        self.pool = get_pool()
+        self.contracts = get_registry()
+        self.risk = get_risk_engine()
 
         if not self.dry_run:
+            if Config.STARTUP_BACKGROUND_INIT:
+                # Authenticate on a background thread; the first order waits for it if needed
+                self.pool.connect_async(self.api_key, self.api_secret, self.auth_token).add_done_callback(self._authenticated)
+            else:
+                try:
+                    self.pool.get(self.api_key, self.api_secret, self.auth_token)
+                    logger.info(f"Groww API authenticated for account.")
+                except Exception as e:
+                    logger.error(f"Failed to authenticate Groww API: {e}")
+        self.risk.register(self.name, self)
+
+    def _authenticated(self, future):
+        if future.exception():
+            logger.error(f"Failed to authenticate Groww API for {self.name}: {future.exception()}")
+        else:
+            logger.info(f"Groww API authenticated for {self.name} ({startup.elapsed_ms():.0f} ms after start)")
+
+    @property
+    def groww(self):
+        # Pooled, pre-authenticated client shared by every call for this account
+        return self.pool.get(self.api_key, self.api_secret, self.auth_token)
+
+    def get_lot_size(self, symbol):
+        """
+        Determines lot size from the contract spec registry.
+        """
+        return self.contracts.lookup(symbol).lot_size
+
+    def get_quantity(self, signal):
+        """
+        Total order quantity: lots (signal override or account setting) x lot size.
+        """
+        return int(signal.get('lots') or self.lots) * self.get_lot_size(signal['symbol'])
+
+    def _send_order(self, client, order_details, spec, reference=None, skip=()):
+        """
+        Sends one order, or splits it into concurrent child orders when the quantity
+        is above the exchange freeze limit. Returns the list of responses, with the
+        exception in place of each child order that failed; raises only if nothing went out.
+        With a `reference`, every leg carries its own stable order_reference_id;
+        legs numbered in `skip` are already at the broker and are not sent again.
+        """
+        children = self.contracts.split_quantity(order_details['quantity'], spec)
+        legs = []
+        for leg, quantity in enumerate(children):
+            if leg in skip:
+                continue
+            details = dict(order_details, quantity=quantity)
+            if reference:
+                details['order_reference_id'] = order_reference_id(reference, leg)
+            legs.append(details)
+        if len(legs) == 1:
+            return [client.place_order(**legs[0])]
+
+        logger.info("Quantity %s above freeze limit %s, sending %d child orders", order_details['quantity'], spec.freeze_qty, len(legs))
+        futures = [CHILD_ORDER_EXECUTOR.submit(client.place_order, **details) for details in legs]
+        # Legs that went out are live at the broker whatever happened to the others
+        responses = [future.exception() or future.result() for future in futures]
+        if all(isinstance(response, Exception) for response in responses):
+            raise responses[0]
+        return responses
+
+    @staticmethod
+    def _segment(client, symbol):
+        parsed = parse_symbol(symbol)
+        return client.SEGMENT_CASH if parsed and parsed.option_type == "EQ" else client.SEGMENT_FNO
+
+    def _placed_legs(self, client, reference, legs, segment):
+        """
+        Asks the broker which of the `legs` child orders under this reference exist,
+        for retries of signals that may have been sent before a crash. Returns their leg numbers.
+        """
+        lookup = getattr(client, "get_order_status_by_reference", None)
+        if lookup is None:
+            return set()
+        placed = set()
+        for leg in range(legs):
             try:
-                self.groww = GrowwAPI(self.api_key, self.api_secret)
-                self.groww.set_access_token(self.auth_token)
-                logger.info(f"Groww API authenticated for account.")
+                status = lookup(order_reference_id=order_reference_id(reference, leg), segment=segment)
             except Exception as e:
-                logger.error(f"Failed to authenticate Groww API: {e}")
+                logger.debug("No existing order for reference %s leg %d: %s", reference, leg, e)
+                continue
+            if status and str(status.get("order_status", "")).upper() not in ("REJECTED", "FAILED"):
+                placed.add(leg)
+        return placed
 
-    def get_lot_size(self, symbol):
+    def get_order_fill(self, signal_id, symbol, quantity):
+        """
+        Checks how much of the entry order for `signal_id` has executed, leg by leg.
+        Returns {"filled": quantity, "price": average fill price or None,
+        "open": legs still working, "missing": legs the broker has no record of}.
         """
-        Determines lot size based on symbol name.
-        """
-        sym = symbol.upper()
-        if "BANKNIFTY" in sym:
-            return 15
-        elif "FINNIFTY" in sym:
-            return 25 
-        elif "MIDCPNIFTY" in sym:
-            return 50 # Verify current lot sizes
-        elif "NIFTY" in sym:
-            return 25
-        elif "SENSEX" in sym:
-            return 10
-        return 1 # Default for Equity
+        spec = self.contracts.lookup(symbol)
+        children = self.contracts.split_quantity(quantity, spec)
+        if self.dry_run:
+            return {"filled": quantity, "price": None, "open": 0, "missing": 0}
+
+        client = self.groww
+        segment = self._segment(client, symbol)
+        reference = f"{signal_id}:{self.name}"
+        fill = {"filled": 0, "price": None, "open": 0, "missing": 0}
+        cost, priced = 0.0, 0
+        for leg, leg_quantity in enumerate(children):
+            try:
+                status = client.get_order_status_by_reference(
+                    order_reference_id=order_reference_id(reference, leg), segment=segment)
+            except Exception as e:
+                logger.debug("No order for reference %s leg %d: %s", reference, leg, e)
+                fill["missing"] += 1
+                continue
+            state = str(status.get("order_status", "")).upper()
+            filled = int(status.get("filled_quantity") or (leg_quantity if state in FILLED_STATUSES else 0))
+            if state not in FILLED_STATUSES and state not in DEAD_STATUSES:
+                fill["open"] += 1
+            if filled and status.get("average_fill_price"):
+                cost += filled * float(status["average_fill_price"])
+                priced += filled
+            fill["filled"] += filled
+        if fill["filled"] and priced == fill["filled"]:
+            fill["price"] = round(cost / priced, 2)
+        return fill
+
+    def get_held_quantity(self, symbol):
+        """
+        Net quantity of `symbol` the broker shows in this account's positions,
+        or None in dry-run mode.
+        """
+        if self.dry_run:
+            return None
+        client = self.groww
+        scrip = self.resolver.resolve(symbol, client)
+        if scrip is None:
+            raise ValueError(f"Could not find scrip for symbol: {symbol}")
+        response = client.get_position_for_trading_symbol(
+            trading_symbol=scrip.trading_symbol, segment=self._segment(client, symbol))
+        return sum(int(p.get("quantity") or 0) for p in (response or {}).get("positions", []))
+
+    def get_latest_prices(self, symbols):
+        """
+        Fetches LTPs for many signal symbols with one get_ltp request per segment
+        (chunked to LTP_BATCH_SIZE). Returns {symbol: ltp} for the symbols that resolved.
+        """
+        if self.dry_run:
+            return {}
+
+        client = self.groww
+        by_segment = {}
+        for symbol in symbols:
+            scrip = self.resolver.resolve(symbol, client)
+            if scrip is None:
+                continue
+            segment = self._segment(client, symbol)
+            by_segment.setdefault(segment, {})[f"{scrip.exchange}_{scrip.trading_symbol}"] = symbol
+
+        prices = {}
+        for segment, keys in by_segment.items():
+            names = list(keys)
+            for i in range(0, len(names), LTP_BATCH_SIZE):
+                chunk = tuple(names[i:i + LTP_BATCH_SIZE])
+                try:
+                    response = client.get_ltp(segment=segment, exchange_trading_symbols=chunk)
+                except Exception as e:
+                    logger.error(f"Failed to fetch LTP for {len(chunk)} symbols: {e}")
+                    continue
+                for name, ltp in (response or {}).items():
+                    if name in keys:
+                        prices[keys[name]] = ltp
+        return prices
+
+    def get_latest_price(self, symbol):
+        return self.get_latest_prices([symbol]).get(symbol)
 
     def place_order(self, signal):
         """
         Places an order based on the signal.
         For "Above" price (Buy Stop), we use SL-Limit or SL-Market order.
+        Raises RiskRejected if the pre-trade risk checks block it.
         """
         symbol = signal['symbol']
         buy_price = signal.get('price')
         
         # Calculate Quantity
-        quantity = self.get_lot_size(symbol)
+        spec = self.contracts.lookup(symbol)
+        quantity = self.get_quantity(signal)
+
+        # Pre-trade risk gate: in-memory counters only, no broker round-trip
+        rejected = self.risk.check(self.name, symbol, quantity, buy_price)
+        if rejected:
+            logger.warning("[%s] Risk check rejected %s: %s", self.name, symbol, rejected)
+            raise RiskRejected(rejected)
+
+        placed = self._submit_order(signal, spec, quantity)
+        # Without an attached tracker (main.py, csv_trader.py) no exit would free it later
+        if not placed or not self.risk.holds_exposure:
+            self.risk.release(self.name, symbol, quantity, buy_price)
+        return placed
+
+    def _submit_order(self, signal, spec, quantity):
+        symbol = signal['symbol']
+        buy_price = signal.get('price')
 
         if self.dry_run:
-            logger.info(f"[DRY RUN] Would search for '{symbol}' and place Buy Order > {buy_price} (Qty: {quantity})")
+            logger.info("[DRY RUN] Would search for '%s' and place Buy Order > %s (Qty: %s)", symbol, buy_price, quantity)
             return True
 
         try:
-            # 1. Search for the Scrip ID
-            search_results = self.groww.search_scrip(symbol)
-            if not search_results or len(search_results) == 0:
-                logger.error(f"Could not find scrip for symbol: {symbol}")
+            # 1. Resolve the Scrip ID (instrument master / cache, live search as fallback)
+            trace = latency.current()
+            client = self.groww
+            with trace.span("resolve"):
+                scrip = self.resolver.resolve(symbol, client)
+            if scrip is None:
+                logger.error("Could not find scrip for symbol: %s", symbol)
                 return False
             
-            # Assuming the first result is the correct one (usually correct for explicit names)
-            scrip = search_results[0]
-            search_id = scrip['searchId']
-            logger.info(f"Resolved {symbol} to ID: {search_id} ({scrip['displayName']})")
+            search_id = scrip.security_id
+            logger.debug("Resolved %s to ID: %s (%s)", symbol, search_id, scrip.display_name)
+
+            # Journal signals get an idempotency key; a retry first checks whether it already went out
+            reference = f"{signal['signal_id']}:{self.name}" if signal.get('signal_id') else None
+            placed_legs = set()
+            if reference and signal.get('retry'):
+                legs = len(self.contracts.split_quantity(quantity, spec))
+                placed_legs = self._placed_legs(client, reference, legs, self._segment(client, symbol))
+                if len(placed_legs) == legs:
+                    logger.info("Order for signal %s already at broker, not resending", signal['signal_id'])
+                    return True
+                if placed_legs:
+                    logger.info("Signal %s: %d of %d legs already at broker, sending the rest",
+                                signal['signal_id'], len(placed_legs), legs)
 
             # 2. Prepare Order Params
             # IF "price" is present, it means "Buy Above X", so use SL Order
@@ -72,43 +298,175 @@ class GrowwTrader:
                 # Buying ABOVE market price requires a STOP LOSS LIMIT order
                 # Trigger Price = buy_price
                 # Limit Price = slightly higher to ensure fill (e.g., +0.5% or +1 rupee)
-                limit_price = buy_price + 1.0 
+                limit_price = self.contracts.round_to_tick(buy_price + 1.0, spec)
                 
                 order_details = {
-                    'exchange': 'NSE',  # Options are usually on NSE
+                    'exchange': spec.exchange,
                     'security_id': search_id,
                     'transaction_type': 'BUY',
                     'quantity': quantity, 
                     'price': limit_price,
                     'trigger_price': buy_price,
                     'order_type': 'SL_LIMIT', 
-                    'product_type': 'I_FO', 
+                    'product_type': spec.product_type, 
                     'validity': 'DAY'
                 }
-                logger.info(f"Placing PENDING SL-LIMIT Order (Wait for Price > {buy_price}): {order_details}")
             else:
                 # Market Order
                 order_details = {
-                    'exchange': 'NSE',
+                    'exchange': spec.exchange,
                     'security_id': search_id,
                     'transaction_type': 'BUY',
                     'quantity': quantity,
                     'price': 0,
                     'order_type': 'MARKET',
-                    'product_type': 'I_FO',
+                    'product_type': spec.product_type,
                     'validity': 'DAY'
                 }
 
-            logger.info(f"Placing order: {order_details}")
+            # One lazily formatted line per order; the writer thread builds the string
+            logger.info("[%s] Placing %s order: %s", self.name, order_details['order_type'], order_details)
             
             # 3. Execute Order
             # Note: actual method name involves making a dict and sending it
             # Using the simplified wrapper if available, or raw call
-            response = self.groww.place_order(**order_details)
+            with trace.span("order_ack"):
+                response = self._send_order(client, order_details, spec, reference, placed_legs)
             
-            logger.info(f"Order Response: {response}")
+            logger.info("[%s] Order response: %s", self.name, response)
+            failed = [r for r in response if isinstance(r, Exception)]
+            if failed:
+                # The position is still opened; the fill check settles it at the quantity that executed
+                logger.error("[%s] %d of %d child orders for %s failed, keeping the rest: %s",
+                             self.name, len(failed), len(response), symbol, failed[0])
+            return True
+
+        except Exception as e:
+            logger.error("Failed to place order for %s: %s", symbol, e)
+            return False
+
+    def place_exit_order(self, symbol, quantity, reference=None, retry=False):
+        """
+        Closes a long position with a MARKET sell. Used by PositionTracker on SL/target hits.
+        `reference` (the position ID) gives the sell stable order references; on a `retry`
+        legs that already reached the broker are not sent again.
+        """
+        if self.dry_run:
+            logger.info("[DRY RUN] Would place Sell Order for '%s' (Qty: %s)", symbol, quantity)
+            return True
+
+        try:
+            client = self.groww
+            scrip = self.resolver.resolve(symbol, client)
+            if scrip is None:
+                logger.error("Could not find scrip for symbol: %s", symbol)
+                return False
+
+            spec = self.contracts.lookup(symbol)
+            reference = f"{reference}:exit" if reference else None
+            placed_legs = set()
+            if reference and retry:
+                legs = len(self.contracts.split_quantity(quantity, spec))
+                placed_legs = self._placed_legs(client, reference, legs, self._segment(client, symbol))
+                if len(placed_legs) == legs:
+                    logger.info("[%s] Exit for %s already at broker, not resending", self.name, symbol)
+                    return True
+
+            order_details = {
+                'exchange': spec.exchange,
+                'security_id': scrip.security_id,
+                'transaction_type': 'SELL',
+                'quantity': quantity,
+                'price': 0,
+                'order_type': 'MARKET',
+                'product_type': spec.product_type,
+                'validity': 'DAY'
+            }
+            logger.info("[%s] Placing exit order: %s", self.name, order_details)
+            response = self._send_order(client, order_details, spec, reference, placed_legs)
+            logger.info("[%s] Exit order response: %s", self.name, response)
+            failed = [r for r in response if isinstance(r, Exception)]
+            if failed:
+                # Not done: the retry sends only the legs the broker doesn't have
+                logger.error("[%s] %d of %d exit child orders for %s failed: %s",
+                             self.name, len(failed), len(response), symbol, failed[0])
+                return False
             return True
 
         except Exception as e:
-            logger.error(f"Failed to place order for {symbol}: {e}")
+            logger.error("Failed to place exit order for %s: %s", symbol, e)
             return False
+
+    async def _off_loop(self, func, *args, timeout=None, executor=BROKER_EXECUTOR):
+        """
+        Runs a blocking SDK call on `executor` (BROKER_EXECUTOR) with a per-call timeout.
+        Cancelling or timing out stops the wait, not the request already sent to the broker.
+        """
+        return await asyncio.wait_for(self._submit(func, *args, executor=executor), timeout or Config.BROKER_CALL_TIMEOUT)
+
+    @staticmethod
+    def _submit(func, *args, executor=BROKER_EXECUTOR):
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the caller's context so the signal's latency trace follows the call
+        context = contextvars.copy_context()
+        return loop.run_in_executor(executor, functools.partial(context.run, func, *args))
+
+    async def place_order_async(self, signal, timeout=None):
+        """
+        Non-blocking place_order. Raises OrderPending on timeout: the order may still
+        reach the broker, and the exception carries place_order's eventual result.
+        """
+        future = self._submit(self.place_order, signal)
+        try:
+            # Shielded, so the timeout leaves the future to report how the call ended
+            return await asyncio.wait_for(asyncio.shield(future), timeout or Config.BROKER_CALL_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(f"place_order for {signal['symbol']} timed out, order state unknown")
+            raise OrderPending(future) from None
+
+    async def place_exit_order_async(self, symbol, quantity, reference=None, retry=False, timeout=None):
+        try:
+            return await self._off_loop(self.place_exit_order, symbol, quantity, reference, retry, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Exit order for {symbol} timed out, order state unknown")
+            return False
+
+    async def get_order_fill_async(self, signal_id, symbol, quantity, timeout=None):
+        return await self._off_loop(self.get_order_fill, signal_id, symbol, quantity,
+                                    timeout=timeout, executor=FILL_CHECK_EXECUTOR)
+
+    async def get_held_quantity_async(self, symbol, timeout=None):
+        return await self._off_loop(self.get_held_quantity, symbol, timeout=timeout)
+
+    async def search_scrip_async(self, symbol, timeout=None):
+        if self.dry_run:
+            return self.resolver.resolve(symbol)
+        return await self._off_loop(self.resolver.resolve, symbol, self.groww, timeout=timeout)
+
+    async def resolve_many_async(self, symbols, timeout=None):
+        """
+        Resolves several symbols concurrently, one lookup per distinct symbol, so the
+        orders that follow find them in the resolver cache. Returns {symbol: Scrip or None}.
+        """
+        unique = list(dict.fromkeys(symbols))
+        # Master and cache first in a single hop; only the misses need a search_scrip each
+        scrips = await self._off_loop(lambda: {s: self.resolver.resolve(s) for s in unique}, timeout=timeout)
+        missing = [s for s, scrip in scrips.items() if scrip is None]
+        if missing and not self.dry_run:
+            results = await asyncio.gather(*(self.search_scrip_async(s, timeout) for s in missing), return_exceptions=True)
+            for symbol, result in zip(missing, results):
+                if isinstance(result, BaseException):
+                    logger.warning("Could not resolve %s: %r", symbol, result)
+                    result = None
+                scrips[symbol] = result
+        return scrips
+
+    async def get_latest_prices_async(self, symbols, timeout=None):
+        if not self.dry_run:
+            # New symbols are looked up concurrently instead of one by one inside get_latest_prices
+            await self.resolve_many_async(symbols, timeout)
+        return await self._off_loop(self.get_latest_prices, symbols, timeout=timeout)
+
+    async def get_latest_price_async(self, symbol, timeout=None):
+        prices = await self.get_latest_prices_async([symbol], timeout=timeout)
+        return prices.get(symbol)
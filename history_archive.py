@@ -0,0 +1,388 @@
+"""
+Columnar history: the signal journal and closed positions, compacted into
+date-partitioned Parquet under HISTORY_DIR.
+
+    python history_archive.py compact [--every 300]
+    python history_archive.py query [--start 2026-10-01] [--end 2026-10-31] [--underlying BANKNIFTY] [--outcomes]
+
+Layout, one directory per day (hive style, so other Parquet tools read it too):
+
+    history/signals/date=2026-10-17/part-0000001234.parquet
+    history/positions/date=2026-10-17/part-0000005678.parquet
+    history/_checkpoint.json
+
+`compact` only reads what was appended since the previous run (a journal cursor
+and a byte offset into POSITION_HISTORY_FILE and each shard's copy of it, see
+shard_executor.py), so it never touches the live path and can run from cron or
+with --every. Part files are named after where
+their rows start, so a run that crashes before saving the checkpoint rewrites
+the same files instead of duplicating rows. Rows are typed, zstd-compressed and
+sorted by underlying, symbol and time, so the min/max statistics Parquet keeps
+per row group let a query skip the row groups of other underlyings. Finished
+days with several parts are merged into one file.
+
+Queries prune partitions by directory name before opening any file, push the
+remaining filters down to the row-group statistics and read only the requested
+columns, memory-mapped. Needs pyarrow, which stays optional for the bot itself.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+import log_setup
+from config import Config
+from scrip_resolver import parse_symbol
+from signal_journal import SignalJournal
+
+logger = logging.getLogger(__name__)
+
+SIGNALS = "signals"
+POSITIONS = "positions"
+SORT_KEYS = {SIGNALS: ("underlying", "symbol", "timestamp"), POSITIONS: ("underlying", "symbol", "closed_at")}
+ID_COLUMNS = {SIGNALS: "signal_id", POSITIONS: "position_id"}
+OUTCOME_COLUMNS = ["signal_id", "account", "quantity", "state", "entry", "exit_price", "exit_reason", "pnl", "closed_at"]
+
+
+def schemas():
+    import pyarrow as pa
+
+    return {
+        SIGNALS: pa.schema([
+            ("timestamp", pa.timestamp("us")),
+            ("signal_id", pa.string()),
+            ("symbol", pa.string()),
+            ("underlying", pa.string()),
+            ("action", pa.string()),
+            ("price", pa.float64()),
+            ("stop_loss", pa.float64()),
+            ("target", pa.float64()),
+            ("status", pa.string()),
+            ("type", pa.string()),
+        ]),
+        POSITIONS: pa.schema([
+            ("closed_at", pa.timestamp("us")),
+            ("position_id", pa.string()),
+            ("signal_id", pa.string()),
+            ("account", pa.string()),
+            ("symbol", pa.string()),
+            ("underlying", pa.string()),
+            ("quantity", pa.int64()),
+            ("trigger", pa.float64()),
+            ("sl", pa.float64()),
+            ("target", pa.float64()),
+            ("state", pa.string()),
+            ("entry", pa.float64()),
+            ("exit_price", pa.float64()),
+            ("exit_reason", pa.string()),
+            ("pnl", pa.float64()),
+        ]),
+    }
+
+
+def underlying_of(symbol):
+    parsed = parse_symbol(symbol) if symbol else None
+    return parsed.underlying if parsed else (symbol or "").upper()
+
+
+def _parse_day(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _dedup(table, key):
+    """
+    Keeps the last row for every value of `key`.
+    """
+    ids = table.column(key).to_pylist()
+    last = {value: i for i, value in enumerate(ids)}
+    if len(last) == len(ids):
+        return table
+    return table.take(sorted(last.values()))
+
+
+class HistoryArchive:
+    def __init__(self, root=None, journal=None, positions_path=None, row_group=None):
+        self.root = root or Config.HISTORY_DIR
+        self.journal = journal or SignalJournal()
+        self.positions_path = positions_path or Config.POSITION_HISTORY_FILE
+        self.shard_files = positions_path is None  # Also archive the shard workers' history files
+        self.row_group = row_group or Config.HISTORY_ROW_GROUP
+        self.checkpoint_path = os.path.join(self.root, "_checkpoint.json")
+
+    # --- Compaction ----------------------------------------------------------
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_checkpoint(self, state):
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _signal_rows(self, records):
+        rows = []
+        for r in records:
+            if not r.timestamp or not r.signal_id:
+                continue
+            try:
+                ts = datetime.fromisoformat(r.timestamp)
+            except ValueError:
+                logger.warning(f"Skipping signal {r.signal_id} with bad timestamp {r.timestamp!r}")
+                continue
+            rows.append({
+                "timestamp": ts.replace(tzinfo=None), "signal_id": r.signal_id, "symbol": r.symbol,
+                "underlying": underlying_of(r.symbol), "action": r.action, "price": r.price,
+                "stop_loss": r.sl, "target": r.target, "status": r.status, "type": r.type,
+            })
+        return rows
+
+    def positions_paths(self):
+        """
+        Returns {path: part prefix} for every closed-positions file: POSITION_HISTORY_FILE
+        and the per-shard files next to it (positions_closed_shard0.jsonl, ...).
+        """
+        paths = {self.positions_path: ""}
+        if self.shard_files:
+            root, ext = os.path.splitext(self.positions_path)
+            for path in sorted(glob.glob(f"{glob.escape(root)}_shard*{ext}")):
+                paths[path] = path[len(root) + 1:-len(ext) or None] + "-"
+        return paths
+
+    def _read_positions(self, path, offset):
+        """
+        Returns (rows, new offset) for the closed positions appended to `path` after `offset`.
+        """
+        if not os.path.exists(path):
+            return [], offset
+        if os.path.getsize(path) < offset:
+            logger.warning(f"{path} shrank, archiving it from the start")
+            offset = 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # Only complete lines
+        rows = []
+        for line in data[:end].splitlines():
+            try:
+                p = json.loads(line)
+            except ValueError:
+                continue
+            rows.append({
+                "closed_at": datetime.fromtimestamp(p.get("updated") or time.time()),
+                "position_id": p["position_id"], "signal_id": p.get("signal_id"), "account": p.get("account"),
+                "symbol": p.get("symbol"), "underlying": underlying_of(p.get("symbol")),
+                "quantity": p.get("quantity"), "trigger": p.get("trigger"), "sl": p.get("sl"),
+                "target": p.get("target"), "state": p.get("state"), "entry": p.get("entry"),
+                "exit_price": p.get("exit_price"), "exit_reason": p.get("exit_reason"), "pnl": p.get("pnl"),
+            })
+        return rows, offset + end
+
+    def _partition_dir(self, table, day):
+        return os.path.join(self.root, table, f"date={day.isoformat()}")
+
+    def _write_table(self, table, data, path):
+        import pyarrow.parquet as pq
+
+        data = _dedup(data, ID_COLUMNS[table]).sort_by([(key, "ascending") for key in SORT_KEYS[table]])
+        tmp = f"{path}.tmp"
+        pq.write_table(data, tmp, row_group_size=self.row_group, compression="zstd", write_statistics=True)
+        os.replace(tmp, path)
+
+    def _write(self, table, rows, part, prefix=""):
+        """
+        Writes rows as part `part` (named `prefix` + part number) of each day they
+        fall on. Returns the days written.
+        """
+        import pyarrow as pa
+
+        if not rows:
+            return set()
+        time_column = SORT_KEYS[table][-1]
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row[time_column].date(), []).append(row)
+
+        schema = schemas()[table]
+        for day, day_rows in by_day.items():
+            directory = self._partition_dir(table, day)
+            os.makedirs(directory, exist_ok=True)
+            data = pa.Table.from_pylist(day_rows, schema=schema)
+            self._write_table(table, data, os.path.join(directory, f"part-{prefix}{part:010d}.parquet"))
+        return set(by_day)
+
+    def merge_finished_days(self, table):
+        """
+        Merges the parts of every day before today into one file per day.
+        A merge interrupted between writing and cleanup leaves duplicate rows,
+        which the next merge of that day drops.
+        """
+        import pyarrow.parquet as pq
+
+        merged = 0
+        today = date.today()
+        for day, files in self.partitions(table):
+            if day >= today or len(files) < 2:
+                continue
+            data = pq.read_table(files, schema=schemas()[table], memory_map=True)
+            target = os.path.join(self._partition_dir(table, day), "part-merged.parquet")
+            # Readers only glob part-*.parquet; the old parts go once the merged file is in place
+            self._write_table(table, data, target)
+            for path in files:
+                if path != target:
+                    os.remove(path)
+            merged += 1
+        return merged
+
+    def compact(self):
+        """
+        Archives the journal rows and closed positions appended since the last run.
+        Returns the number of rows archived per table.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        state = self._load_checkpoint()
+        if state.get("segment"):
+            cursor = self.journal.cursor_at(state["segment"], state["offset"], state.get("rows", 0))
+        else:
+            cursor = self.journal.cursor()
+        first_row = cursor.rows
+        records = cursor.read_new()
+        signals = self._signal_rows(records)
+
+        offsets = state.get("positions_offsets") or {self.positions_path: state.get("positions_offset", 0)}
+        positions = []
+        new_offsets = {}
+        for path, prefix in self.positions_paths().items():
+            rows, new_offsets[path] = self._read_positions(path, offsets.get(path, 0))
+            self._write(POSITIONS, rows, offsets.get(path, 0), prefix)
+            positions += rows
+
+        self._write(SIGNALS, signals, first_row)
+        self._save_checkpoint({
+            "segment": cursor.segment, "offset": cursor.offset, "rows": cursor.rows,
+            "positions_offsets": new_offsets, "updated": datetime.now().isoformat(),
+        })
+        merged = self.merge_finished_days(SIGNALS) + self.merge_finished_days(POSITIONS)
+        logger.info(f"Archived {len(signals)} signals and {len(positions)} closed positions, merged {merged} day(s)")
+        return {SIGNALS: len(signals), POSITIONS: len(positions)}
+
+    # --- Queries -------------------------------------------------------------
+
+    def partitions(self, table, start=None, end=None):
+        """
+        Returns [(day, [part files])] for the days in [start, end], from directory names alone.
+        """
+        start, end = _parse_day(start), _parse_day(end)
+        base = os.path.join(self.root, table)
+        if not os.path.isdir(base):
+            return []
+        result = []
+        for name in sorted(os.listdir(base)):
+            if not name.startswith("date="):
+                continue
+            try:
+                day = date.fromisoformat(name[5:])
+            except ValueError:
+                continue
+            if (start and day < start) or (end and day > end):
+                continue
+            directory = os.path.join(base, name)
+            files = sorted(
+                os.path.join(directory, f) for f in os.listdir(directory)
+                if f.startswith("part-") and f.endswith(".parquet")
+            )
+            if files:
+                result.append((day, files))
+        return result
+
+    def scan(self, table, start=None, end=None, underlyings=None, symbols=None, columns=None):
+        """
+        Returns a pyarrow Table of `table` (SIGNALS or POSITIONS) for the days in
+        [start, end] (dates or ISO strings, inclusive), optionally limited to some
+        underlyings / exact symbols and to `columns`.
+        """
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        schema = schemas()[table]
+        files = [path for _, parts in self.partitions(table, start, end) for path in parts]
+        if not files:
+            empty = schema.empty_table()
+            return empty.select(columns) if columns else empty
+
+        conditions = []
+        if underlyings:
+            conditions.append(pc.field("underlying").isin([u.upper() for u in underlyings]))
+        if symbols:
+            conditions.append(pc.field("symbol").isin(list(symbols)))
+        row_filter = None
+        for condition in conditions:
+            row_filter = condition if row_filter is None else row_filter & condition
+
+        return pq.read_table(files, schema=schema, columns=columns, filters=row_filter, memory_map=True)
+
+    def signals_with_outcomes(self, start=None, end=None, underlyings=None, symbols=None):
+        """
+        Signals in [start, end], one row per account that traded them, with the
+        position's outcome (null columns for signals that never closed a position).
+        """
+        signals = self.scan(SIGNALS, start, end, underlyings, symbols)
+        # Intraday positions close on the signal's day; allow a day of slack for late exits
+        end_day = _parse_day(end)
+        positions = _dedup(
+            self.scan(POSITIONS, start, end_day + timedelta(days=1) if end_day else None, underlyings, symbols,
+                      columns=["position_id"] + OUTCOME_COLUMNS),
+            "position_id",
+        ).drop(["position_id"])
+        return signals.join(positions, keys="signal_id", join_type="left outer").sort_by("timestamp")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="command", required=True)
+    compact = sub.add_parser("compact", help="Archive new journal rows and closed positions")
+    compact.add_argument("--every", type=float, default=0, help="Repeat every N seconds")
+    query = sub.add_parser("query", help="Print archived signals")
+    query.add_argument("--start", help="First day, YYYY-MM-DD")
+    query.add_argument("--end", help="Last day, YYYY-MM-DD")
+    query.add_argument("--underlying", action="append", help="e.g. BANKNIFTY (repeatable)")
+    query.add_argument("--symbol", action="append", help="Exact signal symbol (repeatable)")
+    query.add_argument("--outcomes", action="store_true", help="Join closed position outcomes")
+    query.add_argument("--limit", type=int, default=50, help="Rows to print")
+    args = ap.parse_args()
+
+    archive = HistoryArchive()
+    if args.command == "compact":
+        while True:
+            archive.compact()
+            if not args.every:
+                return
+            time.sleep(args.every)
+
+    started = time.perf_counter()
+    if args.outcomes:
+        table = archive.signals_with_outcomes(args.start, args.end, args.underlying, args.symbol)
+    else:
+        table = archive.scan(SIGNALS, args.start, args.end, args.underlying, args.symbol)
+    elapsed = (time.perf_counter() - started) * 1000
+    for row in table.slice(0, args.limit).to_pylist():
+        print(" ".join(f"{k}={v}" for k, v in row.items() if v is not None))
+    summary = f"{table.num_rows} rows in {elapsed:.1f} ms"
+    if args.outcomes and table.num_rows:
+        pnl = table.column("pnl").to_pylist()
+        closed = [p for p in pnl if p is not None]
+        summary += f", {len(closed)} closed with P&L, total {sum(closed):.2f}"
+    print(summary)
+
+
+if __name__ == "__main__":
+    log_setup.setup("history_archive")
+    main()
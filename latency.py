@@ -0,0 +1,280 @@
+"""
+Signal latency tracing: receive -> parse -> journal -> resolve -> broker ack.
+
+Each signal carries a Trace (monotonic clock) through the pipeline; every stage
+records its duration into an HDR-style histogram keyed by (stage, account).
+The histograms are served as Prometheus text on LATENCY_METRICS_PORT
+(/metrics, or /metrics.json for JSON) and/or dumped to LATENCY_DUMP_DIR on exit.
+
+When LATENCY_TRACING is off, start_trace() hands out a shared no-op trace, so the
+instrumented code paths cost one attribute lookup and a call.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SUB_BUCKET_BITS = 7  # 128 linear sub-buckets per power of two: < 1.6% relative error
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF = SUB_BUCKETS // 2
+MAX_VALUE_US = 3600 * 1_000_000  # Values above an hour are clamped
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def _bucket_index(value):
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKETS + (shift - 1) * HALF + (value >> shift) - HALF
+
+
+def _bucket_value(index):
+    """
+    Highest value that falls in the bucket.
+    """
+    if index < SUB_BUCKETS:
+        return index
+    shift, offset = divmod(index - SUB_BUCKETS, HALF)
+    shift += 1
+    return ((offset + HALF + 1) << shift) - 1
+
+
+class Histogram:
+    """
+    Log-linear histogram of microsecond values with fixed relative precision,
+    in the spirit of HdrHistogram: O(1) record, constant memory.
+    """
+    __slots__ = ("counts", "count", "total", "min", "max", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (_bucket_index(MAX_VALUE_US) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self._lock = threading.Lock()
+
+    def record(self, value_us):
+        value = min(max(int(value_us), 0), MAX_VALUE_US)
+        with self._lock:
+            self.counts[_bucket_index(value)] += 1
+            self.count += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, q):
+        if not self.count:
+            return 0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_bucket_value(index), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count if self.count else 0,
+            "min_us": self.min or 0,
+            "max_us": self.max,
+            **{f"p{q * 100:g}_us": self.percentile(q) for q in QUANTILES},
+        }
+
+
+class LatencyRegistry:
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, value_us, account=""):
+        key = (stage, account or "")
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        histogram.record(value_us)
+
+    def to_json(self):
+        return [
+            {"stage": stage, "account": account, **h.summary()}
+            for (stage, account), h in sorted(self.histograms.items())
+        ]
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP signal_stage_latency_seconds Time spent per pipeline stage",
+            "# TYPE signal_stage_latency_seconds summary",
+        ]
+        for (stage, account), h in sorted(self.histograms.items()):
+            labels = f'stage="{stage}",account="{account}"'
+            for q in QUANTILES:
+                lines.append(f'signal_stage_latency_seconds{{{labels},quantile="{q}"}} {h.percentile(q) / 1e6:.6f}')
+            lines.append(f"signal_stage_latency_seconds_sum{{{labels}}} {h.total / 1e6:.6f}")
+            lines.append(f"signal_stage_latency_seconds_count{{{labels}}} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_json(), f, indent=2)
+        os.replace(tmp, path)
+
+
+registry = LatencyRegistry()
+
+
+class _Span:
+    __slots__ = ("stage", "account", "started")
+
+    def __init__(self, stage, account):
+        self.stage = stage
+        self.account = account
+
+    def __enter__(self):
+        self.started = time.monotonic_ns()
+        return self
+
+    def __exit__(self, *exc):
+        registry.record(self.stage, (time.monotonic_ns() - self.started) // 1000, self.account)
+        return False
+
+
+class Trace:
+    """
+    Timing of one signal. `mark(stage)` records the time since the previous mark,
+    so sequential stages tile the whole path; `span(stage, account)` times a block
+    on its own, for work that runs concurrently per account.
+    """
+    __slots__ = ("started", "last")
+
+    def __init__(self):
+        self.started = self.last = time.monotonic_ns()
+
+    def mark(self, stage, account=""):
+        now = time.monotonic_ns()
+        registry.record(stage, (now - self.last) // 1000, account)
+        self.last = now
+
+    def span(self, stage, account=""):
+        return _Span(stage, account)
+
+    def since_wall(self, stage, wall_time):
+        """
+        Records a hop measured from another process's wall-clock timestamp
+        (the journal row time), then continues on this process's monotonic clock.
+        """
+        registry.record(stage, max(0.0, time.time() - wall_time) * 1e6)
+        self.started = self.last = time.monotonic_ns()
+
+    def finish(self, stage="total", account=""):
+        registry.record(stage, (time.monotonic_ns() - self.started) // 1000, account)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _NullTrace:
+    __slots__ = ()
+    _span = _NullSpan()
+
+    def mark(self, stage, account=""):
+        pass
+
+    def span(self, stage, account=""):
+        return self._span
+
+    def since_wall(self, stage, wall_time):
+        pass
+
+    def finish(self, stage="total", account=""):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+# Trace of the signal being handled; asyncio tasks inherit it, and
+# GrowwTrader._off_loop carries it into the broker threads
+current_trace = contextvars.ContextVar("current_trace", default=NULL_TRACE)
+
+
+def start_trace():
+    if not Config.LATENCY_TRACING:
+        # The context default is already the null trace
+        return NULL_TRACE
+    trace = Trace()
+    current_trace.set(trace)
+    return trace
+
+
+def trace_from_journal(timestamp):
+    """
+    Starts a trace for a journal record, recording the loader -> consumer hop
+    from the row's timestamp as stage "journal_hop".
+    """
+    trace = start_trace()
+    if trace is not NULL_TRACE and timestamp:
+        try:
+            trace.since_wall("journal_hop", datetime.fromisoformat(timestamp).timestamp())
+        except ValueError:
+            pass
+    return trace
+
+
+def current():
+    return current_trace.get()
+
+
+def setup(process_name):
+    """
+    Starts the exporters configured for this process. Call once from an entry point.
+    """
+    if not Config.LATENCY_TRACING:
+        return
+    if Config.LATENCY_METRICS_PORT:
+        # http.server pulls in email/html parsing; only pay for it when the endpoint is on
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class _MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body, content_type = json.dumps(registry.to_json()).encode(), "application/json"
+                elif self.path.startswith("/metrics"):
+                    body, content_type = registry.to_prometheus().encode(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        server = ThreadingHTTPServer(("127.0.0.1", Config.LATENCY_METRICS_PORT), _MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="latency-metrics", daemon=True).start()
+        logger.info(f"Latency metrics on http://127.0.0.1:{Config.LATENCY_METRICS_PORT}/metrics")
+    if Config.LATENCY_DUMP_DIR:
+        path = os.path.join(Config.LATENCY_DUMP_DIR, f"latency_{process_name}.json")
+        atexit.register(registry.dump, path)
+        logger.info(f"Latency histograms will be written to {path} on exit")
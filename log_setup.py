@@ -0,0 +1,164 @@
+"""
+Central logging setup. Entry points call setup() once; modules only do
+logger = logging.getLogger(__name__).
+
+A log call hands the LogRecord to a queue on the calling thread; a background
+listener thread formats it and does the terminal / file I/O, so logging on the
+order path never blocks on a write. The record is queued unformatted: hot paths
+log with %-style arguments (logger.info("Placed %s", symbol)) so the message is
+only built on the writer thread, and not at all when the level is disabled.
+Arguments must not be mutated after the call.
+
+LOG_FORMAT=json writes one JSON object per line with the time, level, logger,
+message, correlation ID and any `extra={...}` fields; the default text format
+keeps the usual LEVEL:logger:message lines. LOG_FILE adds a file next to stderr.
+
+set_correlation_id() tags every record logged while handling one signal; like
+the latency trace it lives in a ContextVar, so asyncio tasks and the broker
+threads (GrowwTrader._off_loop) inherit it.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from config import Config
+
+correlation = contextvars.ContextVar("correlation_id", default=None)
+# LogRecord attributes that are not user `extra` fields
+RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName", "correlation_id"}
+
+_listener = None
+_lock = threading.Lock()
+
+
+def set_correlation_id(value=None):
+    """
+    Sets (or generates) the correlation ID for the current context and returns it.
+    """
+    value = value or uuid.uuid4().hex[:12]
+    correlation.set(value)
+    return value
+
+
+def correlation_id():
+    return correlation.get()
+
+
+class _CorrelationFilter(logging.Filter):
+    # Runs on the logging thread, where the signal's context is current
+    def filter(self, record):
+        record.correlation_id = correlation.get()
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # The stock prepare() formats the message on the caller's thread; the
+        # listener is in-process, so the record can cross the queue as-is
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(levelname)s:%(name)s:%(cid)s%(message)s")
+
+    def format(self, record):
+        cid = getattr(record, "correlation_id", None)
+        record.cid = f"[{cid}] " if cid else ""
+        return super().format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, process=None):
+        super().__init__()
+        self.process = process
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="microseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if self.process:
+            entry["process"] = self.process
+        cid = getattr(record, "correlation_id", None)
+        if cid:
+            entry["cid"] = cid
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRS and key != "cid":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup(process=None):
+    """
+    Routes the root logger through the queue to stderr (and LOG_FILE) at LOG_LEVEL.
+    Safe to call more than once; only the first call configures anything.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        formatter = JsonFormatter(process) if Config.LOG_FORMAT.lower() == "json" else TextFormatter()
+        handlers = [logging.StreamHandler()]
+        if Config.LOG_FILE:
+            handlers.append(logging.FileHandler(Config.LOG_FILE, encoding="utf-8"))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        records = queue.SimpleQueue()
+        handler = _QueueHandler(records)
+        handler.addFilter(_CorrelationFilter())
+        root = logging.getLogger()
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO))
+
+        _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop)
+
+
+def stop():
+    """
+    Writes out everything still queued and stops the writer thread.
+    """
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+
+
+class Sampler:
+    """
+    Rate-limits a repeating log line: allow(key) is true at most once per
+    `interval` seconds per key. `suppressed(key)` tells how many were dropped
+    since the last one let through, to report alongside it.
+    """
+    def __init__(self, interval=None):
+        self.interval = Config.LOG_SAMPLE_INTERVAL if interval is None else interval
+        self.last = {}
+        self.dropped = {}
+
+    def allow(self, key):
+        now = time.monotonic()
+        if now - self.last.get(key, float("-inf")) >= self.interval:
+            self.last[key] = now
+            return True
+        self.dropped[key] = self.dropped.get(key, 0) + 1
+        return False
+
+    def suppressed(self, key):
+        return self.dropped.pop(key, 0)
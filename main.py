@@ -1,33 +1,59 @@
 import asyncio
 import logging
+import startup
+import latency
+import log_setup
 from config import Config
 from telegram_bot import TelegramListener
-from signal_parser import SignalParser
+from signal_router import SignalRouter
 from groww_trader import GrowwTrader
 
-logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL))
 logger = logging.getLogger(__name__)
 
+def create_handler(router, trader, in_flight):
+    """
+    Returns the TelegramListener callback: routes a message and, for a signal, starts
+    the order as a task tracked in `in_flight`.
+    """
+    def order_done(task):
+        in_flight.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Order task failed: {task.exception()}")
+
+    async def process_message(text, channel_id):
+        trace = latency.current()
+        signal = router.route(text, channel_id)
+        trace.mark("parse")
+        if signal:
+            logger.info("Signal detected: %s", signal)
+            # Place the order off-loop so Telethon keeps receiving messages meanwhile
+            task = asyncio.create_task(trader.place_order_async(signal))
+            in_flight.add(task)
+            task.add_done_callback(order_done)
+            task.add_done_callback(lambda _: trace.finish())
+        else:
+            logger.debug("No signal found in: %s", text)
+
+    return process_message
+
 async def main():
     try:
+        startup.mark("imports")
         Config.validate()
+        latency.setup("main")
         
-        parser = SignalParser()
+        router = SignalRouter()
+        startup.mark("parser")
         trader = GrowwTrader()
-        
-        async def process_message(text):
-            signal = parser.parse(text)
-            if signal:
-                logger.info(f"Signal detected: {signal}")
-                trader.place_order(signal)
-            else:
-                logger.debug(f"No signal found in: {text}")
+        startup.mark("trader")
 
-        listener = TelegramListener(process_message)
+        process_message = create_handler(router, trader, set())
+        listener = TelegramListener(process_message, channel_ids=router.channel_ids)
         await listener.start()
         
     except Exception as e:
         logger.error(f"Bot crashed: {e}")
 
 if __name__ == "__main__":
+    log_setup.setup("main")
     asyncio.run(main())
@@ -1,39 +1,81 @@
 import asyncio
 import logging
-import pandas as pd
 import json
 import os
+import startup
+import latency
+import log_setup
 from config import Config
 from groww_trader import GrowwTrader
+from order_dispatcher import OrderDispatcher
+from position_tracker import PositionTracker, PENDING, TRIGGERED, FILLED, EXITED, CANCELLED, session_start
+from price_watcher import PriceWatcher
+from risk_engine import get_risk_engine
+from signal_batcher import SignalBatcher
+from signal_journal import SignalJournal
+from signal_notify import create_waiter
+from signal_queue import SignalQueue
 
-logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL))
 logger = logging.getLogger(__name__)
 
-CSV_FILE = "trade_signals.csv"
 ACCOUNTS_FILE = "accounts.json"
 POLL_INTERVAL = 5
+FILL_MISSING_POLLS = 3  # Polls a leg may be unknown to the broker before it counts as never placed
+
+def read_accounts(path=ACCOUNTS_FILE):
+    """
+    Returns the account list from accounts.json, or None if the file is missing.
+    """
+    if not os.path.exists(path):
+        logger.error(f"{path} not found!")
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
 
 class MultiAccountManager:
-    def __init__(self):
+    def __init__(self, accounts=None, intake=True):
+        # intake=False: signals are handed in by a shard coordinator (shard_executor.py)
+        # instead of being read from the journal
         self.traders = []
-        self.processed_ids = set()
-        self.load_accounts()
-        self.load_processed_ids()
-
-    def load_accounts(self):
-        if not os.path.exists(ACCOUNTS_FILE):
-             logger.error(f"{ACCOUNTS_FILE} not found!")
-             return
-
-        with open(ACCOUNTS_FILE, 'r') as f:
-            accounts = json.load(f)
-            
+        self.dispatcher = OrderDispatcher()
+        # Bursts of signals ready at the same time share symbol lookups and go out as per-account baskets
+        self.batcher = SignalBatcher(self.dispatcher) if Config.SIGNAL_BATCH_WINDOW else None
+        self.journal = SignalJournal() if intake else None
+        self.queue = SignalQueue("multi_account_manager") if intake else None
+        self.cursor = None
+        self.load_accounts(accounts)
+        startup.mark("accounts")
+        if intake:
+            self.load_processed_ids()
+            startup.mark("journal")
+        self.watcher = PriceWatcher(self.fetch_prices)
+        # Dry run fetches no quotes, so the tracker gets no watcher to arm exits with
+        self.tracker = PositionTracker(watcher=None if Config.DRY_RUN else self.watcher, exit_order=self.place_exit)
+        startup.mark("positions")
+        self.risk = get_risk_engine()
+        if Config.DRY_RUN:
+            logger.info("[DRY RUN] No quotes are fetched: entry triggers count as hit at once, SL/target exits are not watched")
+        else:
+            # Exposure stays reserved until the tracker's exits release it
+            self.risk.attach(self.tracker)
+        self.exits_sent = set()  # Positions whose exit may already be at the broker
+        self.tracker.on_exit.append(lambda position: self.exits_sent.discard(position.position_id))
+
+    def load_accounts(self, accounts=None):
+        # `accounts` (same shape as accounts.json) overrides the file, e.g. for bench_pipeline.py
+        if accounts is None:
+            accounts = read_accounts()
+            if accounts is None:
+                return
+
         for acc in accounts:
             try:
                 trader = GrowwTrader(
                     api_key=acc.get("api_key"),
                     api_secret=acc.get("api_secret"),
-                    auth_token=acc.get("auth_token")
+                    auth_token=acc.get("auth_token"),
+                    lots=acc.get("lots"),
+                    name=acc["name"]
                 )
                 self.traders.append({"name": acc["name"], "trader": trader})
                 logger.info(f"Loaded account: {acc['name']}")
@@ -41,95 +83,246 @@ class MultiAccountManager:
                 logger.error(f"Failed to load account {acc.get('name')}: {e}")
 
     def load_processed_ids(self):
-        try:
-            df = pd.read_csv(CSV_FILE)
-            if "signal_id" in df.columns:
-                self.processed_ids = set(df["signal_id"].tolist())
-        except FileNotFoundError:
-            pass
+        # Resume from the saved checkpoint; on first run only new appends are read
+        self.cursor = self.queue.open_cursor(self.journal)
+
+    async def fetch_prices(self, symbols):
+        # Use the first trader to check prices (assuming all see same market data)
+        if not self.traders:
+            return {}
+        return await self.traders[0]["trader"].get_latest_prices_async(symbols)
 
-    async def monitor_and_execute(self, signal):
+    async def place_exit(self, position, reason, ltp):
+        trader = next((a["trader"] for a in self.traders if a["name"] == position.account), None)
+        if trader is None:
+            logger.error(f"Account {position.account} is no longer configured, cannot exit {position.symbol}")
+            return False
+        # Same order reference on every attempt; a retry first asks the broker what it already has
+        retry = position.position_id in self.exits_sent
+        self.exits_sent.add(position.position_id)
+        return await trader.place_exit_order_async(position.symbol, position.quantity, position.position_id, retry)
+
+    async def monitor_and_execute(self, signal, signal_id, positions=None):
         """
         Monitors price if needed, then executes trade for all accounts.
+        Every account's trade is tracked as a position (PENDING -> TRIGGERED -> FILLED);
+        accepted entries stay TRIGGERED until the broker reports them executed, then
+        get their SL/target exits armed. Returns the per-account dispatch report.
         """
         symbol = signal['symbol']
         trigger_price = signal.get('price')
+        trace = latency.current()
+
+        if positions is None:
+            positions = [
+                self.tracker.open(signal_id, account["name"], signal, account["trader"].get_quantity(signal))
+                for account in self.traders
+            ]
+            # The positions are in the tracker's WAL now; it owns the signal from here
+            self.queue.ack(signal_id)
         
         # Determine if we need to watch locally
-        if trigger_price:
-            logger.info(f"Starting Local Watcher for {symbol} > {trigger_price}...")
-            # Use the first trader to check prices (assuming all see same market data)
-            reference_trader = self.traders[0]["trader"]
-            
-            while True:
-                ltp = reference_trader.get_latest_price(symbol)
-                if ltp is None:
-                    logger.warning(f"Could not fetch LTP for {symbol}. Retrying...")
-                    await asyncio.sleep(2)
-                    continue
-                
-                logger.info(f"Watching {symbol}: LTP {ltp} | Trigger {trigger_price}")
-                
-                # Check for trigger condition
-                # Use a small buffer (e.g., 0.5%) or strict check
-                if ltp >= trigger_price:
-                    logger.info(f"Trigger HIT! {ltp} >= {trigger_price}. Executing orders...")
-                    break
-                
-                await asyncio.sleep(2) # Poll every 2 seconds
-
-        # Create tasks for all accounts
-        tasks = []
-        for account in self.traders:
-            name = account["name"]
-            trader = account["trader"]
-            logger.info(f"Executing trade for {name}...")
+        ltp = None
+        if trigger_price and any(p.state == PENDING for p in positions):
+            if Config.DRY_RUN:
+                logger.info("[DRY RUN] Treating trigger %s > %s as hit", symbol, trigger_price)
+            else:
+                logger.info("Starting Local Watcher for %s > %s...", symbol, trigger_price)
+                # One shared watcher polls every pending symbol in a single bulk request
+                ltp = await self.watcher.watch(symbol, trigger_price)
+                logger.info("Trigger HIT! %s >= %s. Executing orders...", ltp, trigger_price)
+            trace.mark("trigger_wait")
+
+        traders = {account["name"]: account["trader"] for account in self.traders}
+        accounts = []
+        for position in positions:
+            if position.account in traders:
+                if position.state == PENDING:
+                    self.tracker.transition(position, TRIGGERED)
+                accounts.append({"name": position.account, "trader": traders[position.account]})
+            else:
+                self.tracker.transition(position, CANCELLED, exit_reason="account removed")
+
+        # Fan out to all accounts at once.
+        # place_order sends SL_LIMIT as a safeguard: since price >= trigger it executes
+        # immediately, or sits as pending if price dips back.
+        try:
+            if self.batcher:
+                report = await self.batcher.submit(accounts, signal)
+            else:
+                report = await self.dispatcher.dispatch(accounts, signal)
+        except Exception as e:
+            # A failed batch fails every signal in it; its positions must not stay TRIGGERED
+            logger.error("Dispatch of %s failed: %s", symbol, e)
+            report = [{"account": a["name"], "success": False, "error": str(e), "queued_ms": 0.0, "latency_ms": 0.0}
+                      for a in accounts]
+        trace.mark("dispatch")
+        trace.finish()
+
+        results = {entry["account"]: entry for entry in report}
+        entry_price = ltp or self.watcher.last_prices.get(symbol) or trigger_price
+        for position in positions:
+            if position.state != TRIGGERED:
+                continue
+            result = results.get(position.account, {"success": False, "error": "no dispatch result"})
+            # The future stays here; the report goes on to shard coordinators as JSON
+            pending = result.pop("pending", None)
+            if result["success"]:
+                asyncio.create_task(self.confirm_fill(position, traders[position.account], entry_price))
+            elif pending is not None:
+                # Timed out, not failed: the order may be live, so the position stays TRIGGERED
+                result["pending"] = True
+                asyncio.create_task(self.confirm_fill(position, traders[position.account], entry_price, pending))
+            else:
+                self.tracker.transition(position, CANCELLED, exit_reason=result["error"])
+        return report
+
+    async def confirm_fill(self, position, trader, entry_price, pending=None):
+        """
+        Polls the broker until the entry order of a TRIGGERED position is done: FILLED with
+        the executed quantity and average price, or CANCELLED if nothing executed.
+        The SL_LIMIT entry can stay open at the broker if the price dips back below the limit,
+        so the interval backs off from FILL_POLL_INTERVAL up to FILL_POLL_MAX_INTERVAL.
+        `pending` is the OrderPending future of a place_order that timed out; it is awaited
+        first, and only a definite failure cancels the position.
+        """
+        if pending is not None:
             try:
-                # Pass directly since we already waited for the trigger
-                # We can now place a MARKET or IMMEDIATE LIMIT order since check passed
-                # BUT user might still want SL logic in system.
-                # Given user context: "Above is the buying price... set order on groww at buying price"
-                # If we bypassed locally, we can now place the order.
-                # Let's keep place_order logic which sends SL_LIMIT as a safeguard
-                # OR switch to MARKET if price is already crossed.
-                # For safety, we just call place_order which sends SL_LIMIT. 
-                # Since price >= trigger, SL_LIMIT will execute immediately or sit as pending if price dips back.
-                success = trader.place_order(signal)
-                status = "SUCCESS" if success else "FAILED"
-                logger.info(f"Account {name}: {status}")
+                placed = await pending
+                error = "entry order failed"
             except Exception as e:
-                logger.error(f"Account {name} failed: {e}")
-        
+                placed, error = False, str(e)
+            if not placed:
+                # place_order released its risk reservation itself (or never made one)
+                self.tracker.transition(position, CANCELLED, exit_reason=error)
+                return
+            logger.info(f"{position.position_id}: timed-out entry reached the broker, checking its fill")
+        missing_polls = 0
+        interval = Config.FILL_POLL_INTERVAL
+        while position.state == TRIGGERED:
+            try:
+                fill = await trader.get_order_fill_async(position.signal_id, position.symbol, position.quantity)
+            except Exception as e:
+                logger.warning(f"Fill check for {position.position_id} failed: {e}")
+                fill = None
+            if fill and not fill["open"]:
+                missing_polls = missing_polls + 1 if fill["missing"] else 0
+                if not fill["missing"] or missing_polls >= FILL_MISSING_POLLS:
+                    self._settle_entry(position, fill, entry_price)
+                    return
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, max(Config.FILL_POLL_MAX_INTERVAL, Config.FILL_POLL_INTERVAL))
+
+    def _settle_entry(self, position, fill, entry_price):
+        filled = fill["filled"]
+        if not filled:
+            self.risk.release(position.account, position.symbol, position.quantity, position.trigger)
+            self.tracker.transition(position, CANCELLED, exit_reason="entry not filled")
+            return
+        if filled < position.quantity:
+            logger.warning(f"{position.position_id}: entry filled {filled} of {position.quantity}")
+            self.risk.shrink(position.account, position.symbol, position.quantity - filled, position.trigger)
+        self.tracker.transition(position, FILLED, entry=fill["price"] or entry_price, quantity=filled)
+
+    def resume_positions(self, execute=None):
+        """
+        Picks up the positions recovered from the WAL. Entries left over from an earlier
+        session are cancelled; today's pending ones resume their trigger watch, and entries
+        in flight at shutdown are re-sent under the same order reference so the broker
+        doesn't place them twice. Filled ones get exits re-armed once the broker confirms
+        it still holds them (reconcile_filled).
+        `execute(signal, signal_id, positions)` defaults to monitor_and_execute.
+        Returns the IDs of the resumed signals.
+        """
+        execute = execute or self.monitor_and_execute
+        for position in self.tracker.positions(state=FILLED):
+            self.risk.restore(position.account, position.symbol, position.quantity, position.trigger)
+            # An exit may have gone out just before the shutdown
+            self.exits_sent.add(position.position_id)
+        resumed, filled = self.tracker.resume()
+        if filled:
+            asyncio.create_task(self.reconcile_filled(filled))
+        for signal_id, positions in resumed.items():
+            first = positions[0]
+            signal = {
+                "signal_id": signal_id, "symbol": first.symbol, "action": "BUY", "price": first.trigger,
+                "sl": first.sl, "target": first.target, "retry": any(p.state == TRIGGERED for p in positions),
+            }
+            asyncio.create_task(execute(signal, signal_id, positions))
+        return list(resumed)
+
+    async def reconcile_filled(self, positions):
+        """
+        Re-arms exits only for recovered FILLED positions the broker still holds; the rest
+        were closed outside the bot (e.g. intraday square-off) and are marked EXITED.
+        Without a broker answer (dry run, lookup failure) positions from an earlier
+        session are closed at the day rollover and today's are re-armed.
+        """
+        traders = {account["name"]: account["trader"] for account in self.traders}
+        since = session_start()
+        held = {}
+        # Newest first, so what the broker holds is matched to today's positions before older ones
+        for position in sorted(positions, key=lambda p: p.updated, reverse=True):
+            key = (position.account, position.symbol)
+            trader = traders.get(position.account)
+            if key not in held and trader is not None:
+                try:
+                    held[key] = await trader.get_held_quantity_async(position.symbol)
+                except Exception as e:
+                    logger.warning(f"Could not check {position.account} {position.symbol} at the broker: {e}")
+                    held[key] = None
+            remaining = held.get(key)
+
+            if remaining is None:
+                keep = position.updated >= since
+            else:
+                keep = remaining >= position.quantity
+                if keep:
+                    held[key] = remaining - position.quantity
+            if keep:
+                self.tracker.arm_exits(position)
+            else:
+                logger.warning(f"{position.account} {position.symbol}: no longer held at the broker, closing without an exit order")
+                self.tracker.transition(position, EXITED, exit_reason="closed at broker")
+
     def check_for_signals(self):
         try:
-            df = pd.read_csv(CSV_FILE)
-            new_signals = df[~df["signal_id"].isin(self.processed_ids)]
-            
-            for _, row in new_signals.iterrows():
-                signal_id = row["signal_id"]
-                signal = {
-                    "symbol": row["symbol"],
-                    "action": row["action"],
-                    "price": row["price"],
-                    "sl": row["stop_loss"],
-                    "target": row["target"]
-                }
+            # New journal rows are queued durably together with the checkpoint
+            records = self.cursor.read_new()
+            if records:
+                self.queue.ingest(records, self.cursor)
+
+            for item in self.queue.claim():
+                if any(f"{item.signal_id}:{account['name']}" in self.tracker.by_id for account in self.traders):
+                    # Crashed after opening positions but before the ack; resume() has it
+                    self.queue.ack(item.signal_id)
+                    continue
                 
-                logger.info(f"New Signal! Starting async monitor task...")
+                logger.info("New Signal %s! Starting async monitor task...", item.signal_id)
+                # The task copies the current context, so it carries this trace and correlation ID
+                latency.trace_from_journal(item.timestamp)
+                log_setup.set_correlation_id(item.signal_id)
                 # Fire and forget the monitor task so we can keep listening for new signals
-                asyncio.create_task(self.monitor_and_execute(signal))
-                self.processed_ids.add(signal_id)
+                asyncio.create_task(self.monitor_and_execute(dict(item.signal, retry=item.is_retry), item.signal_id))
+
+            self.queue.flush()
 
-        except FileNotFoundError:
-            pass
         except Exception as e:
             logger.error(f"Error reading CSV: {e}")
 
     async def start(self):
         logger.info(f"Starting Multi-Account Manager with {len(self.traders)} accounts...")
+        latency.setup("multi_account_manager")
+        self.resume_positions()
+
+        waiter = create_waiter(self.journal)
+        self.check_for_signals()
+        startup.ready("multi_account_manager", accounts=len(self.traders))
         while True:
+            await waiter.wait(POLL_INTERVAL)
             self.check_for_signals()
-            await asyncio.sleep(POLL_INTERVAL)
 
 if __name__ == "__main__":
+    log_setup.setup("multi_account_manager")
+    startup.mark("imports")
     asyncio.run(MultiAccountManager().start())
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+import latency
+from config import Config
+from groww_trader import OrderPending
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Async token bucket: `rate` acquisitions per second with bursts up to `burst`.
+    A rate of 0 disables limiting.
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class OrderDispatcher:
+    """
+    Sends one signal to every account at the same time.
+    Orders go through GrowwTrader.place_order_async, so the blocking growwapi calls
+    run on the bounded broker executor and the event loop (and signal intake)
+    keeps running while orders are in flight.
+    """
+    def __init__(self, account_rate=None, global_rate=None):
+        self.account_rate = Config.ACCOUNT_ORDER_RATE if account_rate is None else account_rate
+        self.global_limiter = RateLimiter(Config.GLOBAL_ORDER_RATE if global_rate is None else global_rate)
+        self.account_limiters = {}
+
+    def _limiter(self, name):
+        if name not in self.account_limiters:
+            self.account_limiters[name] = RateLimiter(self.account_rate)
+        return self.account_limiters[name]
+
+    async def _send(self, account, signal):
+        name = account["name"]
+        trace = latency.current()
+        queued = time.perf_counter()
+        with trace.span("rate_limit_wait", name):
+            await self._limiter(name).acquire()
+            await self.global_limiter.acquire()
+
+        started = time.perf_counter()
+        result = {"account": name, "success": False, "error": None}
+        try:
+            with trace.span("order", name):
+                result["success"] = bool(await account["trader"].place_order_async(signal))
+        except OrderPending as e:
+            # Not a failure: the order may be live. The caller settles it by order reference
+            result["error"] = str(e)
+            result["pending"] = e.future
+        except Exception as e:
+            result["error"] = str(e)
+        finished = time.perf_counter()
+
+        result["queued_ms"] = (started - queued) * 1000
+        result["latency_ms"] = (finished - started) * 1000
+        return result
+
+    async def dispatch(self, accounts, signal):
+        """
+        Places `signal` on every account concurrently.
+        Returns one report entry per account: success, error, queued_ms and latency_ms,
+        plus `pending` (OrderPending.future) for orders whose outcome is not known yet.
+        """
+        started = time.perf_counter()
+        report = await asyncio.gather(*(self._send(account, signal) for account in accounts))
+        total_ms = (time.perf_counter() - started) * 1000
+
+        for entry in report:
+            logger.info(
+                "Account %s: %s%s in %.1f ms (queued %.1f ms)", entry['account'],
+                "SUCCESS" if entry["success"] else "PENDING" if "pending" in entry else "FAILED", f" ({entry['error']})" if entry["error"] else "",
+                entry['latency_ms'], entry['queued_ms'],
+            )
+        ok = sum(1 for entry in report if entry["success"])
+        logger.info("%s: %d/%d accounts placed in %.1f ms", signal['symbol'], ok, len(report), total_ms)
+        return report
+
+    async def _send_basket(self, account, signals):
+        with latency.current().span("basket", account["name"]):
+            return await asyncio.gather(*(self._send(account, signal) for signal in signals))
+
+    async def dispatch_basket(self, baskets):
+        """
+        Places several signals at once. `baskets` is [(account, [signal, ...])]: every
+        account's basket, and every order in it, goes out concurrently under the same
+        rate limits as dispatch(). Returns the report entries, each tagged with the
+        signal's signal_id and symbol.
+        """
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self._send_basket(account, signals) for account, signals in baskets))
+        total_ms = (time.perf_counter() - started) * 1000
+
+        report = []
+        for (account, signals), entries in zip(baskets, results):
+            for signal, entry in zip(signals, entries):
+                entry["signal_id"] = signal.get("signal_id")
+                entry["symbol"] = signal["symbol"]
+                if not entry["success"]:
+                    logger.warning("Account %s: %s FAILED%s", entry['account'], entry['symbol'],
+                                   f" ({entry['error']})" if entry["error"] else "")
+                report.append(entry)
+        ok = sum(1 for entry in report if entry["success"])
+        logger.info("Basket: %d/%d orders on %d accounts placed in %.1f ms", ok, len(report), len(baskets), total_ms)
+        return report
@@ -0,0 +1,299 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import date, datetime
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+PENDING = "PENDING"      # Waiting for the entry trigger
+TRIGGERED = "TRIGGERED"  # Trigger crossed, entry order sent and not yet executed
+FILLED = "FILLED"        # Entry executed at the broker, SL/target exits armed
+EXITED = "EXITED"        # Exit order placed
+CANCELLED = "CANCELLED"  # Entry rejected or abandoned
+
+TRANSITIONS = {
+    PENDING: {TRIGGERED, CANCELLED},
+    TRIGGERED: {FILLED, CANCELLED},
+    FILLED: {EXITED},
+}
+CLOSED = {EXITED, CANCELLED}
+
+
+def session_start():
+    """
+    Epoch seconds at which the current trading session (today) began.
+    """
+    return datetime.combine(date.today(), datetime.min.time()).timestamp()
+
+
+class Position:
+    """
+    One account's trade for one signal. Lives in a reusable slot of PositionTracker.slots.
+    """
+    __slots__ = ("slot", "position_id", "signal_id", "account", "symbol", "quantity",
+                 "trigger", "sl", "target", "state", "entry", "exit_price", "exit_reason", "updated")
+
+    def __init__(self, slot, position_id, signal_id, account, symbol, quantity, trigger, sl, target):
+        self.slot = slot
+        self.position_id = position_id
+        self.signal_id = signal_id
+        self.account = account
+        self.symbol = symbol
+        self.quantity = quantity
+        self.trigger = trigger
+        self.sl = sl
+        self.target = target
+        self.state = PENDING
+        self.entry = None
+        self.exit_price = None
+        self.exit_reason = None
+        self.updated = time.time()
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != "slot"}
+
+    @property
+    def pnl(self):
+        if self.entry is None or self.exit_price is None:
+            return None
+        return (self.exit_price - self.entry) * self.quantity
+
+
+class PositionTracker:
+    """
+    Order/position state machine: PENDING -> TRIGGERED -> FILLED -> EXITED (or CANCELLED).
+
+    Positions are kept in slot-based records (closed slots are reused) and indexed
+    by symbol and account. Every transition is appended to a write-ahead log and
+    fsync'd before it is applied, so a restart rebuilds the open positions from the
+    log alone. Filled positions get their stop loss and target watched by the shared
+    PriceWatcher; the first one crossed triggers `exit_order(position, reason, ltp)`.
+    Closed positions are appended to POSITION_HISTORY_FILE for history_archive.py
+    before compaction drops them from the log.
+    """
+    def __init__(self, wal_path=None, watcher=None, exit_order=None, history_path=None):
+        self.wal_path = wal_path or Config.POSITION_WAL_FILE
+        self.history_path = history_path or Config.POSITION_HISTORY_FILE
+        self.watcher = watcher
+        self.exit_order = exit_order  # async callable(position, reason, ltp) -> bool
+        self.slots = []
+        self.free_slots = []
+        self.by_id = {}
+        self.by_symbol = {}
+        self.by_account = {}
+        self.exit_watches = {}
+        self.on_exit = []  # callables(position), e.g. P&L accounting
+
+        self.recover()
+        self._wal = open(self.wal_path, "a", encoding="utf-8")
+
+    # --- Storage -------------------------------------------------------------
+
+    def _log(self, entry):
+        if self._wal is None:
+            return
+        self._wal.write(json.dumps(entry) + "\n")
+        self._wal.flush()
+        os.fsync(self._wal.fileno())
+
+    def _record_closed(self, positions, sync=False):
+        # JSON lines; a position can appear twice (live and again on recovery), the archive keeps the last
+        if not self.history_path or not positions:
+            return
+        with open(self.history_path, "a", encoding="utf-8") as f:
+            for position in positions:
+                f.write(json.dumps(dict(position.to_dict(), pnl=position.pnl)) + "\n")
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _insert(self, position):
+        self.slots[position.slot] = position
+        self.by_id[position.position_id] = position
+        self.by_symbol.setdefault(position.symbol, set()).add(position.slot)
+        self.by_account.setdefault(position.account, set()).add(position.slot)
+
+    def _release(self, position):
+        self.by_id.pop(position.position_id, None)
+        self.by_symbol.get(position.symbol, set()).discard(position.slot)
+        self.by_account.get(position.account, set()).discard(position.slot)
+        self.slots[position.slot] = None
+        self.free_slots.append(position.slot)
+
+    def _next_slot(self):
+        if self.free_slots:
+            return self.free_slots.pop()
+        self.slots.append(None)
+        return len(self.slots) - 1
+
+    def recover(self):
+        """
+        Replays the write-ahead log, then compacts it to just the open positions.
+        """
+        self._wal = None
+        if not os.path.exists(self.wal_path):
+            return
+
+        closed = []
+        with open(self.wal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    continue
+                if entry["op"] == "open":
+                    self._apply_open(entry["position"])
+                elif entry["op"] == "state":
+                    position = self.by_id.get(entry["position_id"])
+                    if position:
+                        self._apply_state(position, entry["state"], entry.get("fields", {}), entry.get("at"))
+                        if position.state in CLOSED:
+                            closed.append(position)
+
+        # Compaction drops closed positions, so make sure the history has them first
+        self._record_closed(closed, sync=True)
+        open_positions = [p for p in self.slots if p is not None]
+        tmp = f"{self.wal_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for position in open_positions:
+                f.write(json.dumps({"op": "open", "position": position.to_dict()}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.wal_path)
+        logger.info(f"Recovered {len(open_positions)} open positions from {self.wal_path}")
+
+    def _apply_open(self, data):
+        position = Position(
+            self._next_slot(), data["position_id"], data["signal_id"], data["account"], data["symbol"],
+            data["quantity"], data.get("trigger"), data.get("sl"), data.get("target")
+        )
+        for name in ("state", "entry", "exit_price", "exit_reason", "updated"):
+            if name in data:
+                setattr(position, name, data[name])
+        self._insert(position)
+        return position
+
+    def _apply_state(self, position, state, fields, at=None):
+        position.state = state
+        for name, value in fields.items():
+            setattr(position, name, value)
+        position.updated = at or time.time()
+        if state in CLOSED:
+            self._release(position)
+
+    # --- State machine -------------------------------------------------------
+
+    def open(self, signal_id, account, signal, quantity):
+        position_id = f"{signal_id}:{account}"
+        if position_id in self.by_id:
+            return self.by_id[position_id]
+        data = {
+            "position_id": position_id, "signal_id": signal_id, "account": account,
+            "symbol": signal["symbol"], "quantity": quantity, "trigger": signal.get("price"),
+            "sl": signal.get("sl"), "target": signal.get("target"),
+        }
+        self._log({"op": "open", "position": data})
+        return self._apply_open(data)
+
+    def transition(self, position, state, **fields):
+        allowed = TRANSITIONS.get(position.state, set())
+        if state not in allowed:
+            raise ValueError(f"{position.position_id}: invalid transition {position.state} -> {state}")
+        now = time.time()
+        self._log({"op": "state", "position_id": position.position_id, "state": state, "fields": fields, "at": now})
+        self._apply_state(position, state, fields, now)
+        logger.info(f"{position.account} {position.symbol}: {state}")
+
+        if state == FILLED:
+            self.arm_exits(position)
+        elif state == EXITED:
+            for callback in self.on_exit:
+                callback(position)
+        if state in CLOSED:
+            self._record_closed([position])
+        return position
+
+    # --- Queries -------------------------------------------------------------
+
+    def positions(self, symbol=None, account=None, state=None):
+        if symbol is not None:
+            slots = self.by_symbol.get(symbol, set())
+        elif account is not None:
+            slots = self.by_account.get(account, set())
+        else:
+            slots = range(len(self.slots))
+        result = [self.slots[i] for i in slots if self.slots[i] is not None]
+        if account is not None and symbol is not None:
+            result = [p for p in result if p.account == account]
+        if state is not None:
+            result = [p for p in result if p.state == state]
+        return result
+
+    # --- Exit management -----------------------------------------------------
+
+    def arm_exits(self, position):
+        """
+        Watches the stop loss (LTP <= sl) and target (LTP >= target) of a filled position.
+        """
+        if self.watcher is None or self.exit_order is None:
+            return
+        watches = []
+        if position.sl:
+            watches.append(("SL", self.watcher.watch(position.symbol, position.sl, above=False)))
+        if position.target:
+            watches.append(("TARGET", self.watcher.watch(position.symbol, position.target, above=True)))
+        if not watches:
+            return
+        self.exit_watches[position.position_id] = watches
+        for reason, future in watches:
+            future.add_done_callback(lambda f, r=reason: self._on_exit_hit(position, r, f))
+
+    def _on_exit_hit(self, position, reason, future):
+        if future.cancelled() or position.state != FILLED:
+            return
+        # Whichever level is crossed first wins; drop the other watch
+        for _, other in self.exit_watches.pop(position.position_id, []):
+            if other is not future:
+                other.cancel()
+        asyncio.get_running_loop().create_task(self._exit(position, reason, future.result()))
+
+    async def _exit(self, position, reason, ltp):
+        logger.info(f"{position.account} {position.symbol}: {reason} hit at {ltp}, exiting {position.quantity}")
+        try:
+            ok = await self.exit_order(position, reason, ltp)
+        except Exception as e:
+            logger.error(f"Exit order failed for {position.position_id}: {e}")
+            ok = False
+
+        if ok:
+            self.transition(position, EXITED, exit_price=ltp, exit_reason=reason)
+        else:
+            # Re-arm; the next tick retries if the level is still crossed
+            self.arm_exits(position)
+
+    def resume(self, since=None):
+        """
+        Sorts the positions recovered from the WAL. Entries from before `since` (default:
+        the start of today's session) are CANCELLED: their DAY orders have lapsed and the
+        symbol may now resolve to a different contract. Returns (pending, filled): the
+        remaining PENDING and TRIGGERED positions grouped by signal ID, so the caller can
+        resume watching the trigger or re-send the entry (under the same order reference),
+        and the FILLED positions, whose exits the caller arms once the broker still holds them.
+        """
+        since = session_start() if since is None else since
+        pending, filled = {}, []
+        for position in self.positions():
+            if position.state == FILLED:
+                filled.append(position)
+            elif position.updated < since:
+                logger.warning(f"{position.account} {position.symbol}: {position.state} entry from an earlier session, cancelling")
+                self.transition(position, CANCELLED, exit_reason="previous session")
+            else:
+                if position.state == TRIGGERED:
+                    logger.warning(f"{position.account} {position.symbol}: entry was in flight during shutdown, checking the broker")
+                pending.setdefault(position.signal_id, []).append(position)
+        return pending, filled
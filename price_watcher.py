@@ -0,0 +1,111 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from config import Config
+from log_setup import Sampler
+
+logger = logging.getLogger(__name__)
+
+
+class PriceWatcher:
+    """
+    One polling loop for every pending trigger.
+    Each tick fetches all watched symbols in a single bulk LTP request and fans the
+    prices out to the registered triggers. Per symbol, triggers are kept in two heaps
+    (crossings above and below), so a tick only touches the triggers that actually fired.
+    """
+    def __init__(self, fetch_prices, interval=None):
+        # async fetch_prices(symbols) -> {symbol: ltp}, e.g. GrowwTrader.get_latest_prices_async
+        self.fetch_prices = fetch_prices
+        self.interval = interval or Config.PRICE_WATCH_INTERVAL
+        self.above = {}  # symbol -> heap of (level, seq, future)
+        self.below = {}  # symbol -> heap of (-level, seq, future)
+        self.last_prices = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._log_sampler = Sampler()  # Tick logs repeat every interval; keep one per LOG_SAMPLE_INTERVAL
+
+    def watch(self, symbol, level, above=True):
+        """
+        Returns a future resolved with the LTP once it crosses `level`
+        (LTP >= level when `above`, LTP <= level otherwise).
+        Cancel the future to stop watching.
+        """
+        future = asyncio.get_running_loop().create_future()
+        book, key = (self.above, level) if above else (self.below, -level)
+        heapq.heappush(book.setdefault(symbol, []), (key, next(self._seq), future))
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return future
+
+    def _prune(self, book, symbol):
+        heap = book.get(symbol)
+        while heap and heap[0][2].done():
+            heapq.heappop(heap)
+        if heap is not None and not heap:
+            del book[symbol]
+
+    def symbols(self):
+        for book in (self.above, self.below):
+            for symbol in list(book):
+                self._prune(book, symbol)
+        return sorted(set(self.above) | set(self.below))
+
+    def _fire(self, symbol, ltp):
+        fired = 0
+        heap = self.above.get(symbol)
+        while heap and heap[0][0] <= ltp:
+            _, _, future = heapq.heappop(heap)
+            if not future.done():
+                future.set_result(ltp)
+                fired += 1
+
+        heap = self.below.get(symbol)
+        while heap and -heap[0][0] >= ltp:
+            _, _, future = heapq.heappop(heap)
+            if not future.done():
+                future.set_result(ltp)
+                fired += 1
+        return fired
+
+    def tick(self, prices):
+        """
+        Applies one batch of prices. Returns how many triggers fired.
+        """
+        fired = 0
+        for symbol, ltp in prices.items():
+            if ltp is None:
+                continue
+            self.last_prices[symbol] = ltp
+            fired += self._fire(symbol, ltp)
+        return fired
+
+    async def run(self):
+        while True:
+            symbols = self.symbols()
+            if not symbols:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            try:
+                prices = await self.fetch_prices(symbols)
+            except Exception as e:
+                if self._log_sampler.allow("fetch"):
+                    logger.error("Bulk LTP fetch failed: %r (%d similar suppressed)", e, self._log_sampler.suppressed("fetch"))
+                prices = {}
+
+            missing = [s for s in symbols if prices.get(s) is None]
+            if missing and self._log_sampler.allow("missing"):
+                logger.warning(
+                    "Could not fetch LTP for %d of %d symbols (%s). Retrying... (%d similar suppressed)",
+                    len(missing), len(symbols), ", ".join(missing[:10]), self._log_sampler.suppressed("missing"),
+                )
+
+            fired = self.tick(prices)
+            if fired or self._log_sampler.allow("tick"):
+                logger.debug("Watch tick: %d symbols, %d triggers fired", len(symbols), fired)
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,284 @@
+import logging
+import threading
+import time
+from datetime import date
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+GLOBAL = "*"  # Book that aggregates every account
+
+
+class RiskRejected(Exception):
+    """
+    Raised by GrowwTrader.place_order when the risk gate blocks an order.
+    Unlike a failed order it should not be retried.
+    """
+
+
+class OrderBucket:
+    """
+    Non-blocking token bucket: take() fails instead of waiting. A rate of 0 disables it.
+    """
+    __slots__ = ("rate", "tokens", "updated")
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = max(1.0, rate)
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        if not self.rate:
+            return True
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RiskBook:
+    """
+    Running totals for one account (or GLOBAL), updated incrementally on every
+    order and exit so a check never has to scan positions.
+    """
+    __slots__ = ("open_positions", "notional", "symbols", "realized_pnl", "orders", "margin", "margin_at")
+
+    def __init__(self, order_rate):
+        self.open_positions = 0
+        self.notional = 0.0
+        self.symbols = {}  # symbol -> [open positions, notional]
+        self.realized_pnl = 0.0
+        self.orders = OrderBucket(order_rate)
+        self.margin = None
+        self.margin_at = 0.0
+
+
+class RiskEngine:
+    """
+    Pre-trade gate in front of GrowwTrader.place_order.
+
+    `check()` enforces, per account and across all accounts: open positions,
+    notional, per-symbol positions and exposure, daily realised loss and orders
+    per second, plus available margin from a snapshot refreshed in the background.
+    An order that passes reserves its exposure; `release()` undoes it if the order
+    fails and `on_exit()` (a PositionTracker.on_exit hook) frees it and books the P&L.
+    Exposure is only held once a tracker is attached with `attach()`: without one no
+    exit would ever free it, so position and exposure limits apply per order.
+    A limit of 0 disables that check. Counters reset at the first check of a new day.
+    """
+    def __init__(self):
+        self.max_positions = Config.RISK_MAX_OPEN_POSITIONS
+        self.max_notional = Config.RISK_MAX_NOTIONAL
+        self.max_symbol_positions = Config.RISK_MAX_SYMBOL_POSITIONS
+        self.max_symbol_notional = Config.RISK_MAX_SYMBOL_NOTIONAL
+        self.max_daily_loss = Config.RISK_MAX_DAILY_LOSS
+        self.order_rate = Config.RISK_MAX_ORDER_RATE
+        self.global_max_notional = Config.RISK_GLOBAL_MAX_NOTIONAL
+        self.global_max_daily_loss = Config.RISK_GLOBAL_MAX_DAILY_LOSS
+        self.global_order_rate = Config.RISK_GLOBAL_MAX_ORDER_RATE
+        self.margin_refresh = Config.RISK_MARGIN_REFRESH
+        self.holds_exposure = False  # True once a PositionTracker feeds exits back
+        self.books = {}
+        self.traders = {}
+        self.day = date.today()
+        self.rejections = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._global = self._book(GLOBAL)
+
+    def _book(self, account):
+        book = self.books.get(account)
+        if book is None:
+            book = self.books[account] = RiskBook(self.global_order_rate if account == GLOBAL else self.order_rate)
+        return book
+
+    def _roll_day(self):
+        today = date.today()
+        if today == self.day:
+            return
+        # Intraday (I_FO) positions don't carry over, so a new day starts flat
+        logger.info(f"New trading day {today}, resetting risk counters")
+        self.day = today
+        for account in list(self.books):
+            margin = self.books[account].margin, self.books[account].margin_at
+            self.books[account] = book = RiskBook(self.global_order_rate if account == GLOBAL else self.order_rate)
+            book.margin, book.margin_at = margin
+        self._global = self.books[GLOBAL]
+
+    def _violation(self, book, symbol, notional, now):
+        if self.max_daily_loss and book.realized_pnl <= -self.max_daily_loss:
+            return f"daily loss limit hit ({book.realized_pnl:.2f})"
+        if self.global_max_daily_loss and self._global.realized_pnl <= -self.global_max_daily_loss:
+            return f"global daily loss limit hit ({self._global.realized_pnl:.2f})"
+        if self.max_positions and book.open_positions >= self.max_positions:
+            return f"{book.open_positions} open positions (max {self.max_positions})"
+        held = book.symbols.get(symbol)
+        if held and self.max_symbol_positions and held[0] >= self.max_symbol_positions:
+            return f"already holding {symbol}"
+        if self.max_symbol_notional and (held[1] if held else 0.0) + notional > self.max_symbol_notional:
+            return f"{symbol} exposure would exceed {self.max_symbol_notional:.0f}"
+        if self.max_notional and book.notional + notional > self.max_notional:
+            return f"notional would exceed {self.max_notional:.0f}"
+        if self.global_max_notional and self._global.notional + notional > self.global_max_notional:
+            return f"global notional would exceed {self.global_max_notional:.0f}"
+        # A snapshot older than three refresh intervals is treated as unknown, not enforced
+        if book.margin is not None and now - book.margin_at < 3 * self.margin_refresh:
+            if book.notional + notional > book.margin:
+                return f"insufficient margin ({book.margin:.0f} available)"
+        if not book.orders.take(now):
+            return f"order rate above {self.order_rate}/s"
+        if not self._global.orders.take(now):
+            return f"global order rate above {self.global_order_rate}/s"
+        return None
+
+    def check(self, account, symbol, quantity, price):
+        """
+        Returns None if the order may go out (and reserves its exposure),
+        otherwise the reason it was rejected. `price` may be None for market
+        orders, in which case the order counts toward positions but not notional.
+        """
+        notional = quantity * (price or 0.0)
+        now = time.monotonic()
+        with self._lock:
+            self._roll_day()
+            book = self._book(account)
+            reason = self._violation(book, symbol, notional, now)
+            if reason:
+                self.rejections += 1
+                return reason
+            self._reserve(book, symbol, notional)
+        return None
+
+    def _reserve(self, book, symbol, notional):
+        for b in (book, self._global):
+            b.open_positions += 1
+            b.notional += notional
+            held = b.symbols.setdefault(symbol, [0, 0.0])
+            held[0] += 1
+            held[1] += notional
+
+    def restore(self, account, symbol, quantity, price):
+        """
+        Re-reserves exposure for a position recovered after a restart, without checks.
+        """
+        with self._lock:
+            self._reserve(self._book(account), symbol, quantity * (price or 0.0))
+
+    def release(self, account, symbol, quantity, price, pnl=None):
+        """
+        Frees the exposure reserved by check(); books `pnl` when a position closes.
+        """
+        notional = quantity * (price or 0.0)
+        with self._lock:
+            for b in (self._book(account), self._global):
+                b.open_positions = max(0, b.open_positions - 1)
+                b.notional = max(0.0, b.notional - notional)
+                held = b.symbols.get(symbol)
+                if held:
+                    held[0] -= 1
+                    held[1] = max(0.0, held[1] - notional)
+                    if held[0] <= 0:
+                        del b.symbols[symbol]
+                if pnl:
+                    b.realized_pnl += pnl
+
+    def shrink(self, account, symbol, quantity, price):
+        """
+        Frees the exposure of `quantity` units that check() reserved but never filled;
+        the position itself stays open.
+        """
+        notional = quantity * (price or 0.0)
+        with self._lock:
+            for b in (self._book(account), self._global):
+                b.notional = max(0.0, b.notional - notional)
+                held = b.symbols.get(symbol)
+                if held:
+                    held[1] = max(0.0, held[1] - notional)
+
+    def attach(self, tracker):
+        """
+        Holds each placed order's exposure until `tracker` reports its position closed.
+        """
+        tracker.on_exit.append(self.on_exit)
+        self.holds_exposure = True
+
+    def on_exit(self, position):
+        """
+        PositionTracker.on_exit hook: frees the position's exposure and books its P&L.
+        """
+        self.release(position.account, position.symbol, position.quantity, position.trigger, position.pnl)
+
+    # --- Margin snapshots ----------------------------------------------------
+
+    def register(self, account, trader):
+        """
+        Adds an account whose available margin is refreshed in the background.
+        """
+        self.traders[account] = trader
+        if self.margin_refresh and not trader.dry_run:
+            self.start()
+
+    @staticmethod
+    def _available_margin(details):
+        fno = details.get("fno_margin_details") or {}
+        for value in (fno.get("option_buy_balance_available"), details.get("clear_cash")):
+            if value is not None:
+                return float(value)
+        return None
+
+    def refresh_margins(self):
+        for account, trader in list(self.traders.items()):
+            if trader.dry_run:
+                continue
+            try:
+                margin = self._available_margin(trader.groww.get_available_margin_details())
+            except Exception as e:
+                logger.warning(f"Margin refresh failed for {account}: {e}")
+                continue
+            if margin is None:
+                continue
+            with self._lock:
+                book = self._book(account)
+                # Margin is what's free now; add back what we have reserved since
+                # so check() can compare against reserved notional
+                book.margin = margin + book.notional
+                book.margin_at = time.monotonic()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh_margins()
+            self._stop.wait(self.margin_refresh)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="risk-margins", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                account: {
+                    "open_positions": b.open_positions, "notional": b.notional,
+                    "realized_pnl": b.realized_pnl, "margin": b.margin,
+                }
+                for account, b in self.books.items()
+            }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_risk_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RiskEngine()
+        return _engine
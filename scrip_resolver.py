@@ -0,0 +1,356 @@
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+import log_setup
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+INSTRUMENT_MASTER_URL = "https://growwapi-assets.groww.in/instruments/instrument.csv"
+MONTHS = {m: i for i, m in enumerate(
+    ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"], start=1)}
+
+# NIFTY 26100 PE / NIFTY 21SEP 26100 PE / NIFTY 21 SEP 25 26100 CE / RELIANCE
+SYMBOL_PATTERN = re.compile(
+    r"^(?P<underlying>[A-Z][A-Z0-9&\-]*?)"
+    r"(?:\s*(?P<day>\d{1,2})\s*(?P<month>JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)\s*(?P<year>\d{2,4})?)?"
+    r"(?:\s+(?P<strike>\d+(?:\.\d+)?)\s*(?P<option>CE|PE))?$"
+)
+
+
+class ParsedSymbol:
+    __slots__ = ("underlying", "strike", "option_type", "day", "month", "year")
+
+    def __init__(self, underlying, strike=None, option_type="EQ", day=None, month=None, year=None):
+        self.underlying = underlying
+        self.strike = strike
+        self.option_type = option_type
+        self.day = day
+        self.month = month
+        self.year = year
+
+    @property
+    def key(self):
+        return (self.underlying, self.strike, self.option_type)
+
+    def matches_expiry(self, expiry):
+        if self.day is None:
+            return True
+        if expiry is None or expiry.day != self.day or expiry.month != self.month:
+            return False
+        return self.year is None or expiry.year % 100 == self.year % 100
+
+
+def normalize_symbol(symbol):
+    return " ".join(str(symbol).upper().split())
+
+
+def parse_symbol(symbol):
+    """
+    Splits a signal symbol into underlying, strike, CE/PE and optional expiry.
+    Returns None for anything that doesn't look like a tradable name.
+    """
+    match = SYMBOL_PATTERN.match(normalize_symbol(symbol))
+    if not match:
+        return None
+    g = match.groupdict()
+    return ParsedSymbol(
+        underlying=g["underlying"],
+        strike=float(g["strike"]) if g["strike"] else None,
+        option_type=g["option"] or "EQ",
+        day=int(g["day"]) if g["day"] else None,
+        month=MONTHS[g["month"]] if g["month"] else None,
+        year=int(g["year"]) if g["year"] else None,
+    )
+
+
+class Scrip:
+    __slots__ = ("security_id", "display_name", "trading_symbol", "exchange", "expiry")
+
+    def __init__(self, security_id, display_name, trading_symbol=None, exchange="NSE", expiry=None):
+        self.security_id = security_id
+        self.display_name = display_name
+        self.trading_symbol = trading_symbol or display_name
+        self.exchange = exchange
+        self.expiry = expiry
+
+    def to_dict(self):
+        return {
+            "security_id": self.security_id,
+            "display_name": self.display_name,
+            "trading_symbol": self.trading_symbol,
+            "exchange": self.exchange,
+            "expiry": self.expiry.isoformat() if self.expiry else None,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        expiry = date.fromisoformat(d["expiry"]) if d.get("expiry") else None
+        return cls(d["security_id"], d["display_name"], d.get("trading_symbol"), d.get("exchange", "NSE"), expiry)
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d", "%d-%m-%Y", "%d%b%Y", "%d-%b-%Y"):
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class ScripResolver:
+    """
+    Resolves signal symbols to broker security IDs without a network round-trip.
+
+    1. In-memory index built once from the local instrument master CSV
+       (Groww instrument.csv layout: trading_symbol, underlying_symbol, strike_price,
+       expiry_date, instrument_type, exchange and the ID column INSTRUMENT_ID_COLUMN).
+    2. LRU cache of live `search_scrip` hits with a TTL; entries are dropped once
+       their contract has expired and the whole cache is flushed when the day changes.
+    3. Live `search_scrip` as a last resort.
+    """
+    def __init__(self, master_path=None, cache_path=None, cache_size=None, ttl=None, background=False):
+        """
+        With `background`, the instrument master is indexed on a separate thread so the
+        caller can start up immediately; resolve() waits for the index on first use.
+        """
+        self.master_path = master_path or Config.INSTRUMENT_MASTER_FILE
+        self.cache_path = cache_path or Config.SCRIP_CACHE_FILE
+        self.cache_size = cache_size or Config.SCRIP_CACHE_SIZE
+        self.ttl = ttl or Config.SCRIP_CACHE_TTL
+        self.index = {}
+        self.cache = OrderedDict()
+        self.hits = {"master": 0, "cache": 0, "live": 0}
+        self._day = date.today()
+        self._lock = threading.Lock()
+        self.master_ready = threading.Event()
+
+        self.load_cache()
+        if background:
+            threading.Thread(target=self.load_master, name="instrument-master", daemon=True).start()
+        else:
+            self.load_master()
+
+    def load_master(self):
+        try:
+            self._load_master()
+        finally:
+            self.master_ready.set()
+
+    def _load_master(self):
+        if not self.master_path or not os.path.exists(self.master_path):
+            logger.warning(f"Instrument master {self.master_path} not found, resolving via live search only")
+            return
+
+        started = time.perf_counter()
+        index = {}
+        id_column = Config.INSTRUMENT_ID_COLUMN
+        with open(self.master_path, "r", newline="") as f:
+            for row in csv.DictReader(f):
+                instrument_type = (row.get("instrument_type") or "").upper()
+                exchange = (row.get("exchange") or "NSE").upper()
+                trading_symbol = (row.get("trading_symbol") or "").upper()
+                if instrument_type in ("CE", "PE"):
+                    try:
+                        strike = float(row.get("strike_price") or 0)
+                    except ValueError:
+                        continue
+                    key = ((row.get("underlying_symbol") or "").upper(), strike, instrument_type)
+                elif instrument_type == "EQ":
+                    key = (trading_symbol, None, "EQ")
+                else:
+                    continue
+
+                scrip = Scrip(
+                    security_id=row.get(id_column) or trading_symbol,
+                    display_name=row.get("name") or trading_symbol,
+                    trading_symbol=trading_symbol,
+                    exchange=exchange,
+                    expiry=_parse_date(row.get("expiry_date")),
+                )
+                index.setdefault(key, []).append(scrip)
+
+        for scrips in index.values():
+            # Nearest expiry first; NSE ahead of BSE for dual-listed equities
+            scrips.sort(key=lambda s: (s.expiry or date.max, s.exchange != "NSE"))
+
+        self.index = index
+        logger.info(f"Loaded {len(index)} instruments from {self.master_path} in {time.perf_counter() - started:.2f}s")
+
+    def _from_master(self, parsed):
+        candidates = self.index.get(parsed.key)
+        if not candidates:
+            return None
+        today = date.today()
+        for scrip in candidates:
+            if scrip.expiry and scrip.expiry < today:
+                continue
+            if parsed.matches_expiry(scrip.expiry):
+                return scrip
+        return None
+
+    def _roll_day(self):
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self.cache.clear()
+
+    def _from_cache(self, key):
+        with self._lock:
+            self._roll_day()
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            scrip, expires_at = entry
+            if time.time() > expires_at or (scrip.expiry and scrip.expiry < self._day):
+                del self.cache[key]
+                return None
+            self.cache.move_to_end(key)
+            return scrip
+
+    def _store(self, key, scrip):
+        with self._lock:
+            self.cache[key] = (scrip, time.time() + self.ttl)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def resolve(self, symbol, client=None):
+        """
+        Returns a Scrip for the symbol, or None if it can't be resolved.
+        `client` is a GrowwAPI used only when neither the master nor the cache knows the symbol.
+        """
+        if not self.master_ready.is_set():
+            self.master_ready.wait()
+        key = normalize_symbol(symbol)
+        parsed = parse_symbol(key)
+        if parsed:
+            scrip = self._from_master(parsed)
+            if scrip:
+                self.hits["master"] += 1
+                return scrip
+
+        scrip = self._from_cache(key)
+        if scrip:
+            self.hits["cache"] += 1
+            return scrip
+
+        if client is None:
+            return None
+
+        results = client.search_scrip(symbol)
+        if not results:
+            return None
+        # Assuming the first result is the correct one (usually correct for explicit names)
+        first = results[0]
+        scrip = Scrip(first['searchId'], first.get('displayName', symbol), first.get('tradingSymbol'))
+        self._store(key, scrip)
+        self.hits["live"] += 1
+        return scrip
+
+    def prewarm(self, symbols, client=None):
+        """
+        Resolves each symbol ahead of time so the first order skips the lookup.
+        """
+        resolved = 0
+        for symbol in symbols:
+            try:
+                if self.resolve(symbol, client):
+                    resolved += 1
+            except Exception as e:
+                logger.warning(f"Pre-warm failed for {symbol}: {e}")
+        logger.info(f"Pre-warmed {resolved}/{len(symbols)} symbols")
+        return resolved
+
+    def load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable scrip cache {self.cache_path}: {e}")
+            return
+        now = time.time()
+        for key, entry in data.items():
+            if entry["expires_at"] > now:
+                self.cache[key] = (Scrip.from_dict(entry["scrip"]), entry["expires_at"])
+
+    def save_cache(self):
+        with self._lock:
+            data = {k: {"scrip": s.to_dict(), "expires_at": exp} for k, (s, exp) in self.cache.items()}
+        tmp = f"{self.cache_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.cache_path)
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver():
+    """
+    Process-wide resolver shared by every GrowwTrader, so the master is loaded once.
+    """
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = ScripResolver(background=Config.STARTUP_BACKGROUND_INIT)
+        return _resolver
+
+
+def download_master(path=None):
+    import urllib.request
+
+    path = path or Config.INSTRUMENT_MASTER_FILE
+    tmp = f"{path}.tmp"
+    logger.info(f"Downloading instrument master to {path}...")
+    urllib.request.urlretrieve(INSTRUMENT_MASTER_URL, tmp)
+    os.replace(tmp, path)
+
+
+def main(argv):
+    """
+    python scrip_resolver.py download          -> refresh the local instrument master
+    python scrip_resolver.py warm [SYMBOL ...] -> resolve symbols (default: today's journal) and save the cache
+    """
+    if not argv or argv[0] not in ("download", "warm"):
+        print(main.__doc__)
+        return
+
+    if argv[0] == "download":
+        download_master()
+        return
+
+    from signal_journal import SignalJournal
+
+    symbols = argv[1:]
+    if not symbols:
+        journal = SignalJournal()
+        today = date.today().isoformat()
+        symbols = sorted({r.symbol for r in journal.cursor().read_new() if (r.timestamp or "").startswith(today)})
+
+    client = None
+    if not Config.DRY_RUN:
+        from growwapi import GrowwAPI
+        client = GrowwAPI(Config.GROWW_API_KEY, Config.GROWW_API_SECRET)
+        client.set_access_token(Config.GROWW_AUTH_TOKEN)
+
+    resolver = get_resolver()
+    resolver.prewarm(symbols, client)
+    resolver.save_cache()
+
+
+if __name__ == "__main__":
+    log_setup.setup()
+    main(sys.argv[1:])
@@ -0,0 +1,400 @@
+"""
+Sharded execution for long account lists: the accounts in accounts.json are
+split across SHARD_COUNT worker processes, each with its own event loop, GIL,
+broker clients and position WAL.
+
+    python shard_executor.py [--shards 4]
+
+The coordinator (this process) takes over from multi_account_manager.py: it
+reads the journal through the same durable queue and checkpoint, starts one
+worker per non-empty shard and sends every signal to all of them over a local
+Unix socket (SHARD_SOCKET), one JSON object per line. An account always lands
+on the same shard (crc32 of its name), so a restarted worker finds its
+positions in its own WAL (positions_shard<N>.wal). Closed positions go to its
+own history file (positions_closed_shard<N>.jsonl), which history_archive.py picks up.
+
+Per signal:
+
+    coordinator -> worker  {"op": "signal", ...}   worker opens its positions
+    worker -> coordinator  {"op": "opened", ...}   signal acked once every shard has it
+    worker -> coordinator  {"op": "done", ...}     its accounts' dispatch report
+
+Workers ping every SHARD_HEARTBEAT seconds. One that exits, or goes quiet for
+SHARD_HEARTBEAT_TIMEOUT, is killed and restarted with exponential backoff; the
+signals it had not confirmed are re-sent marked as retries, so GrowwTrader
+checks the order reference with the broker before placing again. Workers exit
+when the coordinator goes away.
+
+The coordinator records per-shard latency (stage, account="shard<N>") in its
+latency registry: shard_ipc (send to opened), shard_done (send to report),
+shard_exec (the shard's slowest account, rate-limit wait included) and fanout
+(send to the last shard's report). Trigger waits are part of shard_done and
+fanout. Workers keep their own stage histograms (latency_shard<N>.json with
+LATENCY_DUMP_DIR).
+
+GLOBAL_ORDER_RATE and the RISK_GLOBAL_* limits are split evenly across the
+shards. Switch between this and multi_account_manager.py with no open
+positions: each keeps its own WAL.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import zlib
+import startup
+import latency
+import log_setup
+from config import Config
+from multi_account_manager import POLL_INTERVAL, MultiAccountManager, read_accounts
+from signal_journal import SignalJournal
+from signal_notify import create_waiter
+from signal_queue import SignalQueue
+
+logger = logging.getLogger(__name__)
+
+# Limits that apply across all accounts; each shard gets 1/N of them
+SPLIT_LIMITS = ("GLOBAL_ORDER_RATE", "RISK_GLOBAL_MAX_NOTIONAL", "RISK_GLOBAL_MAX_DAILY_LOSS", "RISK_GLOBAL_MAX_ORDER_RATE")
+MIN_RESTART_DELAY = 0.5
+
+
+def shard_of(account_name, shards):
+    return zlib.crc32(account_name.encode()) % shards
+
+
+def _line(message):
+    return (json.dumps(message) + "\n").encode()
+
+
+class _Shard:
+    def __init__(self, index, accounts):
+        self.index = index
+        self.label = f"shard{index}"
+        self.accounts = accounts  # Account names
+        self.process = None
+        self.writer = None
+        self.last_seen = 0.0
+        self.restarts = 0
+        self.pending = {}  # signal_id -> message not yet confirmed as opened
+        self.connected = asyncio.Event()
+
+    def send(self, message):
+        if self.writer is not None and not self.writer.is_closing():
+            self.writer.write(_line(message))
+
+    def disconnected(self):
+        self.connected.clear()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class ShardCoordinator:
+    """
+    Owns signal intake and the worker processes. See the module docstring.
+    """
+    def __init__(self, shards=None, path=None):
+        self.count = shards or Config.SHARD_COUNT
+        self.path = path or Config.SHARD_SOCKET
+        groups = {}
+        for account in read_accounts() or []:
+            groups.setdefault(shard_of(account["name"], self.count), []).append(account["name"])
+        self.shards = {index: _Shard(index, names) for index, names in sorted(groups.items())}
+        startup.mark("accounts")
+        self.journal = SignalJournal()
+        # Same consumer as multi_account_manager, so switching modes keeps the checkpoint
+        self.queue = SignalQueue("multi_account_manager")
+        self.cursor = self.queue.open_cursor(self.journal)
+        startup.mark("journal")
+        self.in_flight = {}  # signal_id -> {"signal", "sent", "opening", "running", "reports"}
+        self.server = None
+        self.stopping = False
+
+    # --- Workers -------------------------------------------------------------
+
+    def worker_env(self, shard):
+        env = dict(os.environ)
+        root, ext = os.path.splitext(Config.POSITION_WAL_FILE)
+        # Closed positions too: appends from several processes would interleave in one file
+        history_root, history_ext = os.path.splitext(Config.POSITION_HISTORY_FILE)
+        env.update({
+            "POSITION_WAL_FILE": f"{root}_{shard.label}{ext}",
+            "POSITION_HISTORY_FILE": f"{history_root}_{shard.label}{history_ext}",
+            "SHARD_SOCKET": self.path,
+            "LATENCY_METRICS_PORT": "0",  # The coordinator owns the port
+            "STARTUP_EXIT_WHEN_READY": "false",
+        })
+        for name in SPLIT_LIMITS:
+            value = getattr(Config, name)
+            if value:
+                env[name] = str(value / len(self.shards))
+        return env
+
+    async def supervise(self, shard):
+        delay = MIN_RESTART_DELAY
+        while not self.stopping:
+            started = time.monotonic()
+            shard.last_seen = started
+            shard.process = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.abspath(__file__), "--worker", str(shard.index), "--shards", str(self.count),
+                env=self.worker_env(shard),
+            )
+            logger.info("Started %s (pid %d) for %d accounts", shard.label, shard.process.pid, len(shard.accounts))
+            code = await shard.process.wait()
+            shard.disconnected()
+            if self.stopping:
+                break
+            if time.monotonic() - started > Config.SHARD_RESTART_BACKOFF:
+                delay = MIN_RESTART_DELAY  # It had been running fine; restart promptly
+            shard.restarts += 1
+            logger.error("%s exited with code %s, restarting in %.1fs (%d unconfirmed signals)",
+                         shard.label, code, delay, len(shard.pending))
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, Config.SHARD_RESTART_BACKOFF)
+
+    async def watchdog(self):
+        while True:
+            await asyncio.sleep(Config.SHARD_HEARTBEAT)
+            now = time.monotonic()
+            for shard in self.shards.values():
+                process = shard.process
+                if process and process.returncode is None and now - shard.last_seen > Config.SHARD_HEARTBEAT_TIMEOUT:
+                    logger.error("%s silent for %.0fs, killing pid %d", shard.label, now - shard.last_seen, process.pid)
+                    process.kill()
+                    shard.last_seen = now
+
+    async def _on_worker(self, reader, writer):
+        hello = json.loads(await reader.readline() or "{}")
+        shard = self.shards.get(hello.get("shard"))
+        if shard is None or shard.process is None or hello.get("pid") != shard.process.pid:
+            # e.g. a worker left over from another coordinator on the same socket path
+            logger.error("Unexpected worker connection: %s", hello)
+            writer.close()
+            return
+        shard.writer = writer
+        shard.last_seen = time.monotonic()
+        logger.info("%s connected (pid %s, %d accounts)", shard.label, hello.get("pid"), len(hello.get("accounts", [])))
+        for message in shard.pending.values():
+            # May have reached the previous worker: let the broker's reference lookup decide
+            shard.send(dict(message, signal=dict(message["signal"], retry=True)))
+        shard.connected.set()
+        try:
+            while line := await reader.readline():
+                self.on_message(shard, json.loads(line))
+        except (ConnectionError, ValueError) as e:
+            logger.warning("%s connection lost: %s", shard.label, e)
+        finally:
+            if shard.writer is writer:
+                shard.disconnected()
+
+    async def wait_connected(self):
+        await asyncio.gather(*(shard.connected.wait() for shard in self.shards.values()))
+
+    # --- Signals -------------------------------------------------------------
+
+    def dispatch(self, item):
+        message = {
+            "op": "signal", "signal_id": item.signal_id, "signal": dict(item.signal, retry=item.is_retry),
+            "timestamp": item.timestamp, "sent": time.time(),
+        }
+        self.in_flight[item.signal_id] = {
+            "signal": item.signal, "sent": time.monotonic(), "reports": [],
+            "opening": set(self.shards), "running": set(self.shards),
+        }
+        for shard in self.shards.values():
+            shard.pending[item.signal_id] = message
+            shard.send(message)
+
+    def on_message(self, shard, message):
+        now = time.monotonic()
+        shard.last_seen = now
+        op = message.get("op")
+        if op == "ping":
+            return
+        signal_id = message.get("signal_id")
+        entry = self.in_flight.get(signal_id)
+        if op == "opened":
+            shard.pending.pop(signal_id, None)
+            if entry is None or shard.index not in entry["opening"]:
+                return
+            entry["opening"].discard(shard.index)
+            latency.registry.record("shard_ipc", (now - entry["sent"]) * 1e6, shard.label)
+            if not entry["opening"]:
+                # Every shard has the positions in its WAL now; they own the signal
+                self.queue.ack(signal_id)
+        elif op == "done":
+            if entry is None or shard.index not in entry["running"]:
+                # Resumed by a restarted worker after the coordinator forgot it
+                logger.debug("%s finished untracked signal %s", shard.label, signal_id)
+                return
+            report = message.get("report", [])
+            latency.registry.record("shard_done", (now - entry["sent"]) * 1e6, shard.label)
+            if report:
+                slowest = max(row["queued_ms"] + row["latency_ms"] for row in report)
+                latency.registry.record("shard_exec", slowest * 1000, shard.label)
+            entry["reports"].extend(report)
+            entry["running"].discard(shard.index)
+            if not entry["running"]:
+                latency.registry.record("fanout", (now - entry["sent"]) * 1e6)
+                del self.in_flight[signal_id]
+                self.signal_done(signal_id, entry)
+
+    def signal_done(self, signal_id, entry):
+        ok = sum(1 for row in entry["reports"] if row["success"])
+        logger.info("%s %s: %d/%d accounts placed across %d shards in %.1f ms", signal_id, entry["signal"]["symbol"],
+                    ok, len(entry["reports"]), len(self.shards), (time.monotonic() - entry["sent"]) * 1000)
+
+    def check_for_signals(self):
+        try:
+            records = self.cursor.read_new()
+            if records:
+                self.queue.ingest(records, self.cursor)
+            for item in self.queue.claim():
+                if item.signal_id in self.in_flight:
+                    continue
+                log_setup.set_correlation_id(item.signal_id)
+                logger.info("New Signal %s! Sending to %d shards", item.signal_id, len(self.shards))
+                self.dispatch(item)
+            self.queue.flush()
+        except Exception as e:
+            logger.error(f"Error reading signals: {e}")
+
+    async def start(self):
+        if not self.shards:
+            logger.error("No accounts to shard")
+            return
+        logger.info("Starting shard coordinator: %d accounts on %d shards",
+                    sum(len(s.accounts) for s in self.shards.values()), len(self.shards))
+        latency.setup("shard_coordinator")
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(self._on_worker, self.path)
+        tasks = [asyncio.create_task(self.supervise(shard)) for shard in self.shards.values()]
+        tasks.append(asyncio.create_task(self.watchdog()))
+
+        waiter = create_waiter(self.journal)
+        self.check_for_signals()
+        startup.ready("shard_coordinator", shards=len(self.shards))
+        try:
+            while True:
+                await waiter.wait(POLL_INTERVAL)
+                self.check_for_signals()
+        finally:
+            await self.stop(tasks)
+
+    async def stop(self, tasks=()):
+        self.stopping = True
+        for task in tasks:
+            task.cancel()
+        running = [s.process for s in self.shards.values() if s.process and s.process.returncode is None]
+        for process in running:
+            process.terminate()
+        self.queue.flush()
+        if self.server:
+            self.server.close()
+        try:
+            await asyncio.wait_for(asyncio.gather(*(process.wait() for process in running)), Config.SHARD_HEARTBEAT_TIMEOUT)
+        except asyncio.TimeoutError:
+            for process in running:
+                if process.returncode is None:
+                    process.kill()
+        for shard in self.shards.values():
+            shard.disconnected()
+        await asyncio.sleep(0)  # Let the connection handlers see EOF
+
+
+class ShardWorker:
+    """
+    One shard: a MultiAccountManager without journal intake, fed by the coordinator.
+    """
+    def __init__(self, shard, shards, path=None):
+        self.shard = shard
+        self.path = path or Config.SHARD_SOCKET
+        accounts = [a for a in read_accounts() or [] if shard_of(a["name"], shards) == shard]
+        self.manager = MultiAccountManager(accounts, intake=False)
+        self.names = [account["name"] for account in self.manager.traders]
+        self.seen = {}  # signal IDs handled by this process, oldest first
+        self.active = set()
+        self.writer = None
+
+    def send(self, message):
+        self.writer.write(_line(message))
+
+    def remember(self, signal_id):
+        self.seen[signal_id] = None
+        if len(self.seen) > Config.PROCESSED_IDS_LIMIT:
+            del self.seen[next(iter(self.seen))]
+
+    async def execute(self, signal, signal_id, positions):
+        self.active.add(signal_id)
+        report = []
+        try:
+            report = await self.manager.monitor_and_execute(signal, signal_id, positions)
+        except Exception as e:
+            logger.error("Signal %s failed on shard %d: %s", signal_id, self.shard, e)
+        finally:
+            self.active.discard(signal_id)
+            self.send({"op": "done", "signal_id": signal_id, "report": report})
+
+    def on_signal(self, message):
+        signal_id, signal = message["signal_id"], message["signal"]
+        log_setup.set_correlation_id(signal_id)
+        trace = latency.start_trace()
+        trace.since_wall("shard_hop", message["sent"])
+        tracker = self.manager.tracker
+        if signal_id in self.seen or any(f"{signal_id}:{name}" in tracker.by_id for name in self.names):
+            # A re-send of something this shard already has
+            self.send({"op": "opened", "signal_id": signal_id})
+            if signal_id not in self.active:
+                self.send({"op": "done", "signal_id": signal_id, "report": []})
+            return
+        self.remember(signal_id)
+        positions = [
+            tracker.open(signal_id, account["name"], signal, account["trader"].get_quantity(signal))
+            for account in self.manager.traders
+        ]
+        self.send({"op": "opened", "signal_id": signal_id})
+        asyncio.create_task(self.execute(signal, signal_id, positions))
+
+    async def heartbeat(self):
+        while True:
+            self.send({"op": "ping"})
+            await asyncio.sleep(Config.SHARD_HEARTBEAT)
+
+    async def run(self):
+        latency.setup(f"shard{self.shard}")
+        # Authenticate before taking signals, like a warm single-process manager
+        traders = [account["trader"] for account in self.manager.traders]
+        await asyncio.gather(*(asyncio.to_thread(lambda t=t: t.groww) for t in traders), return_exceptions=True)
+        reader, self.writer = await asyncio.open_unix_connection(self.path)
+        self.send({"op": "hello", "shard": self.shard, "pid": os.getpid(), "accounts": self.names})
+        for signal_id in self.manager.resume_positions(self.execute):
+            self.remember(signal_id)
+        heartbeat = asyncio.create_task(self.heartbeat())
+        startup.ready(f"shard{self.shard}", accounts=len(self.names))
+        while line := await reader.readline():
+            message = json.loads(line)
+            if message.get("op") == "signal":
+                self.on_signal(message)
+        heartbeat.cancel()
+        logger.warning("Coordinator went away, shard %d exiting", self.shard)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--shards", type=int, default=None, help="Worker processes (default SHARD_COUNT)")
+    ap.add_argument("--worker", type=int, default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.worker is None:
+        log_setup.setup("shard_coordinator")
+        asyncio.run(ShardCoordinator(args.shards).start())
+    else:
+        log_setup.setup(f"shard{args.worker}")
+        asyncio.run(ShardWorker(args.worker, args.shards or Config.SHARD_COUNT).run())
+
+
+if __name__ == "__main__":
+    startup.mark("imports")
+    main()
@@ -0,0 +1,142 @@
+"""
+Micro-batching between the trigger and the broker, for bursts of signals.
+
+Tip channels often post several legs within a second. Without batching every
+leg is dispatched on its own and, when its symbol is not in the instrument
+master, every account's order pays its own search_scrip. With
+SIGNAL_BATCH_WINDOW set, MultiAccountManager hands signals that are ready to
+execute to a SignalBatcher instead: the first one opens a window, everything
+submitted before it closes (or until SIGNAL_BATCH_MAX signals) is executed
+together:
+
+1. duplicates (same symbol, action, price, SL and target) are dropped
+2. every distinct symbol is resolved once, concurrently, before any order
+3. each account gets one basket with all of its orders, and all baskets go out
+   at once through OrderDispatcher.dispatch_basket
+
+Each signal still gets its own report. Latency stages: batch_wait (submit to
+flush, the price of batching), batch_resolve and basket. stats counts batches,
+duplicates and the live lookups that the shared resolve saved; saved_ms
+estimates what those lookups would have cost, priced at the batch's own
+resolve time.
+"""
+import asyncio
+import logging
+import time
+import latency
+import log_setup
+from config import Config
+from signal_router import SignalDeduper
+
+logger = logging.getLogger(__name__)
+
+
+class SignalBatcher:
+    def __init__(self, dispatcher, window=None, max_size=None):
+        self.dispatcher = dispatcher
+        self.window = Config.SIGNAL_BATCH_WINDOW if window is None else window
+        self.max_size = max_size or Config.SIGNAL_BATCH_MAX
+        self.pending = []  # (accounts, signal, future, submitted)
+        self.stats = {"batches": 0, "signals": 0, "duplicates": 0, "orders": 0, "lookups": 0, "lookups_saved": 0, "saved_ms": 0.0}
+        self._timer = None
+        self._batches = 0
+
+    async def submit(self, accounts, signal):
+        """
+        Queues `signal` for `accounts` (dicts with name and trader) and returns its
+        report once its batch has been placed, in the same shape as OrderDispatcher.dispatch.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((accounts, signal, future, time.monotonic()))
+        if len(self.pending) >= self.max_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            asyncio.create_task(self._run(batch))
+
+    async def _run(self, batch):
+        try:
+            await self._execute(batch)
+        except Exception as e:
+            logger.error("Batch of %d signals failed: %s", len(batch), e)
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def _execute(self, batch):
+        self._batches += 1
+        log_setup.set_correlation_id(f"batch-{self._batches}")
+        now = time.monotonic()
+        for _, _, _, submitted in batch:
+            latency.registry.record("batch_wait", (now - submitted) * 1e6)
+
+        # 1. Drop duplicates; they report against the signal they repeat
+        first = {}
+        unique, duplicates = [], []
+        for item in batch:
+            key = SignalDeduper.key(item[1])
+            if key in first:
+                duplicates.append((item, first[key]))
+            else:
+                first[key] = item[1]
+                unique.append(item)
+
+        # 2. Resolve every symbol once, before the orders that need it
+        baskets = {}
+        for accounts, signal, _, _ in unique:
+            for account in accounts:
+                baskets.setdefault(account["name"], (account, []))[1].append(signal)
+        orders_per_symbol = {}
+        for _, signals in baskets.values():
+            for signal in signals:
+                orders_per_symbol[signal["symbol"]] = orders_per_symbol.get(signal["symbol"], 0) + 1
+        lookups = 0
+        resolve_ms = 0.0
+        if baskets:
+            trader = next(iter(baskets.values()))[0]["trader"]
+            live_before = trader.resolver.hits["live"]
+            started = time.perf_counter()
+            scrips = await trader.resolve_many_async(list(orders_per_symbol))
+            resolve_ms = (time.perf_counter() - started) * 1000
+            latency.registry.record("batch_resolve", resolve_ms * 1000)
+            lookups = trader.resolver.hits["live"] - live_before
+            if lookups:
+                # Without the shared resolve, every order for a cold symbol would search for it
+                saved = sum(orders_per_symbol[s] for s, scrip in scrips.items() if scrip) - lookups
+                self.stats["lookups_saved"] += max(0, saved)
+                self.stats["saved_ms"] += max(0, saved) * resolve_ms
+
+        # 3. One basket per account, all at once
+        report = await self.dispatcher.dispatch_basket(list(baskets.values()))
+
+        by_signal = {}
+        for entry in report:
+            by_signal.setdefault(entry["signal_id"], []).append(entry)
+        for accounts, signal, future, _ in unique:
+            if not future.done():
+                future.set_result(by_signal.get(signal.get("signal_id"), []))
+        for (accounts, signal, future, _), original in duplicates:
+            logger.info("%s %s is a duplicate of %s in this batch, skipped",
+                        signal.get("signal_id"), signal["symbol"], original.get("signal_id"))
+            if not future.done():
+                future.set_result([
+                    {"account": a["name"], "success": False, "error": f"duplicate of {original.get('signal_id')}",
+                     "queued_ms": 0.0, "latency_ms": 0.0}
+                    for a in accounts
+                ])
+
+        self.stats["batches"] += 1
+        self.stats["signals"] += len(batch)
+        self.stats["duplicates"] += len(duplicates)
+        self.stats["orders"] += len(report)
+        self.stats["lookups"] += lookups
+        logger.info("Batch of %d signals (%d duplicates) -> %d orders on %d accounts; %d symbols resolved in %.1f ms with %d live lookups",
+                    len(batch), len(duplicates), len(report), len(baskets), len(orders_per_symbol), resolve_ms, lookups)
@@ -0,0 +1,286 @@
+import csv
+import glob
+import io
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CSV_FILE = "trade_signals.csv"
+COLUMNS = ["timestamp", "signal_id", "symbol", "action", "price", "stop_loss", "target", "status", "type"]
+
+
+def _clean(value):
+    # Keep every signal on exactly one physical line so tail readers can split on '\n'
+    if value is None:
+        return ""
+    return str(value).replace("\r", " ").replace("\n", " ")
+
+
+def _num(value):
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class SignalRecord:
+    """
+    Compact typed view of one journal line.
+    """
+    __slots__ = ("signal_id", "timestamp", "symbol", "action", "price", "sl", "target", "status", "type")
+
+    # Journal column -> record attribute
+    FIELDS = {
+        "signal_id": "signal_id",
+        "timestamp": "timestamp",
+        "symbol": "symbol",
+        "action": "action",
+        "price": "price",
+        "stop_loss": "sl",
+        "target": "target",
+        "status": "status",
+        "type": "type",
+    }
+    NUMERIC = ("price", "sl", "target")
+
+    def __init__(self, signal_id=None, timestamp=None, symbol=None, action=None,
+                 price=None, sl=None, target=None, status=None, type=None):
+        self.signal_id = signal_id
+        self.timestamp = timestamp
+        self.symbol = symbol
+        self.action = action
+        self.price = price
+        self.sl = sl
+        self.target = target
+        self.status = status or "NEW"
+        self.type = type or "EQUITY"
+
+    @property
+    def is_new(self):
+        # Backfilled history is stored for the record and must not be traded
+        return self.status == "NEW"
+
+    def to_signal(self):
+        """
+        Returns the signal dict used by GrowwTrader.
+        """
+        return {
+            "signal_id": self.signal_id,
+            "symbol": self.symbol,
+            "action": self.action,
+            "price": self.price,
+            "sl": self.sl,
+            "target": self.target,
+            "type": self.type
+        }
+
+    def __repr__(self):
+        return f"SignalRecord({self.signal_id}, {self.symbol} {self.action} @ {self.price})"
+
+
+class _RowDecoder:
+    """
+    Maps CSV value lists straight onto SignalRecord attributes using column
+    positions resolved once per header.
+    """
+    def __init__(self, columns):
+        self.positions = [(i, SignalRecord.FIELDS[col]) for i, col in enumerate(columns) if col in SignalRecord.FIELDS]
+
+    def __call__(self, values):
+        kwargs = {}
+        for i, attr in self.positions:
+            if i < len(values):
+                value = values[i]
+                kwargs[attr] = _num(value) if attr in SignalRecord.NUMERIC else value
+        return SignalRecord(**kwargs)
+
+
+class SignalJournal:
+    """
+    Append-only signal store.
+    Each signal is one CSV line written with a single O_APPEND write and fsync'd,
+    so concurrent writers never clobber each other and the file is never rewritten.
+    With rotate_daily, signals go to one segment per day (trade_signals-YYYYMMDD.csv).
+    """
+    def __init__(self, path=None, rotate_daily=None):
+        self.path = path or Config.SIGNAL_CSV_FILE
+        self.rotate_daily = Config.SIGNAL_JOURNAL_ROTATE if rotate_daily is None else rotate_daily
+        self._headers = {}
+        self._lock = threading.Lock()
+
+    def segment_path(self, day=None):
+        if not self.rotate_daily:
+            return self.path
+        base, ext = os.path.splitext(self.path)
+        day = day or datetime.now()
+        return f"{base}-{day:%Y%m%d}{ext or '.csv'}"
+
+    def segments(self):
+        """
+        Returns all existing segment paths in chronological order.
+        """
+        if not self.rotate_daily:
+            return [self.path] if os.path.exists(self.path) else []
+        base, ext = os.path.splitext(self.path)
+        return sorted(glob.glob(f"{glob.escape(base)}-[0-9]*{ext or '.csv'}"))
+
+    def _ensure_header(self, path):
+        if path in self._headers:
+            return self._headers[path]
+
+        if not os.path.exists(path):
+            # Publish the header atomically: write a temp file and hard-link it into place.
+            # If another writer wins the race, its header is used instead.
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, "w", newline="") as f:
+                f.write(",".join(COLUMNS) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.link(tmp, path)
+            except FileExistsError:
+                pass
+            finally:
+                os.unlink(tmp)
+
+        self._headers[path] = read_header(path) or COLUMNS
+        return self._headers[path]
+
+    def build_row(self, signal):
+        return {
+            "timestamp": signal.get('timestamp') or datetime.now().isoformat(),
+            "signal_id": str(uuid.uuid4()),
+            "symbol": signal['symbol'],
+            "action": signal['action'],
+            "price": signal['price'],
+            "stop_loss": signal['sl'],
+            "target": signal['target'],
+            "status": signal.get('status', 'NEW'),
+            "type": signal.get('type', 'EQUITY')
+        }
+
+    def append(self, signal):
+        """
+        Appends a single parsed signal. Returns the stored row.
+        """
+        return self.append_many([signal])[0]
+
+    def append_many(self, signals):
+        """
+        Appends several signals with one write and one fsync.
+        """
+        rows = [self.build_row(s) for s in signals]
+        if not rows:
+            return rows
+
+        with self._lock:
+            path = self.segment_path()
+            columns = self._ensure_header(path)
+
+            buf = io.StringIO()
+            writer = csv.writer(buf, lineterminator="\n")
+            for row in rows:
+                writer.writerow([_clean(row.get(col)) for col in columns])
+
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, buf.getvalue().encode("utf-8"))
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        return rows
+
+    def cursor(self, from_end=False):
+        return JournalCursor(self, from_end=from_end)
+
+    def cursor_at(self, segment, offset, rows=0):
+        return JournalCursor(self, segment=segment, offset=offset, rows=rows)
+
+
+def read_header(path):
+    try:
+        with open(path, "r", newline="") as f:
+            line = f.readline()
+    except FileNotFoundError:
+        return None
+    if not line.endswith("\n"):
+        return None
+    return next(csv.reader([line]))
+
+
+class JournalCursor:
+    """
+    Tails the journal: every read only parses the bytes appended since the last read.
+    Follows daily segments in order when rotation is enabled.
+    `segment`, `offset` and `rows` form the checkpoint a consumer can persist and resume from.
+    """
+    def __init__(self, journal, from_end=False, segment=None, offset=0, rows=0):
+        self.journal = journal
+        self.segment = segment
+        self.offset = offset
+        self.rows = rows
+        self._decoder = None
+
+        if segment is None:
+            segments = journal.segments()
+            if segments:
+                self.segment = segments[-1] if from_end else segments[0]
+                self.offset = os.path.getsize(self.segment) if from_end else 0
+
+    def _next_segment(self):
+        for path in self.journal.segments():
+            if self.segment is None or path > self.segment:
+                return path
+        return None
+
+    def _read_segment(self):
+        try:
+            with open(self.segment, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+
+        # Only consume complete lines; a half-written tail is picked up next time
+        end = data.rfind(b"\n")
+        if end < 0:
+            return []
+        chunk = data[:end + 1]
+        start_offset = self.offset
+        self.offset += len(chunk)
+
+        lines = chunk.decode("utf-8").splitlines()
+        if start_offset == 0 and lines:
+            self._decoder = _RowDecoder(next(csv.reader([lines[0]])))
+            lines = lines[1:]
+        elif self._decoder is None:
+            self._decoder = _RowDecoder(read_header(self.segment) or COLUMNS)
+
+        records = [self._decoder(values) for values in csv.reader(lines) if values]
+        self.rows += len(records)
+        return records
+
+    def read_new(self):
+        """
+        Returns the SignalRecords appended since the previous call.
+        """
+        rows = []
+        if self.segment is None:
+            self.segment = self._next_segment()
+            self.offset = 0
+            if self.segment is None:
+                return rows
+
+        while True:
+            rows.extend(self._read_segment())
+            next_segment = self._next_segment()
+            if next_segment is None:
+                return rows
+            # Drain anything written to the old segment before moving on
+            rows.extend(self._read_segment())
+            self.segment, self.offset, self._decoder = next_segment, 0, None
@@ -1,63 +1,70 @@
 import asyncio
 import logging
-import pandas as pd
-import uuid
-from datetime import datetime
+import startup
+import latency
+import log_setup
+from backfill import MessageCheckpoint, backfill_channels
 from config import Config
+from signal_journal import SignalJournal
+from signal_notify import SignalNotifier
 from telegram_bot import TelegramListener
-from signal_parser import SignalParser
+from signal_router import SignalRouter
 
-logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL))
 logger = logging.getLogger(__name__)
 
-CSV_FILE = "trade_signals.csv"
+journal = SignalJournal()
+notifier = SignalNotifier() if Config.SIGNAL_NOTIFY_MODE.lower() == "socket" else None
 
 def save_signal_to_csv(signal):
     try:
-        # Load existing or create new
-        try:
-            df = pd.read_csv(CSV_FILE)
-        except FileNotFoundError:
-            df = pd.DataFrame(columns=["timestamp", "signal_id", "symbol", "action", "price", "stop_loss", "target", "status", "type"])
-
-        # Create new row
-        new_row = {
-            "timestamp": datetime.now().isoformat(),
-            "signal_id": str(uuid.uuid4()),
-            "symbol": signal['symbol'],
-            "action": signal['action'],
-            "price": signal['price'],
-            "stop_loss": signal['sl'],
-            "target": signal['target'],
-            "status": "NEW",
-            "type": signal.get('type', 'EQUITY')
-        }
-
-        # Append and save
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        df.to_csv(CSV_FILE, index=False)
-        logger.info(f"Signal saved to CSV: {signal['symbol']} {signal['action']}")
+        row = journal.append(signal)
+        if notifier:
+            notifier.notify(row["signal_id"])
+        logger.info("Signal saved to CSV: %s %s as %s", signal['symbol'], signal['action'], row["signal_id"])
         return True
 
     except Exception as e:
         logger.error(f"Failed to save to CSV: {e}")
         return False
 
-async def main():
-    Config.validate()
-    parser = SignalParser()
-    
-    async def process_message(text):
-        signal = parser.parse(text)
+def create_handler(router):
+    """
+    Returns the TelegramListener callback: routes a message and journals any signal.
+    """
+    async def process_message(text, channel_id):
+        trace = latency.current()
+        signal = router.route(text, channel_id)
+        trace.mark("parse")
         if signal:
-            logger.info(f"Signal detected: {signal}")
+            logger.info("Signal detected: %s", signal)
             save_signal_to_csv(signal)
+            trace.mark("journal_write")
+            trace.finish()
         else:
-            logger.debug(f"No signal found in: {text}")
+            logger.debug("No signal found in: %s", text)
+
+    return process_message
+
+async def main():
+    startup.mark("imports")
+    Config.validate()
+    latency.setup("signal_loader")
+    router = SignalRouter()
+    startup.mark("parser")
+    process_message = create_handler(router)
 
     logger.info("Starting Signal Loader (Telegram -> CSV)...")
-    listener = TelegramListener(process_message)
+    if notifier:
+        await notifier.start()
+    startup.mark("notifier")
+    checkpoint = MessageCheckpoint()
+    catch_up = None
+    if Config.BACKFILL_ON_START:
+        # Messages missed while down are journalled (as BACKFILL) before live ones advance the checkpoint
+        catch_up = lambda client: backfill_channels(client, router, router.channel_ids, checkpoint, journal=journal)
+    listener = TelegramListener(process_message, checkpoint=checkpoint, channel_ids=router.channel_ids, catch_up=catch_up)
     await listener.start()
 
 if __name__ == "__main__":
+    log_setup.setup("signal_loader")
     asyncio.run(main())
@@ -0,0 +1,206 @@
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import sys
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Waiter:
+    """
+    Base for the wake-up strategies. Traders call `await waiter.wait(timeout)`
+    between checks; it returns early as soon as something new may be available.
+    """
+    def __init__(self):
+        self._event = asyncio.Event()
+
+    async def wait(self, timeout):
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._event.clear()
+
+    def close(self):
+        pass
+
+
+class PollWaiter(_Waiter):
+    """
+    Plain sleep, the original 5-second polling behaviour.
+    """
+    async def wait(self, timeout):
+        await asyncio.sleep(timeout)
+
+
+class FileWatcher(_Waiter):
+    """
+    Wakes up when the journal (or a new daily segment) is written.
+    Uses inotify on Linux and falls back to polling os.stat elsewhere.
+    """
+    def __init__(self, journal, poll_interval=None):
+        super().__init__()
+        self.journal = journal
+        self.poll_interval = poll_interval or Config.SIGNAL_WATCH_POLL_INTERVAL
+        self.directory = os.path.dirname(os.path.abspath(journal.path))
+        self.prefix = os.path.splitext(os.path.basename(journal.path))[0]
+        self._fd = None
+        self._poll_task = None
+
+        if not self._start_inotify():
+            logger.info(f"inotify unavailable, polling journal every {self.poll_interval}s")
+            self._poll_task = asyncio.get_running_loop().create_task(self._poll())
+
+    def _start_inotify(self):
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                return False
+            mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+            if libc.inotify_add_watch(fd, self.directory.encode(), mask) < 0:
+                os.close(fd)
+                return False
+        except (OSError, AttributeError) as e:
+            logger.debug(f"inotify setup failed: {e}")
+            return False
+
+        self._fd = fd
+        asyncio.get_running_loop().add_reader(fd, self._on_inotify)
+        logger.info(f"Watching {self.directory} for journal changes (inotify)")
+        return True
+
+    def _on_inotify(self):
+        while True:
+            try:
+                data = os.read(self._fd, 4096)
+            except BlockingIOError:
+                return
+            if not data:
+                return
+
+            pos = 0
+            while pos < len(data):
+                _, _, _, length = EVENT_HEADER.unpack_from(data, pos)
+                name = data[pos + EVENT_HEADER.size:pos + EVENT_HEADER.size + length].rstrip(b"\0")
+                pos += EVENT_HEADER.size + length
+                # The directory may hold other files (state DBs, logs); only journal writes matter
+                if name.decode(errors="ignore").startswith(self.prefix):
+                    self._event.set()
+
+    def _snapshot(self):
+        state = []
+        for path in self.journal.segments():
+            try:
+                st = os.stat(path)
+                state.append((path, st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                pass
+        return state
+
+    async def _poll(self):
+        last = self._snapshot()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = self._snapshot()
+            if current != last:
+                last = current
+                self._event.set()
+
+    def close(self):
+        if self._fd is not None:
+            asyncio.get_running_loop().remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+        if self._poll_task:
+            self._poll_task.cancel()
+
+
+class SocketWaiter(_Waiter):
+    """
+    Subscribes to the loader's local Unix socket; every saved signal wakes the trader.
+    Reconnects in the background, and the journal stays the source of truth,
+    so a missed notification only costs one poll interval.
+    """
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path or Config.SIGNAL_SOCKET
+        self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+                logger.info(f"Subscribed to signal socket {self.path}")
+                # Catch up on anything written while we were disconnected
+                self._event.set()
+                while await reader.readline():
+                    self._event.set()
+                writer.close()
+            except (ConnectionError, FileNotFoundError, OSError) as e:
+                logger.debug(f"Signal socket unavailable: {e}")
+            await asyncio.sleep(1)
+
+    def close(self):
+        self._task.cancel()
+
+
+class SignalNotifier:
+    """
+    Publisher side of the socket transport, run by signal_loader.
+    Broadcasts one line per saved signal to every connected trader.
+    """
+    def __init__(self, path=None):
+        self.path = path or Config.SIGNAL_SOCKET
+        self.clients = set()
+        self.server = None
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(self._on_client, self.path)
+        logger.info(f"Publishing signals on {self.path}")
+
+    async def _on_client(self, reader, writer):
+        self.clients.add(writer)
+        try:
+            await reader.read()  # Block until the subscriber disconnects
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    def notify(self, signal_id):
+        line = f"{signal_id}\n".encode()
+        for writer in list(self.clients):
+            if writer.is_closing():
+                self.clients.discard(writer)
+                continue
+            writer.write(line)
+
+
+def create_waiter(journal, mode=None):
+    """
+    Builds the wake-up strategy selected by SIGNAL_NOTIFY_MODE (poll, inotify or socket).
+    Must be called from inside the running event loop.
+    """
+    mode = (mode or Config.SIGNAL_NOTIFY_MODE).lower()
+    if mode == "socket":
+        return SocketWaiter()
+    if mode == "inotify":
+        return FileWatcher(journal)
+    return PollWaiter()
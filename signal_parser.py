@@ -1,50 +1,132 @@
 import re
 import logging
 
+logger = logging.getLogger(__name__)
+
+# Registry of known message formats, tried in priority order (lowest first)
+FORMATS = {}
+
+
+class SignalFormat:
+    """
+    A message format: the keywords it needs (pre-filter) and the function that parses it.
+    `required` is a list of keyword groups; every group needs at least one of its
+    keywords somewhere in the upper-cased text before the parse function is tried.
+    """
+    def __init__(self, name, required, parse, priority=100):
+        self.name = name
+        self.required = [tuple(k.upper() for k in group) for group in required]
+        self.parse = parse
+        self.priority = priority
+
+    def may_match(self, upper_text):
+        return all(any(k in upper_text for k in group) for group in self.required)
+
+
+def register_format(name, required, priority=100):
+    """
+    Decorator that adds a parse function to the format registry.
+    """
+    def decorator(func):
+        FORMATS[name] = SignalFormat(name, required, func, priority)
+        return func
+    return decorator
+
+
+# Format 1:
+# NIFTY 26100 PE
+# Above : 185
+# SL : 175
+# TGT : 195...
+# Parsed line by line with anchored patterns, so long chatty messages can't trigger
+# the catastrophic backtracking a single `.*?` DOTALL pattern allows.
+OPTION_SYMBOL = re.compile(r"^[ \t]*([A-Z0-9][A-Z0-9 \t]*(?:CE|PE))[ \t]*\r?\n", re.IGNORECASE | re.MULTILINE)
+OPTION_ABOVE = re.compile(r"Above[ \t]*:[ \t]*([\d.]+)\s*\n", re.IGNORECASE)
+OPTION_SL = re.compile(r"SL[ \t]*:[ \t]*([\d.]+)\s*\n", re.IGNORECASE)
+OPTION_TGT = re.compile(r"TGT[ \t]*:[ \t]*([\d.]+)", re.IGNORECASE)
+
+
+@register_format("option", required=[("ABOVE",), ("SL",), ("TGT",)], priority=10)
+def parse_option(text):
+    symbol = OPTION_SYMBOL.search(text)
+    if not symbol:
+        return None
+    above = OPTION_ABOVE.search(text, symbol.end())
+    if not above:
+        return None
+    sl = OPTION_SL.search(text, above.end())
+    if not sl:
+        return None
+    tgt = OPTION_TGT.search(text, sl.end())
+    if not tgt:
+        return None
+    return {
+        "action": "BUY",  # "Above" implies a Buy Stop/Limit
+        "symbol": " ".join(symbol.group(1).split()),
+        "price": float(above.group(1)),
+        "sl": float(sl.group(1)),
+        "target": float(tgt.group(1)),
+        "type": "OPTION"
+    }
+
+
+# Format 2: BUY RELIANCE AT 2500...
+SIMPLE_PATTERN = re.compile(
+    r"\b(BUY|SELL)\b\s+([A-Z0-9]+)\s+(?:AT\s+)?([\d.]+)\s+(?:SL\s+)?([\d.]+)\s+(?:TGT|TARGET)\s+([\d.]+)",
+    re.IGNORECASE
+)
+
+
+@register_format("simple", required=[("BUY", "SELL"), ("TGT", "TARGET")], priority=20)
+def parse_simple(text):
+    match = SIMPLE_PATTERN.search(text)
+    if not match:
+        return None
+    return {
+        "action": match.group(1).upper(),
+        "symbol": match.group(2),
+        "price": float(match.group(3)),
+        "sl": float(match.group(4)),
+        "target": float(match.group(5)),
+        "type": "EQUITY"
+    }
+
+
 class SignalParser:
-    def __init__(self):
-        # Format 1: BUY RELIANCE AT 2500...
-        self.simple_pattern = re.compile(r"(?i)\b(BUY|SELL)\b\s+([A-Z0-9]+)\s+(?:AT\s+)?([\d\.]+)\s+(?:SL\s+)?([\d\.]+)\s+(?:TGT|TARGET)\s+([\d\.]+)")
-        
-        # Format 2: 
-        # NIFTY 26100 PE
-        # Above : 185
-        # SL : 175
-        # TGT : 195...
-        self.option_pattern = re.compile(
-            r"(?i)^([A-Z\s\d]+(?:CE|PE))\s*\n"   # Line 1: NIFTY 26100 PE (Symbol)
-            r".*?Above\s*:\s*([\d\.]+)\s*\n"      # Line 2: Above : 185 (Price)
-            r".*?SL\s*:\s*([\d\.]+)\s*\n"         # Line 3: SL : 175 (Stop Loss)
-            r".*?TGT\s*:\s*([\d\.]+)",            # Line 4: TGT : 195 (First Target)
-            re.MULTILINE | re.DOTALL
-        )
+    def __init__(self, formats=None):
+        """
+        `formats` is a list of registered format names (a channel's profile);
+        defaults to every registered format.
+        """
+        names = formats or list(FORMATS)
+        self.formats = sorted((FORMATS[name] for name in names), key=lambda f: f.priority)
 
     def parse(self, text):
         """
         Parses the text and returns a signal dictionary if a match is found.
         """
-        # Try Option Pattern
-        match_opt = self.option_pattern.search(text)
-        if match_opt:
-            return {
-                "action": "BUY",  # "Above" implies a Buy Stop/Limit
-                "symbol": match_opt.group(1).strip(),
-                "price": float(match_opt.group(2)),
-                "sl": float(match_opt.group(3)),
-                "target": float(match_opt.group(4)),
-                "type": "OPTION"
-            }
-
-        # Try Simple Pattern
-        match_simple = self.simple_pattern.search(text)
-        if match_simple:
-             return {
-                "action": match_simple.group(1).upper(),
-                "symbol": match_simple.group(2),
-                "price": float(match_simple.group(3)),
-                "sl": float(match_simple.group(4)),
-                "target": float(match_simple.group(5)),
-                "type": "EQUITY"
-            }
-        
+        if not text:
+            return None
+
+        # Cheap keyword scan first: ordinary chatter never reaches a regex
+        upper = text.upper()
+        for fmt in self.formats:
+            if not fmt.may_match(upper):
+                continue
+            try:
+                signal = fmt.parse(text)
+            except ValueError:
+                # Malformed number such as "1.2.3"
+                logger.debug(f"Format {fmt.name} matched but values were malformed")
+                continue
+            if signal:
+                return signal
+
         return None
+
+    def parse_many(self, texts):
+        """
+        Parses a batch of messages. Returns one result (signal dict or None) per message.
+        """
+        parse = self.parse
+        return [parse(text) for text in texts]
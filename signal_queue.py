@@ -0,0 +1,221 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+READY = "READY"        # Waiting to be claimed
+CLAIMED = "CLAIMED"    # Handed to the consumer, outcome not yet recorded
+DONE = "DONE"          # Order placed (acked)
+FAILED = "FAILED"      # Gave up after QUEUE_MAX_ATTEMPTS
+REJECTED = "REJECTED"  # Blocked by the risk engine, never retried
+FINISHED = (DONE, FAILED, REJECTED)
+PRUNE_EVERY_COMMITS = 500
+
+
+class QueueItem:
+    __slots__ = ("signal_id", "signal", "timestamp", "attempts")
+
+    def __init__(self, signal_id, signal, timestamp, attempts):
+        self.signal_id = signal_id
+        self.signal = signal
+        self.timestamp = timestamp
+        self.attempts = attempts
+
+    @property
+    def is_retry(self):
+        # Claimed before: a previous attempt may already have reached the broker
+        return self.attempts > 1
+
+
+class SignalQueue:
+    """
+    Durable per-consumer work queue, with the consumer's journal checkpoint, in its
+    own SQLite file (SIGNAL_QUEUE_DB). One writer per file means a batch can keep
+    its transaction open without blocking the other consumer processes.
+
+    New journal records are enqueued in the same transaction that advances the
+    checkpoint, so a signal is never both skipped and checkpointed. Consumers
+    claim items, place the order and ack / nack / reject them. Claims are committed
+    immediately, so an item claimed before a crash is always seen as a retry. Outcomes are
+    committed in batches (every QUEUE_COMMIT_BATCH writes or QUEUE_COMMIT_INTERVAL
+    seconds, and on flush()); a crash can lose the latest outcomes, in which case the
+    items are claimed again on restart and re-sent with the same broker idempotency
+    key (see groww_trader.order_reference_id), so the broker places them once.
+    """
+    def __init__(self, consumer, path=None, max_attempts=None, max_ids=None):
+        self.consumer = consumer
+        self.path = path or Config.SIGNAL_QUEUE_DB.format(consumer=consumer)
+        self.max_ids = max_ids or Config.PROCESSED_IDS_LIMIT
+        self.max_attempts = max_attempts or Config.QUEUE_MAX_ATTEMPTS
+        self.commit_batch = Config.QUEUE_COMMIT_BATCH
+        self.commit_interval = Config.QUEUE_COMMIT_INTERVAL
+        self._uncommitted = 0
+        self._committed_at = time.monotonic()
+        self._commits = 0
+
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # FULL: commits survive power loss, not just a process crash; batching keeps this cheap
+        self.db.execute(f"PRAGMA synchronous={'FULL' if Config.QUEUE_FSYNC else 'NORMAL'}")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoint ("
+            "consumer TEXT PRIMARY KEY, segment TEXT, byte_offset INTEGER, rows INTEGER)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS queue ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, consumer TEXT NOT NULL, signal_id TEXT NOT NULL, "
+            "payload TEXT NOT NULL, state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "error TEXT, updated REAL, UNIQUE(consumer, signal_id))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS queue_state ON queue (consumer, state, seq)")
+        self.db.commit()
+        self.recover()
+
+    def load_checkpoint(self):
+        """
+        Returns (segment, offset, rows) or None if this consumer has never run.
+        """
+        cur = self.db.execute(
+            "SELECT segment, byte_offset, rows FROM checkpoint WHERE consumer = ?", (self.consumer,)
+        )
+        return cur.fetchone()
+
+    def open_cursor(self, journal):
+        """
+        Resumes the journal cursor from the saved checkpoint.
+        On first run, existing signals are skipped and only new appends are read.
+        """
+        checkpoint = self.load_checkpoint()
+        if checkpoint and checkpoint[0] and os.path.exists(checkpoint[0]):
+            segment, offset, rows = checkpoint
+            if os.path.getsize(segment) >= offset:
+                logger.info(f"[{self.consumer}] Resuming {segment} at offset {offset} ({rows} rows read)")
+                return journal.cursor_at(segment, offset, rows)
+            logger.warning(f"[{self.consumer}] {segment} shrank below checkpoint, re-reading from start")
+            return journal.cursor_at(segment, 0, 0)
+
+        cursor = journal.cursor(from_end=True)
+        logger.info(f"[{self.consumer}] No checkpoint, tailing new signals from offset {cursor.offset}")
+        return cursor
+
+    def recover(self):
+        """
+        Returns items left CLAIMED by a previous run to READY.
+        """
+        cur = self.db.execute(
+            "UPDATE queue SET state = ?, updated = ? WHERE consumer = ? AND state = ?",
+            (READY, time.time(), self.consumer, CLAIMED)
+        )
+        self.db.commit()
+        if cur.rowcount:
+            logger.warning(f"[{self.consumer}] {cur.rowcount} signals were in flight at shutdown, re-queued")
+
+    def ingest(self, records, cursor):
+        """
+        Enqueues the tradable records and saves the cursor checkpoint in one transaction.
+        Returns the number of newly queued signals (already queued IDs are ignored).
+        """
+        now = time.time()
+        rows = [
+            (self.consumer, r.signal_id, json.dumps({"signal": r.to_signal(), "timestamp": r.timestamp}), READY, now)
+            for r in records if r.is_new and r.signal_id
+        ]
+        before = self.db.total_changes
+        self.db.executemany(
+            "INSERT OR IGNORE INTO queue (consumer, signal_id, payload, state, updated) VALUES (?, ?, ?, ?, ?)", rows
+        )
+        queued = self.db.total_changes - before
+        self.db.execute(
+            "INSERT OR REPLACE INTO checkpoint (consumer, segment, byte_offset, rows) VALUES (?, ?, ?, ?)",
+            (self.consumer, cursor.segment, cursor.offset, cursor.rows)
+        )
+        self._commit()
+        return queued
+
+    def claim(self, limit=100):
+        """
+        Claims up to `limit` READY items, oldest first.
+        """
+        rows = self.db.execute(
+            "SELECT seq, signal_id, payload, attempts FROM queue WHERE consumer = ? AND state = ? ORDER BY seq LIMIT ?",
+            (self.consumer, READY, limit)
+        ).fetchall()
+        if not rows:
+            return []
+        self.db.executemany(
+            "UPDATE queue SET state = ?, attempts = attempts + 1, updated = ? WHERE seq = ?",
+            [(CLAIMED, time.time(), seq) for seq, _, _, _ in rows]
+        )
+        # Committed before any order goes out: after a crash the item must come back
+        # as a retry, so the broker is asked about its order reference before re-sending
+        self._commit()
+
+        items = []
+        for _, signal_id, payload, attempts in rows:
+            data = json.loads(payload)
+            items.append(QueueItem(signal_id, data["signal"], data.get("timestamp"), attempts + 1))
+        return items
+
+    def _finish(self, signal_id, state, error=None):
+        self.db.execute(
+            "UPDATE queue SET state = ?, error = ?, updated = ? WHERE consumer = ? AND signal_id = ?",
+            (state, error, time.time(), self.consumer, signal_id)
+        )
+        self._written()
+
+    def ack(self, signal_id):
+        self._finish(signal_id, DONE)
+
+    def reject(self, signal_id, reason):
+        self._finish(signal_id, REJECTED, reason)
+
+    def nack(self, signal_id, error=None):
+        """
+        Returns a failed item to the queue, or marks it FAILED after max_attempts.
+        """
+        attempts = self.db.execute(
+            "SELECT attempts FROM queue WHERE consumer = ? AND signal_id = ?", (self.consumer, signal_id)
+        ).fetchone()
+        if attempts and attempts[0] >= self.max_attempts:
+            logger.error(f"[{self.consumer}] Giving up on {signal_id} after {attempts[0]} attempts")
+            self._finish(signal_id, FAILED, error)
+        else:
+            self._finish(signal_id, READY, error)
+
+    def _written(self, n=1):
+        self._uncommitted += n
+        if self._uncommitted >= self.commit_batch or time.monotonic() - self._committed_at >= self.commit_interval:
+            self._commit()
+
+    def _commit(self):
+        self.db.commit()
+        self._uncommitted = 0
+        self._committed_at = time.monotonic()
+        self._commits += 1
+        if self._commits >= PRUNE_EVERY_COMMITS:
+            self.prune()
+
+    def flush(self):
+        if self._uncommitted:
+            self._commit()
+
+    def prune(self):
+        """
+        Keeps only the newest `max_ids` finished items for this consumer.
+        """
+        self._commits = 0
+        self.db.execute(
+            f"DELETE FROM queue WHERE consumer = ? AND state IN ({','.join('?' * len(FINISHED))}) AND seq <= ("
+            "SELECT seq FROM queue WHERE consumer = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+            (self.consumer, *FINISHED, self.consumer, self.max_ids)
+        )
+        self.db.commit()
+
+    def stats(self):
+        cur = self.db.execute("SELECT state, COUNT(*) FROM queue WHERE consumer = ? GROUP BY state", (self.consumer,))
+        return dict(cur.fetchall())
+
@@ -0,0 +1,107 @@
+"""
+Routes messages from several channels to per-channel parsers and drops duplicates.
+
+Channels come from CHANNELS_FILE (JSON) when it exists:
+
+    [
+        {"id": -1001234567890, "name": "Options Desk", "formats": ["option"]},
+        {"id": -1009876543210, "name": "Equity Calls", "formats": ["simple"]}
+    ]
+
+otherwise from TELEGRAM_CHANNEL_ID, which may list several comma-separated IDs
+that all use every registered format. `formats` names entries of the
+signal_parser format registry; leave it out to use them all.
+"""
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from config import Config
+from signal_parser import SignalParser
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelProfile:
+    __slots__ = ("channel_id", "name", "formats")
+
+    def __init__(self, channel_id, name=None, formats=None):
+        self.channel_id = int(channel_id)
+        self.name = name or str(channel_id)
+        self.formats = formats or None
+
+
+def load_channels(path=None):
+    path = path or Config.CHANNELS_FILE
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return [ChannelProfile(c["id"], c.get("name"), c.get("formats")) for c in json.load(f)]
+    ids = [part.strip() for part in (Config.TELEGRAM_CHANNEL_ID or "").split(",") if part.strip()]
+    return [ChannelProfile(channel_id) for channel_id in ids]
+
+
+class SignalDeduper:
+    """
+    Remembers signals seen in the last `window` seconds, keyed by what would be
+    traded (symbol, action, price, SL, target), whichever channel posted them.
+    """
+    def __init__(self, window=None):
+        self.window = Config.SIGNAL_DEDUP_WINDOW if window is None else window
+        self.seen = OrderedDict()  # key -> first seen (monotonic), oldest first
+
+    @staticmethod
+    def key(signal):
+        return (signal["symbol"].upper(), signal["action"], signal.get("price"), signal.get("sl"), signal.get("target"))
+
+    def is_duplicate(self, signal):
+        if not self.window:
+            return False
+        now = time.monotonic()
+        while self.seen:
+            oldest, seen_at = next(iter(self.seen.items()))
+            if now - seen_at < self.window:
+                break
+            self.seen.popitem(last=False)
+
+        key = self.key(signal)
+        if key in self.seen:
+            return True
+        self.seen[key] = now
+        return False
+
+
+class SignalRouter:
+    def __init__(self, channels=None, deduper=None):
+        self.channels = {c.channel_id: c for c in (channels if channels is not None else load_channels())}
+        self.default_parser = SignalParser()
+        # Channels sharing a profile share one parser
+        parsers = {}
+        self.parsers = {}
+        for channel in self.channels.values():
+            profile = tuple(channel.formats) if channel.formats else None
+            if profile not in parsers:
+                parsers[profile] = SignalParser(list(profile)) if profile else self.default_parser
+            self.parsers[channel.channel_id] = parsers[profile]
+        self.deduper = deduper or SignalDeduper()
+
+    @property
+    def channel_ids(self):
+        return list(self.channels)
+
+    def parser_for(self, channel_id):
+        return self.parsers.get(int(channel_id), self.default_parser)
+
+    def route(self, text, channel_id):
+        """
+        Parses a message with its channel's parser. Returns the signal, or None if
+        there is no signal or the same signal was already seen within the window.
+        """
+        signal = self.parser_for(channel_id).parse(text)
+        if signal is None:
+            return None
+        if self.deduper.is_duplicate(signal):
+            name = self.channels[channel_id].name if channel_id in self.channels else channel_id
+            logger.info(f"Duplicate signal from {name} ignored: {signal['symbol']} {signal['action']}")
+            return None
+        return signal
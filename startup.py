@@ -0,0 +1,53 @@
+"""
+Startup timing for the entry points.
+
+Import this first in an entry point, call mark(phase) as initialisation
+progresses and ready(process) once the process can act on a signal. ready()
+logs the breakdown; with STARTUP_EXIT_WHEN_READY set it also prints the report
+as JSON and exits, which is how bench_startup.py measures cold starts.
+"""
+import json
+import logging
+import os
+import sys
+import time
+
+STARTED = time.perf_counter()
+
+from config import Config  # noqa: E402  (after STARTED so config/.env loading is counted)
+import log_setup  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+phases = []  # (phase, milliseconds), in order
+_last = STARTED
+
+
+def elapsed_ms():
+    return (time.perf_counter() - STARTED) * 1000
+
+
+def mark(phase):
+    """
+    Records the time since the previous mark (or since this module was imported).
+    """
+    global _last
+    now = time.perf_counter()
+    phases.append((phase, (now - _last) * 1000))
+    _last = now
+
+
+def ready(process=None, **extra):
+    process = process or os.path.splitext(os.path.basename(sys.argv[0]))[0] or "python"
+    mark("ready")
+    total = elapsed_ms()
+    breakdown = ", ".join(f"{name} {ms:.1f} ms" for name, ms in phases)
+    logger.info(f"{process} ready to trade in {total:.1f} ms ({breakdown})")
+
+    if Config.STARTUP_EXIT_WHEN_READY:
+        report = {"process": process, "total_ms": total, "phases": dict(phases), **extra}
+        print(json.dumps(report), flush=True)
+        # os._exit skips atexit: drain the log queue first
+        log_setup.stop()
+        sys.stderr.flush()
+        os._exit(0)
@@ -1,38 +1,148 @@
 from telethon import TelegramClient, events
+from telethon.tl.types import InputPeerChannel
+import json
 import logging
+import os
+import latency
+import log_setup
+import startup
 from config import Config
+from signal_router import load_channels
 
-logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL))
 logger = logging.getLogger(__name__)
 
+
+class EntityCache:
+    """
+    Channel ID -> (access hash, title) on disk, so startup can build input peers
+    directly instead of fetching every dialog to find the channels.
+    """
+    def __init__(self, path=None):
+        self.path = path or Config.TELEGRAM_ENTITY_CACHE
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable entity cache {self.path}: {e}")
+
+    def get(self, channel_id):
+        return self.entries.get(str(channel_id))
+
+    def put(self, channel_id, entity):
+        self.entries[str(channel_id)] = {
+            "id": entity.id,
+            "access_hash": getattr(entity, "access_hash", None),
+            "title": getattr(entity, "title", str(channel_id)),
+        }
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+
 class TelegramListener:
-    def __init__(self, callback):
-        self.client = TelegramClient(Config.TELEGRAM_SESSION_NAME, Config.TELEGRAM_API_ID, Config.TELEGRAM_API_HASH)
+    def __init__(self, callback, checkpoint=None, channel_ids=None, catch_up=None):
+        """
+        `callback(text, channel_id)` is awaited for every new message in any of
+        `channel_ids` (default: the channels from CHANNELS_FILE or TELEGRAM_CHANNEL_ID).
+        `catch_up(client)`, if given, is awaited once connected and before new messages
+        are taken, e.g. to backfill what was missed while down.
+        """
+        self._client = None
         self.callback = callback
+        if channel_ids is None:
+            channel_ids = [c.channel_id for c in load_channels()]
+        self.channel_ids = [int(c) for c in channel_ids]
+        self.entities = EntityCache()
+        # Optional backfill.MessageCheckpoint; records the last seen message so
+        # a backfill run after a restart knows where to resume
+        self.checkpoint = checkpoint
+        self.catch_up = catch_up
+
+    @property
+    def client(self):
+        # Created on first use, so on_message can be driven without a Telegram session (bench_pipeline.py)
+        if self._client is None:
+            self._client = TelegramClient(Config.TELEGRAM_SESSION_NAME, Config.TELEGRAM_API_ID, Config.TELEGRAM_API_HASH)
+        return self._client
+
+    async def on_message(self, event):
+        latency.start_trace()
+        # Everything logged for this message, including its order tasks, carries chat:message
+        log_setup.set_correlation_id(f"{event.chat_id}:{event.id}")
+        logger.info("New message received in %s: %s", event.chat_id, event.raw_text)
+        await self.callback(event.raw_text, event.chat_id)
+        if self.checkpoint:
+            self.checkpoint.update(event.chat_id, event.id)
+
+    async def resolve_channels(self):
+        """
+        Returns input peers for the configured channels. Cached entities are used
+        as-is; the rest are looked up, with one dialog fetch as a last resort
+        (needed on a clean session that has never seen the channel).
+        """
+        peers = []
+        missing = []
+        for channel_id in self.channel_ids:
+            cached = self.entities.get(channel_id)
+            if cached and cached.get("access_hash") is not None:
+                peers.append(InputPeerChannel(cached["id"], cached["access_hash"]))
+                logger.info(f"Channel from cache: {cached['title']} ({channel_id})")
+            else:
+                missing.append(channel_id)
+
+        fetched_dialogs = False
+        for channel_id in missing:
+            try:
+                entity = await self.client.get_entity(channel_id)
+            except ValueError:
+                if fetched_dialogs:
+                    entity = None
+                else:
+                    logger.info("Channel not in session, fetching dialogs once...")
+                    await self.client.get_dialogs()
+                    fetched_dialogs = True
+                    try:
+                        entity = await self.client.get_entity(channel_id)
+                    except ValueError:
+                        entity = None
+            if entity is None:
+                logger.error(f"Could not find channel with ID {channel_id}. Make sure you are a member of this channel/group!")
+                continue
+            self.entities.put(channel_id, entity)
+            peers.append(InputPeerChannel(entity.id, entity.access_hash) if getattr(entity, "access_hash", None) else entity)
+            logger.info(f"Successfully resolved channel: {entity.title} ({channel_id})")
+
+        if missing:
+            self.entities.save()
+        return peers
 
     async def start(self):
         logger.info("Connecting to Telegram...")
         await self.client.start()
         logger.info("Connected to Telegram.")
-        
-        # Force cache dialogs to ensure we can find the entity
-        # This fixes 'Cannot find entity' errors for clean sessions
-        await self.client.get_dialogs() 
-
-        try:
-            # Verify we can see the channel
-            # Remove any prefix from config for clean conversion if needed, but usually telethon handles it
-            channel_id = int(Config.TELEGRAM_CHANNEL_ID)
-            entity = await self.client.get_entity(channel_id)
-            logger.info(f"Successfully resolved channel: {entity.title} ({entity.id})")
-        except ValueError:
-            logger.error(f"Could not find channel with ID {Config.TELEGRAM_CHANNEL_ID}. Make sure you are a member of this channel/group!")
+        startup.mark("telegram_connect")
+
+        peers = await self.resolve_channels()
+        if not peers:
+            logger.error("None of the configured channels could be resolved")
             return
+        startup.mark("channels")
+
+        if self.catch_up:
+            # Before subscribing: the first live message moves the checkpoint past the gap
+            try:
+                await self.catch_up(self.client)
+            except Exception as e:
+                logger.error(f"Catch-up before listening failed, missed messages were not journalled: {e}")
+            startup.mark("catch_up")
 
-        @self.client.on(events.NewMessage(chats=channel_id))
-        async def handler(event):
-            logger.info(f"New message received: {event.raw_text}")
-            await self.callback(event.raw_text)
+        self.client.add_event_handler(self.on_message, events.NewMessage(chats=peers))
 
-        logger.info(f"Listening to channel ID: {Config.TELEGRAM_CHANNEL_ID}")
+        logger.info(f"Listening to {len(peers)} channel(s): {', '.join(str(c) for c in self.channel_ids)}")
+        startup.ready()
         await self.client.run_until_disconnected()
@@ -1,9 +1,8 @@
-from growwapi import GrowwAPI
+from client_pool import get_pool
 from config import Config
 import logging
+import log_setup
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def test_connection():
@@ -12,8 +11,8 @@ def test_connection():
         
         # 1. Initialize
         print(f"Using Auth Token: {Config.GROWW_AUTH_TOKEN[:5]}... (masked)")
-        groww = GrowwAPI(Config.GROWW_API_KEY, Config.GROWW_API_SECRET)
-        groww.set_access_token(Config.GROWW_AUTH_TOKEN)
+        pool = get_pool()
+        groww = pool.get(Config.GROWW_API_KEY, Config.GROWW_API_SECRET, Config.GROWW_AUTH_TOKEN)
         print("Authentication initialized.")
 
         # 2. Check Balance (Good way to verify auth)
@@ -35,9 +34,14 @@ def test_connection():
         else:
             print("No results for 'NIFTY 26100 PE'. Try full expiry name like 'NIFTY 21SEP 26100 PE'")
 
+        # 4. Reuse the pooled client and report connection stats
+        pool.prewarm()
+        print(f"\nClient pool stats: {pool.stats()}")
+
     except Exception as e:
         print(f"\n[ERROR] Connection Failed: {e}")
         print("Please check your GROWW_AUTH_TOKEN in .env")
 
 if __name__ == "__main__":
+    log_setup.setup()
     test_connection()